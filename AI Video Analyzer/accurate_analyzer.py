@@ -1,100 +1,61 @@
 import cv2
 import numpy as np
 import csv
-import pickle
 import os
-from collections import defaultdict, deque
+import sys
+from collections import deque
 from datetime import datetime
+from video_pipeline import VideoPipeline
+from annotation_sidecar import AnnotationSidecar, OUTPUT_MODES
+from session_log import SessionLog, HAS_PYARROW
+from frame_buffers import FrameBuffers, shade_panel
+from face_tracking import TrackedFaceDetector
+from student_tracker import StudentTracker
+from hand_features import HandFeatureExtractor
+from model_registry import models
+from classroom_zones import ClassroomZones, ZoneTally, zone_metrics
 
 class AccurateStudentAnalyzer:
-    def __init__(self):
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+    def __init__(self, detect_interval=1, min_face_size=30, zones=None):
+        # Loaded once per process and shared between analyzers (see model_registry)
+        self.face_cascade = models.get('cascade', 'haarcascade_frontalface_default.xml')
+        self.eye_cascade = models.get('cascade', 'haarcascade_eye.xml')
+        # Full cascade every detect_interval frames, optical-flow tracking in between
+        # min_face_size > 30 (or a fraction of frame height) detects on a downscaled frame
+        self.face_tracker = TrackedFaceDetector(self.face_cascade, detect_interval=detect_interval,
+                                                min_face_size=min_face_size)
+        # Grayscale conversion reuses two buffers; the tracker holds the previous one
+        self.buffers = FrameBuffers(depth=2)
+        # zones (ClassroomZones) limits detection to the seating area and adds per-zone metrics
+        self.zones = zones
+        self.zone_tally = ZoneTally()
         
         # Load trained hand raise model if exists
-        self.hand_raise_model = None
-        if os.path.exists('hand_raise_model.pkl'):
-            with open('hand_raise_model.pkl', 'rb') as f:
-                self.hand_raise_model = pickle.load(f)
+        self.hand_raise_model = models.get('hand_raise', 'hand_raise_model.pkl', 0.6)
+        self.hand_features = HandFeatureExtractor()
         
         self.students = {}
-        self.next_id = 1
+        self.tracker = StudentTracker(max_distance=80, id_prefix='Student_')
         self.frame_count = 0
+        self.frame_center = (0, 0)
     
-    def extract_hand_features(self, frame, face_bbox):
-        """Extract features for hand raise detection"""
-        x, y, w, h = face_bbox
-        above_h = int(h * 1.5)
-        above_y = max(0, y - above_h)
-        above_region = frame[above_y:y, max(0, x-w//2):min(frame.shape[1], x+w+w//2)]
-        
-        if above_region.size == 0:
-            return None
-        
-        hsv = cv2.cvtColor(above_region, cv2.COLOR_BGR2HSV)
-        lower_skin = np.array([0, 20, 70], dtype=np.uint8)
-        upper_skin = np.array([20, 255, 255], dtype=np.uint8)
-        skin_mask = cv2.inRange(hsv, lower_skin, upper_skin)
-        
-        features = []
-        skin_ratio = np.sum(skin_mask > 0) / skin_mask.size
-        features.append(skin_ratio)
-        
-        vertical_profile = np.sum(skin_mask, axis=1)
-        if len(vertical_profile) > 0:
-            top = np.sum(vertical_profile[:len(vertical_profile)//3])
-            mid = np.sum(vertical_profile[len(vertical_profile)//3:2*len(vertical_profile)//3])
-            bot = np.sum(vertical_profile[2*len(vertical_profile)//3:])
-            total = top + mid + bot
-            features.extend([top/total if total > 0 else 0, mid/total if total > 0 else 0, bot/total if total > 0 else 0])
-        else:
-            features.extend([0, 0, 0])
-        
-        horizontal_profile = np.sum(skin_mask, axis=0)
-        if len(horizontal_profile) > 0:
-            left = np.sum(horizontal_profile[:len(horizontal_profile)//2])
-            right = np.sum(horizontal_profile[len(horizontal_profile)//2:])
-            total = left + right
-            features.extend([left/total if total > 0 else 0.5, right/total if total > 0 else 0.5])
-        else:
-            features.extend([0.5, 0.5])
-        
-        gray_above = cv2.cvtColor(above_region, cv2.COLOR_BGR2GRAY)
-        features.append(np.mean(gray_above) / 255.0)
-        
-        edges = cv2.Canny(gray_above, 50, 150)
-        features.append(np.sum(edges > 0) / edges.size)
-        features.append(above_region.shape[0] / above_region.shape[1] if above_region.shape[1] > 0 else 1)
-        
-        return np.array(features)
-    
-    def track_student(self, center, faces_data):
+    def track_students(self, faces):
         """Track students across frames"""
-        min_dist = 80
-        matched_id = None
-        
-        for sid, data in self.students.items():
-            if len(data['positions']) > 0:
-                last_pos = data['positions'][-1]
-                dist = np.sqrt((center[0] - last_pos[0])**2 + (center[1] - last_pos[1])**2)
-                if dist < min_dist:
-                    min_dist = dist
-                    matched_id = sid
-        
-        if matched_id is None:
-            matched_id = f"Student_{self.next_id}"
-            self.next_id += 1
-            self.students[matched_id] = {
-                'positions': deque(maxlen=50),
-                'eye_visibility': deque(maxlen=50),
-                'movement': deque(maxlen=50),
-                'engagement_score': deque(maxlen=50),
-                'attention_score': deque(maxlen=50),
-                'hand_raises': 0,
-                'last_hand_raise': -100
-            }
-        
-        return matched_id
+        student_ids = self.tracker.update(faces)
+        
+        for student_id in student_ids:
+            if student_id not in self.students:
+                self.students[student_id] = {
+                    'positions': deque(maxlen=50),
+                    'eye_visibility': deque(maxlen=50),
+                    'movement': deque(maxlen=50),
+                    'engagement_score': deque(maxlen=50),
+                    'attention_score': deque(maxlen=50),
+                    'hand_raises': 0,
+                    'last_hand_raise': -100
+                }
+        
+        return student_ids
     
     def calculate_engagement(self, student_id):
         """Calculate engagement based on eye visibility and movement"""
@@ -136,8 +97,17 @@ class AccurateStudentAnalyzer:
         
         return stability_score
     
-    def process_video(self, video_path, output_path):
-        """Process video with accurate detection"""
+    def process_video(self, video_path, output_path, output_mode='video', session_log_path=None):
+        """Process video with accurate detection
+        
+        output_mode 'metrics' skips drawing and encoding, 'sidecar' writes
+        per-frame results to output_path instead (see annotation_sidecar).
+        session_log_path also writes one row per student per frame as
+        Parquet/Arrow part files (see session_log).
+        """
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"output_mode must be one of {OUTPUT_MODES}, got {output_mode!r}")
+        
         cap = cv2.VideoCapture(video_path)
         
         if not cap.isOpened():
@@ -149,112 +119,171 @@ class AccurateStudentAnalyzer:
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        out, sidecar = None, None
+        if output_mode == 'video':
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        elif output_mode == 'sidecar':
+            sidecar = AnnotationSidecar(output_path, video_path, 'accurate_analyzer.AccurateStudentAnalyzer', fps, (width, height))
+            sidecar.begin()
+        
+        session_log = None
+        if session_log_path:
+            video_name = os.path.splitext(os.path.basename(video_path))[0]
+            session_log = SessionLog(session_log_path, video_name, fps, self.session_rows)
+            session_log.begin()
+        recorders = [recorder for recorder in (sidecar, session_log) if recorder]
+        
+        def record_result(frame_idx, result):
+            for recorder in recorders:
+                recorder.write(frame_idx, result)
         
-        frame_center = (width // 2, height // 2)
+        self.frame_center = (width // 2, height // 2)
         
         print(f"🎬 Processing: {video_path}")
         print(f"📊 Frames: {total_frames}")
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
+        def progress(frames_read):
+            if frames_read % 30 == 0:
+                print(f"Progress: {(frames_read/total_frames)*100:.1f}%", end='\r')
+        
+        # Without a writer the pipeline has no annotate/encode stages at all
+        pipeline = VideoPipeline(self.analyze_frame, self.annotate_frame, out, progress_fn=progress,
+                                 recycle_frames=True, result_fn=record_result if recorders else None)
+        pipeline.run(cap)
+        
+        cap.release()
+        if out:
+            out.release()
+        for recorder in recorders:
+            recorder.close()
+        
+        print(f"\n✅ Complete!" + (f" Output: {output_path}" if out else ""))
+        pipeline.print_stats()
+        return self.generate_report(fps, total_frames)
+    
+    def analyze_frame(self, frame):
+        """Detect, track and score all students in one frame"""
+        self.frame_count += 1
+        gray = self.buffers.gray(frame)
+        
+        zones = None
+        if self.zones:
+            faces, zones = self.zones.detect(self.face_tracker, gray)
+        else:
+            faces = self.face_tracker.detect(gray)
+        
+        student_ids = self.track_students(faces)
+        if zones:
+            for student_id, zone in zip(student_ids, zones):
+                self.zone_tally.add(student_id, zone)
+        
+        # One feature pass and one classifier call for all faces
+        hands = np.zeros(len(faces), dtype=bool)
+        if self.hand_raise_model is not None and len(faces):
+            hands = self.hand_features.hand_raised(self.hand_raise_model, frame, faces)
+        
+        students = []
+        for (x, y, w, h), student_id, hand_raised in zip(faces, student_ids, hands):
+            center = (x + w//2, y + h//2)
+            data = self.students[student_id]
+            
+            # Track position
+            data['positions'].append(center)
             
-            self.frame_count += 1
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            # Calculate movement
+            if len(data['positions']) > 1:
+                prev_pos = data['positions'][-2]
+                movement = np.sqrt((center[0] - prev_pos[0])**2 + (center[1] - prev_pos[1])**2)
+                data['movement'].append(movement)
             
-            faces = self.face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(30, 30))
+            # Detect eyes
+            face_roi = gray[y:y+h, x:x+w]
+            eyes = self.eye_cascade.detectMultiScale(face_roi, 1.1, 3)
+            eye_visible = len(eyes) >= 2
+            data['eye_visibility'].append(1 if eye_visible else 0)
             
-            for (x, y, w, h) in faces:
-                center = (x + w//2, y + h//2)
-                student_id = self.track_student(center, faces)
-                data = self.students[student_id]
-                
-                # Track position
-                data['positions'].append(center)
-                
-                # Calculate movement
-                if len(data['positions']) > 1:
-                    prev_pos = data['positions'][-2]
-                    movement = np.sqrt((center[0] - prev_pos[0])**2 + (center[1] - prev_pos[1])**2)
-                    data['movement'].append(movement)
-                
-                # Detect eyes
-                face_roi = gray[y:y+h, x:x+w]
-                eyes = self.eye_cascade.detectMultiScale(face_roi, 1.1, 3)
-                eye_visible = len(eyes) >= 2
-                data['eye_visibility'].append(1 if eye_visible else 0)
-                
-                # Hand raise detection
-                hand_raised = False
-                if self.hand_raise_model is not None:
-                    features = self.extract_hand_features(frame, (x, y, w, h))
-                    if features is not None:
-                        pred = self.hand_raise_model.predict([features])[0]
-                        prob = self.hand_raise_model.predict_proba([features])[0][1]
-                        hand_raised = pred == 1 and prob > 0.6
-                        
-                        if hand_raised and (self.frame_count - data['last_hand_raise']) > 30:
-                            data['hand_raises'] += 1
-                            data['last_hand_raise'] = self.frame_count
-                
-                # Calculate scores
-                engagement = self.calculate_engagement(student_id)
-                attention = self.calculate_attention(student_id, frame_center)
-                
-                data['engagement_score'].append(engagement)
-                data['attention_score'].append(attention)
-                
-                # Draw annotations
-                color = (0, 255, 0) if engagement > 60 else (0, 165, 255) if engagement > 40 else (0, 0, 255)
-                cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
-                
-                cv2.putText(frame, student_id.replace('Student_', 'S'), (x, y-10), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                
-                status = "Engaged" if engagement > 60 else "Moderate" if engagement > 40 else "Distracted"
-                cv2.putText(frame, status, (x, y+h+15), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
-                
-                if hand_raised:
-                    cv2.putText(frame, "HAND UP!", (x, y+h+30), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 2)
+            # Hand raise detection
+            hand_raised = bool(hand_raised)
+            if hand_raised and (self.frame_count - data['last_hand_raise']) > 30:
+                data['hand_raises'] += 1
+                data['last_hand_raise'] = self.frame_count
             
-            # Draw stats
-            self.draw_stats(frame, len(faces))
+            # Calculate scores
+            engagement = self.calculate_engagement(student_id)
+            attention = self.calculate_attention(student_id, self.frame_center)
             
-            out.write(frame)
+            data['engagement_score'].append(engagement)
+            data['attention_score'].append(attention)
             
-            if self.frame_count % 30 == 0:
-                print(f"Progress: {(self.frame_count/total_frames)*100:.1f}%", end='\r')
+            students.append({
+                'student_id': student_id,
+                'bbox': (x, y, w, h),
+                'engagement': engagement,
+                'attention': attention,
+                'hand_raised': hand_raised
+            })
         
-        cap.release()
-        out.release()
+        return {'students': students, 'stats': self.compute_stats(len(faces))}
+    
+    @staticmethod
+    def session_rows(result):
+        """Session log rows of one frame's result; attention is the focus measure, with no decision or emotion"""
+        for student in result['students']:
+            yield (student['student_id'], student['bbox'], student['attention'], None, None,
+                   student['hand_raised'], student['engagement'])
+    
+    @staticmethod
+    def annotate_frame(frame, result):
+        """Draw a frame's analysis result onto it; also renders sidecar results at playback"""
+        for student in result['students']:
+            x, y, w, h = student['bbox']
+            engagement = student['engagement']
+            
+            color = (0, 255, 0) if engagement > 60 else (0, 165, 255) if engagement > 40 else (0, 0, 255)
+            cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
+            
+            cv2.putText(frame, student['student_id'].replace('Student_', 'S'), (x, y-10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            
+            status = "Engaged" if engagement > 60 else "Moderate" if engagement > 40 else "Distracted"
+            cv2.putText(frame, status, (x, y+h+15), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+            
+            if student['hand_raised']:
+                cv2.putText(frame, "HAND UP!", (x, y+h+30), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 2)
         
-        print(f"\n✅ Complete! Output: {output_path}")
-        return self.generate_report(fps, total_frames)
+        # Draw stats
+        AccurateStudentAnalyzer.draw_stats(frame, result['stats'])
+        
+        return frame
+    
+    def compute_stats(self, face_count):
+        """Snapshot aggregate metrics for the overlay"""
+        stats = {'face_count': face_count}
+        
+        if self.students:
+            stats['avg_engagement'] = np.mean([np.mean(d['engagement_score']) for d in self.students.values() if d['engagement_score']])
+            stats['avg_attention'] = np.mean([np.mean(d['attention_score']) for d in self.students.values() if d['attention_score']])
+            stats['total_hands'] = sum(d['hand_raises'] for d in self.students.values())
+        
+        return stats
     
-    def draw_stats(self, frame, face_count):
+    @staticmethod
+    def draw_stats(frame, stats):
         """Draw statistics overlay"""
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (10, 10), (300, 120), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.6, frame, 0.4, 0, frame)
+        shade_panel(frame, (10, 10), (300, 120), 0.6)
         
-        cv2.putText(frame, f"Students: {face_count}", (20, 35), 
+        cv2.putText(frame, f"Students: {stats['face_count']}", (20, 35), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
         
-        if self.students:
-            avg_engagement = np.mean([np.mean(d['engagement_score']) for d in self.students.values() if d['engagement_score']])
-            avg_attention = np.mean([np.mean(d['attention_score']) for d in self.students.values() if d['attention_score']])
-            total_hands = sum(d['hand_raises'] for d in self.students.values())
-            
-            cv2.putText(frame, f"Avg Engagement: {avg_engagement:.1f}%", (20, 60), 
+        if 'avg_engagement' in stats:
+            cv2.putText(frame, f"Avg Engagement: {stats['avg_engagement']:.1f}%", (20, 60), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-            cv2.putText(frame, f"Avg Attention: {avg_attention:.1f}%", (20, 85), 
+            cv2.putText(frame, f"Avg Attention: {stats['avg_attention']:.1f}%", (20, 85), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
-            cv2.putText(frame, f"Hand Raises: {total_hands}", (20, 110), 
+            cv2.putText(frame, f"Hand Raises: {stats['total_hands']}", (20, 110), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
     
     def generate_report(self, fps, total_frames):
@@ -272,13 +301,22 @@ class AccurateStudentAnalyzer:
                 'attention_score': round(attention, 2),
                 'hand_raises': data['hand_raises']
             })
+            if self.zones:
+                student_reports[-1]['zone'] = self.zone_tally.zone_of(sid)
         
-        return {
+        report = {
             'duration': round(duration, 2),
             'total_students': len(self.students),
             'frames': self.frame_count,
             'students': student_reports
         }
+        if self.zones:
+            report['zone_metrics'] = zone_metrics(
+                self.zones.names, student_reports,
+                averages={'average_engagement': 'engagement_score', 'average_attention': 'attention_score'},
+                totals={'total_hand_raises': 'hand_raises'})
+        
+        return report
     
     def save_report(self, report, path):
         """Save to CSV"""
@@ -290,6 +328,15 @@ class AccurateStudentAnalyzer:
             writer.writerow(['Frames Processed', report['frames']])
             writer.writerow([])
             
+            # Per seating zone, when the analyzer ran with ClassroomZones
+            if report.get('zone_metrics'):
+                writer.writerow(['ZONE METRICS', ''])
+                writer.writerow(['Zone', 'Students', 'Engagement Score', 'Attention Score', 'Hand Raises'])
+                for zone, metrics in report['zone_metrics'].items():
+                    writer.writerow([zone, metrics['students'], metrics['average_engagement'],
+                                     metrics['average_attention'], metrics['total_hand_raises']])
+                writer.writerow([])
+            
             writer.writerow(['Student ID', 'Engagement Score', 'Attention Score', 'Hand Raises'])
             for s in report['students']:
                 writer.writerow([s['student_id'], s['engagement_score'], s['attention_score'], s['hand_raises']])
@@ -332,9 +379,14 @@ if __name__ == "__main__":
     
     # Then analyze
     print("\n📊 Step 2: Analyzing video...")
-    analyzer = AccurateStudentAnalyzer()
+    # --zones CAMERA.json analyzes only the seating zones of that camera config (see classroom_zones)
+    zones = ClassroomZones.load(sys.argv[sys.argv.index("--zones") + 1]) if "--zones" in sys.argv else None
+    analyzer = AccurateStudentAnalyzer(zones=zones)
     
-    report = analyzer.process_video("assets/215475_small.mp4", "output_accurate.mp4")
+    # Per-frame rows for the decision AI (DataLoader.load_video_data and load_video_sessions)
+    session_log_path = "accurate_session.parquet" if HAS_PYARROW else None
+    report = analyzer.process_video("assets/215475_small.mp4", "output_accurate.mp4",
+                                    session_log_path=session_log_path)
     
     if report:
         analyzer.save_report(report, "accurate_report.csv")
@@ -0,0 +1,131 @@
+import math
+import threading
+import time
+import cv2
+
+
+class MotionMeter:
+    """Scene change between samples as the mean absolute difference of tiny grayscale thumbnails (0..1)"""
+    
+    def __init__(self, size=(64, 36)):
+        self.size = size
+        self.previous = None
+    
+    def thumbnail(self, frame):
+        # Downscale before converting so the cost does not depend on the source resolution
+        thumb = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if thumb.ndim == 3:
+            thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+        return thumb
+    
+    @staticmethod
+    def difference(thumb, previous):
+        return float(cv2.absdiff(thumb, previous).mean()) / 255.0
+    
+    def update(self, frame):
+        thumb = self.thumbnail(frame)
+        motion = 0.0 if self.previous is None else self.difference(thumb, self.previous)
+        self.previous = thumb
+        return motion
+
+
+class AdaptiveSampler:
+    """Chooses how many source frames to skip between analyses
+    
+    The stride has two parts. For live sources (realtime=True) it never drops
+    below the number of frames that arrive during one analysis (smoothed
+    latency x source fps), so analysis keeps up with the source. On top of
+    that, content decides: motion above motion_high or a change in the
+    detection count snaps the stride to min_stride, and every static sample
+    (motion below motion_low) lets it creep up by one towards max_stride.
+    
+    should_process(frame_idx) is called for every decoded frame; begin() and
+    end() wrap each analysis. After begin(), span holds the number of source
+    frames the analyzed frame stands for, so callers can interpolate the
+    frames that were skipped.
+    """
+    
+    def __init__(self, source_fps, realtime=True, min_stride=1, max_stride=8, initial_stride=2,
+                 motion_high=0.04, motion_low=0.01, count_fn=None, smoothing=0.2):
+        self.source_fps = source_fps if source_fps and source_fps > 0 else 30.0
+        self.realtime = realtime
+        self.min_stride = min_stride
+        self.max_stride = max_stride
+        self.motion_high = motion_high
+        self.motion_low = motion_low
+        self.count_fn = count_fn
+        self.smoothing = smoothing
+        
+        self.lock = threading.Lock()  # should_process runs on the decode thread, end() on the analyzer
+        self.stride = initial_stride
+        self.content_stride = initial_stride
+        self.next_frame = None
+        
+        self.motion_meter = MotionMeter()
+        self.motion = 0.0
+        self.last_count = None
+        self.latency = None
+        self.started_at = None
+        
+        self.first_frame = None
+        self.last_frame = None
+        self.span = 1
+        self.analyzed = 0
+        self.busy = 0.0
+    
+    def should_process(self, frame_idx):
+        """True if frame_idx is due for analysis at the current stride"""
+        with self.lock:
+            if self.next_frame is None or frame_idx >= self.next_frame:
+                self.next_frame = frame_idx + self.stride
+                return True
+            return False
+    
+    def begin(self, frame_idx, frame):
+        """Start analyzing frame_idx; measures motion and sets span"""
+        self.span = frame_idx - self.last_frame if self.last_frame is not None else 1
+        if self.first_frame is None:
+            self.first_frame = frame_idx
+        self.last_frame = frame_idx
+        self.motion = self.motion_meter.update(frame)
+        self.started_at = time.perf_counter()
+    
+    def end(self, result=None):
+        """Finish the analysis started by begin() and pick the next stride"""
+        latency = time.perf_counter() - self.started_at
+        self.busy += latency
+        self.analyzed += 1
+        self.latency = latency if self.latency is None else self.latency + self.smoothing * (latency - self.latency)
+        
+        count = self.count_fn(result) if self.count_fn and result is not None else None
+        detections_changed = count is not None and self.last_count is not None and count != self.last_count
+        self.last_count = count
+        
+        if self.motion >= self.motion_high or detections_changed:
+            self.content_stride = self.min_stride
+        elif self.motion < self.motion_low:
+            self.content_stride = min(self.content_stride + 1, self.max_stride)
+        
+        with self.lock:
+            self.stride = max(self.content_stride, self.realtime_stride())
+    
+    def realtime_stride(self):
+        """Frames that arrive while one frame is analyzed (1 when not live)"""
+        if not self.realtime or self.latency is None:
+            return self.min_stride
+        return max(self.min_stride, math.ceil(self.latency * self.source_fps))
+    
+    def stats(self):
+        covered = self.last_frame - self.first_frame + 1 if self.analyzed else 0
+        return {
+            'source_fps': round(self.source_fps, 2),
+            'frames_covered': covered,
+            'frames_analyzed': self.analyzed,
+            'frames_skipped': covered - self.analyzed,
+            # Analyses per second of source time, e.g. 12.5 for every 2nd frame of 25 fps video
+            'effective_fps': round(self.analyzed / covered * self.source_fps, 2) if covered else 0.0,
+            'mean_stride': round(covered / self.analyzed, 2) if self.analyzed else 0.0,
+            'current_stride': self.stride,
+            'latency_ms': round(self.latency * 1000, 2) if self.latency is not None else None,
+            'analysis_fps': round(self.analyzed / self.busy, 2) if self.busy > 0 else 0.0
+        }
@@ -0,0 +1,122 @@
+"""
+Per-frame annotation sidecar: analysis results instead of an annotated video.
+
+Drawing boxes, text and the stats panel on every frame, then encoding the
+result as mp4v, is a large share of an analyzer's runtime. In 'sidecar'
+output mode the analyzers skip both. They write each frame's analysis
+result (boxes, IDs, scores) as one JSON line. play_analyzed_video.py
+reads the file and draws the overlays onto the source video at playback
+time, using the analyzer's own annotate_frame.
+
+Line 1 is a header with the source video, fps, frame size and renderer
+('module.Class'). Every other line is {"frame": idx, "result": {...}}.
+Floats are rounded to 2 decimals and separators are compact, so an hour of
+lecture is a few MB instead of a re-encoded video.
+"""
+
+import importlib
+import json
+import os
+
+# 'video' draws and encodes an annotated copy, 'metrics' only produces the report,
+# 'sidecar' writes per-frame results for play_analyzed_video.py to render later
+OUTPUT_MODES = ('video', 'metrics', 'sidecar')
+
+
+def output_path_for(video_name, output_mode):
+    """Batch output file for one video: annotated video, sidecar, or None for 'metrics'"""
+    if output_mode == 'video':
+        return f"output_{video_name}.mp4"
+    if output_mode == 'sidecar':
+        return f"output_{video_name}.annotations.jsonl"
+    return None
+
+
+def _compact(value):
+    """JSON-ready copy of an analysis result: numpy scalars unwrapped, floats rounded"""
+    if isinstance(value, dict):
+        return {key: _compact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_compact(item) for item in value]
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float):
+        return round(value, 2)
+    return value
+
+
+class AnnotationSidecar:
+    """Writes one JSON line per analyzed frame
+    
+    begin(start_frame) must be called before a run writes frames. A run that
+    resumes part-way through a video keeps the earlier run's lines before
+    start_frame and appends after them. Call it again for each following
+    segment; only the first call opens the file.
+    """
+    
+    def __init__(self, path, video_path, renderer, fps, frame_size):
+        self.path = path
+        self.header = {
+            'video': video_path,
+            'renderer': renderer,
+            'fps': fps,
+            'width': frame_size[0],
+            'height': frame_size[1]
+        }
+        self.file = None
+        self.frames_written = 0
+    
+    def begin(self, start_frame=0):
+        if self.file is not None:
+            return
+        kept = []
+        if start_frame and os.path.exists(self.path):
+            _, records = load_sidecar(self.path)
+            kept = [(idx, result) for idx, result in sorted(records.items()) if idx < start_frame]
+        
+        self.file = open(self.path, 'w')
+        self.file.write(json.dumps(self.header, separators=(',', ':')) + "\n")
+        for frame_idx, result in kept:
+            self._write_line(frame_idx, result)
+    
+    def write(self, frame_idx, result):
+        """VideoPipeline result_fn: record one frame's analysis result"""
+        self._write_line(frame_idx, _compact(result))
+        self.frames_written += 1
+    
+    def _write_line(self, frame_idx, result):
+        self.file.write(json.dumps({'frame': frame_idx, 'result': result}, separators=(',', ':')) + "\n")
+    
+    def flush(self):
+        """Called before a checkpoint, so the file on disk covers every checkpointed frame"""
+        if self.file:
+            self.file.flush()
+    
+    def close(self):
+        if self.file is None:
+            self.begin()
+        self.file.close()
+        print(f"🗂️  Annotation sidecar saved: {self.path} ({self.frames_written} frames)")
+
+
+def load_sidecar(path):
+    """Read a sidecar; returns (header, {frame_idx: result})
+    
+    A truncated last line, left by a run that was killed, is ignored.
+    """
+    records = {}
+    with open(path) as f:
+        header = json.loads(f.readline())
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            records[record['frame']] = record['result']
+    return header, records
+
+
+def load_renderer(header):
+    """annotate_frame(frame, result) of the analyzer that wrote the sidecar"""
+    module_name, class_name = header['renderer'].rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name).annotate_frame
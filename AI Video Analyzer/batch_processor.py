@@ -1,9 +1,44 @@
 import os
 import glob
+import argparse
+from functools import partial
 from main_analyzer import MainAnalyzer
+from job_manifest import JobManifest, Checkpointer
+from batch_scheduler import BatchScheduler, report_progress
+from annotation_sidecar import OUTPUT_MODES, output_path_for
+from classroom_zones import zones_for
 
-def process_all_videos():
-    """Process all videos in assets folder"""
+def _process_video(video_path, checkpoint_path, checkpoint_every, output_mode='video', zones_path=None,
+                   motion_threshold=None, session_log=False):
+    """Worker entry point: analyze one video, resuming from its checkpoint if there is one"""
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    output_path = output_path_for(video_name, output_mode)
+    report_path = f"report_{video_name}.csv"
+    session_log_path = f"session_{video_name}.parquet" if session_log else None
+    
+    analyzer = MainAnalyzer(zones=zones_for(video_path, zones_path), motion_threshold=motion_threshold)
+    checkpointer = Checkpointer(checkpoint_path, every_seconds=checkpoint_every)
+    report = analyzer.process_video(video_path, output_path, checkpointer=checkpointer,
+                                    progress_callback=lambda p: report_progress(video_path, p),
+                                    output_mode=output_mode, session_log_path=session_log_path)
+    
+    if not report:
+        raise ValueError(f"Cannot open video: {video_path}")
+    analyzer.save_report(report, report_path)
+    checkpointer.clear()
+    return report_path, output_path, report
+
+def process_all_videos(workers=None, manifest_path="batch_manifest_main.json", checkpoint_every=300.0,
+                       threads_per_worker=None, output_mode='video', zones_path=None, motion_threshold=None,
+                       session_log=False):
+    """Process all videos in assets folder, skipping ones already in the manifest
+    
+    output_mode 'metrics' only writes the reports, 'sidecar' writes per-frame
+    annotations for play_analyzed_video.py instead of encoding a video.
+    zones_path is a camera config or a directory of them (see classroom_zones).
+    motion_threshold enables the motion gate (see motion_gate).
+    session_log also writes session_<video>.parquet per video (see session_log).
+    """
     video_extensions = ['*.mp4', '*.avi', '*.mov', '*.mkv']
     video_files = []
     
@@ -16,25 +51,54 @@ def process_all_videos():
     
     print(f"📹 Found {len(video_files)} video(s)\n")
     
-    for idx, video_path in enumerate(video_files, 1):
-        video_name = os.path.splitext(os.path.basename(video_path))[0]
-        output_path = f"output_{video_name}.mp4"
-        report_path = f"report_{video_name}.csv"
-        
-        print(f"\n{'='*60}")
-        print(f"Processing {idx}/{len(video_files)}: {video_name}")
-        print(f"{'='*60}")
-        
-        analyzer = MainAnalyzer()
-        report = analyzer.process_video(video_path, output_path)
-        
-        if report:
-            analyzer.save_report(report, report_path)
-            print(f"✅ Completed: {video_name}")
+    manifest = JobManifest(manifest_path)
+    jobs = []
+    for video_path in sorted(video_files):
+        # Changing a video's seating zones redoes it
+        zones = zones_for(video_path, zones_path)
+        options = f"{output_mode}:{zones.fingerprint()}" if zones else output_mode
+        if motion_threshold:
+            options += f":motion={motion_threshold}"
+        if session_log:
+            options += ":session"
+        key = manifest.job_key(video_path, MainAnalyzer.__name__, MainAnalyzer.VERSION, options)
+        if manifest.is_done(key):
+            print(f"⏭️  Already processed: {os.path.basename(video_path)}")
+        else:
+            jobs.append((key, video_path))
+    
+    def on_done(key, video_path, report):
+        print(f"✅ Completed: {os.path.splitext(os.path.basename(video_path))[0]}")
+    
+    # Longest videos first across worker processes; interrupted videos resume from their last checkpoint
+    worker = partial(_process_video, output_mode=output_mode, zones_path=zones_path,
+                     motion_threshold=motion_threshold, session_log=session_log)
+    scheduler = BatchScheduler(manifest, worker, workers, threads_per_worker, checkpoint_every,
+                               reports_path="batch_reports_main.jsonl")
+    failed = scheduler.run(jobs, on_done)
     
     print(f"\n{'='*60}")
-    print("🎉 All videos processed!")
+    if failed:
+        print(f"⚠️ {failed} video(s) failed; run again to resume them")
+    else:
+        print("🎉 All videos processed!")
     print(f"{'='*60}")
 
 if __name__ == "__main__":
-    process_all_videos()
+    parser = argparse.ArgumentParser(description="Analyze every video in assets/, skipping ones already done")
+    parser.add_argument('--workers', type=int, default=None, help="parallel videos (default: CPU count)")
+    parser.add_argument('--threads', type=int, default=None, help="OpenCV/BLAS threads per worker (default: cores / workers)")
+    parser.add_argument('--checkpoint-minutes', type=float, default=5.0, help="minutes of video between checkpoints")
+    parser.add_argument('--output', choices=OUTPUT_MODES, default='video',
+                        help="annotated video, reports only, or a per-frame annotation sidecar")
+    parser.add_argument('--zones', default=None,
+                        help="seating-zone camera config, or a directory of <video>.json / default.json configs")
+    parser.add_argument('--motion-threshold', type=float, default=None,
+                        help="reuse the last analysis for frames that changed less than this (e.g. 0.003)")
+    parser.add_argument('--session-log', action='store_true',
+                        help="also write per-frame, per-student rows to session_<video>.parquet")
+    args = parser.parse_args()
+    
+    process_all_videos(workers=args.workers, checkpoint_every=args.checkpoint_minutes * 60,
+                       threads_per_worker=args.threads, output_mode=args.output, zones_path=args.zones,
+                       motion_threshold=args.motion_threshold, session_log=args.session_log)
@@ -0,0 +1,223 @@
+"""
+Process-pool scheduler for analyzing many videos at once.
+
+Every video is probed up front for its frame count and resolution. Jobs
+are then queued longest first, measured in frames x pixels, across N
+worker processes. This way the last lecture to finish is a short one,
+not a two-hour recording that started late.
+
+Each worker caps OpenCV's thread pool and the OpenMP/BLAS/TensorFlow
+thread counts at cores / N, so the workers together do not oversubscribe
+the CPU. While jobs run, the scheduler prints the aggregate video
+frames/second and an ETA from the worker progress reports. Each finished
+report is appended to a JSON Lines file as soon as it arrives.
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import cv2
+
+# Read by OpenMP, BLAS and TensorFlow when they are first imported
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                   'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS')
+
+_progress_queue = None
+
+
+def _init_worker(threads, progress_queue):
+    """Pool initializer: cap OpenCV's thread pool and connect progress reporting"""
+    global _progress_queue
+    cv2.setNumThreads(threads)
+    _progress_queue = progress_queue
+
+
+class thread_limits:
+    """Set THREAD_ENV_VARS while worker processes are spawned
+    
+    Spawned workers re-import the main script before the pool initializer
+    runs, so the limits have to be in the environment they inherit.
+    """
+    
+    def __init__(self, threads):
+        self.threads = threads
+        self.saved = {}
+    
+    def __enter__(self):
+        self.saved = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+        os.environ.update({name: str(self.threads) for name in THREAD_ENV_VARS})
+    
+    def __exit__(self, *exc):
+        for name, value in self.saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def report_progress(video_path, percent):
+    """Called from a worker's progress callback; forwarded to the scheduler's ETA"""
+    if _progress_queue is not None:
+        _progress_queue.put((video_path, percent))
+
+
+def probe_video(video_path):
+    """Frame count, fps and resolution from the container header, or None if unreadable"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    info = {
+        'frames': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        'fps': cap.get(cv2.CAP_PROP_FPS),
+        'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    }
+    cap.release()
+    info['cost'] = info['frames'] * info['width'] * info['height']
+    return info
+
+
+def format_eta(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class BatchScheduler:
+    """Runs worker(video_path, checkpoint_path, checkpoint_every) for many videos, longest first
+    
+    worker returns (report_path, output_path, report) and may call
+    report_progress(video_path, percent). Each result is recorded in the
+    JobManifest as soon as it finishes, appended to reports_path, and passed
+    to on_done(key, video_path, report).
+    """
+    
+    def __init__(self, manifest, worker, workers=None, threads_per_worker=None, checkpoint_every=300.0,
+                 reports_path='batch_reports.jsonl', status_every=10.0):
+        cores = os.cpu_count() or 1
+        self.manifest = manifest
+        self.worker = worker
+        self.workers = workers or cores
+        self.threads_per_worker = threads_per_worker or max(1, cores // self.workers)
+        self.checkpoint_every = checkpoint_every
+        self.reports_path = reports_path
+        self.status_every = status_every
+        
+        self.info = {}       # video_path -> probe_video() result
+        self.done = {}       # video_path -> fraction done (1.0 once finished)
+        self.started_at = None
+    
+    def plan(self, jobs):
+        """Probe every (key, video_path) and order them longest first; unreadable videos are failed"""
+        planned = []
+        for key, video_path in jobs:
+            info = probe_video(video_path)
+            if info is None:
+                self.manifest.start(key, video_path)
+                self.manifest.fail(key, f"Cannot open video: {video_path}")
+                print(f"❌ Cannot open video: {video_path}")
+                continue
+            planned.append((key, video_path, info))
+        planned.sort(key=lambda job: job[2]['cost'], reverse=True)
+        return planned
+    
+    def run(self, jobs, on_done=None):
+        """Process every (key, video_path); returns the number of videos that failed"""
+        planned = self.plan(jobs)
+        failed = len(jobs) - len(planned)
+        if not planned:
+            return failed
+        
+        workers = min(self.workers, len(planned))
+        self.info = {video_path: job_info for _, video_path, job_info in planned}
+        self.started_at = time.perf_counter()
+        total_frames = sum(job_info['frames'] for job_info in self.info.values())
+        print(f"🚀 {len(planned)} video(s), {total_frames} frames on {workers} worker(s) "
+              f"x {self.threads_per_worker} thread(s), longest first")
+        
+        # Spawn instead of fork: MediaPipe graphs and TF sessions are not fork-safe
+        context = multiprocessing.get_context('spawn')
+        progress_queue = context.Queue()
+        with thread_limits(self.threads_per_worker), \
+                ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                    initargs=(self.threads_per_worker, progress_queue)) as pool:
+            # The executor hands out work in submission order, so this is the schedule
+            pending = {}
+            for key, video_path, _ in planned:
+                self.manifest.start(key, video_path)
+                future = pool.submit(self.worker, video_path, self.manifest.checkpoint_path(key),
+                                     self.checkpoint_every)
+                pending[future] = (key, video_path)
+            
+            last_status = time.perf_counter()
+            while pending:
+                done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                self.drain_progress(progress_queue)
+                
+                for future in done:
+                    key, video_path = pending.pop(future)
+                    try:
+                        report_path, output_path, report = future.result()
+                    except Exception as e:
+                        # The checkpoint stays, so the next run resumes this video where it stopped
+                        self.manifest.fail(key, e)
+                        self.info.pop(video_path)
+                        self.done.pop(video_path, None)
+                        failed += 1
+                        print(f"\n❌ Error processing {video_path}: {e}")
+                        continue
+                    self.done[video_path] = 1.0
+                    self.manifest.finish(key, report_path, output_path)
+                    self.stream_report(video_path, report_path, report)
+                    if on_done:
+                        on_done(key, video_path, report)
+                
+                if done or time.perf_counter() - last_status >= self.status_every:
+                    self.print_status(len(planned) - len(pending), len(planned))
+                    last_status = time.perf_counter()
+        
+        return failed
+    
+    def drain_progress(self, progress_queue):
+        while True:
+            try:
+                video_path, percent = progress_queue.get_nowait()
+            except queue.Empty:
+                return
+            if video_path in self.info and self.done.get(video_path) != 1.0:
+                self.done[video_path] = min(percent, 100) / 100
+    
+    def stats(self):
+        """Frames done so far, aggregate frames/second and ETA in seconds
+        
+        The ETA extrapolates from frames x pixels done, so a batch that
+        started with its 1080p lectures does not look slower than it is.
+        """
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+        frames = sum(self.info[path]['frames'] * fraction for path, fraction in self.done.items())
+        cost = sum(self.info[path]['cost'] * fraction for path, fraction in self.done.items())
+        total_cost = sum(job_info['cost'] for job_info in self.info.values())
+        return {
+            'frames': int(frames),
+            'total_frames': sum(job_info['frames'] for job_info in self.info.values()),
+            'fps': round(frames / elapsed, 2) if elapsed > 0 else 0.0,
+            'eta_seconds': round(elapsed * (total_cost - cost) / cost, 1) if cost > 0 else None,
+            'elapsed_seconds': round(elapsed, 1)
+        }
+    
+    def print_status(self, finished, total):
+        stats = self.stats()
+        eta = format_eta(stats['eta_seconds']) if stats['eta_seconds'] is not None else "--:--:--"
+        percent = stats['frames'] / stats['total_frames'] * 100 if stats['total_frames'] else 100.0
+        print(f"⏱️  {finished}/{total} videos | {stats['frames']}/{stats['total_frames']} frames ({percent:.1f}%) | "
+              f"{stats['fps']:.1f} fps | ETA {eta}")
+    
+    def stream_report(self, video_path, report_path, report):
+        """Append one finished report as a JSON line, so results survive a crash of the batch itself"""
+        if not self.reports_path:
+            return
+        with open(self.reports_path, 'a') as f:
+            record = {'video': video_path, 'report_path': report_path, 'report': report}
+            f.write(json.dumps(record, default=str) + "\n")
@@ -1,15 +1,73 @@
 import os
 import glob
+import argparse
+import time
+from functools import partial
 from student_engagement_analyzer import StudentEngagementAnalyzer
+from job_manifest import JobManifest, Checkpointer, write_atomic
+from batch_scheduler import BatchScheduler, report_progress
+from annotation_sidecar import OUTPUT_MODES, output_path_for
+from classroom_zones import zones_for
 import json
 
+
+def _process_video(video_path, checkpoint_path, checkpoint_every, output_mode='video', zones_path=None,
+                   session_log=False):
+    """Worker entry point: analyze one video, resuming from its checkpoint if there is one"""
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    output_video_path = output_path_for(video_name, output_mode)
+    report_path = f"report_{video_name}.json"
+    session_log_path = f"session_{video_name}.parquet" if session_log else None
+    
+    analyzer = StudentEngagementAnalyzer(output_video=output_mode == 'video', zones=zones_for(video_path, zones_path))
+    checkpointer = Checkpointer(checkpoint_path, every_seconds=checkpoint_every)
+    try:
+        report = analyzer.process_video(
+            video_path,
+            progress_callback=lambda p: report_progress(video_path, p),
+            output_path=output_video_path,
+            checkpointer=checkpointer,
+            output_mode=output_mode,
+            session_log_path=session_log_path
+        )
+        
+        # Save individual report
+        analyzer.save_report(report, report_path)
+    finally:
+        analyzer.close()
+    checkpointer.clear()
+    
+    return report_path, output_video_path, report
+
+
 class BatchVideoProcessor:
-    def __init__(self, assets_folder="assets"):
+    def __init__(self, assets_folder="assets", workers=None, manifest_path="batch_manifest.json",
+                 checkpoint_every=300.0, threads_per_worker=None, combined_every=30.0, output_mode='video',
+                 zones_path=None, session_log=False):
         self.assets_folder = assets_folder
+        self.output_mode = output_mode  # 'video', 'metrics' or 'sidecar' (see annotation_sidecar)
+        self.zones_path = zones_path    # camera config or directory of them (see classroom_zones)
+        self.session_log = session_log  # also write session_<video>.parquet (see session_log)
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.checkpoint_every = checkpoint_every
+        # Rewriting the combined report is O(videos); with hundreds of lectures only do it every so often
+        self.combined_every = combined_every
+        self.combined_at = None
+        checkpoint_dir = os.path.join(os.path.dirname(manifest_path), 'checkpoints')
+        self.manifest = JobManifest(manifest_path, checkpoint_dir=checkpoint_dir)
         self.results = []
     
     def process_all_videos(self):
-        """Process all videos in assets folder"""
+        """Process all videos in assets folder
+        
+        Videos already in the manifest under the current analyzer version are
+        skipped, the rest run in parallel worker processes, longest first
+        (see BatchScheduler). A video that was interrupted resumes from its
+        last checkpoint. Every finished report is appended to
+        batch_reports.jsonl right away; the combined report is rewritten at
+        most every combined_every seconds and once at the end.
+        """
         video_extensions = ['*.mp4', '*.avi', '*.mov', '*.mkv']
         video_files = []
         
@@ -22,41 +80,49 @@ class BatchVideoProcessor:
         
         print(f"📹 Found {len(video_files)} video(s) to process\n")
         
-        for idx, video_path in enumerate(video_files, 1):
+        jobs = []
+        for video_path in sorted(video_files):
+            # Changing a video's seating zones redoes it
+            zones = zones_for(video_path, self.zones_path)
+            options = f"{self.output_mode}:{zones.fingerprint()}" if zones else self.output_mode
+            if self.session_log:
+                options += ":session"
+            key = self.manifest.job_key(video_path, StudentEngagementAnalyzer.__name__,
+                                        StudentEngagementAnalyzer.VERSION, options)
+            if self.manifest.is_done(key):
+                with open(self.manifest.jobs[key]['report']) as f:
+                    self.add_result(video_path, json.load(f))
+                print(f"⏭️  Already processed: {os.path.basename(video_path)}")
+            else:
+                jobs.append((key, video_path))
+        
+        def on_done(key, video_path, report):
+            print(f"\n✅ Completed: {os.path.basename(video_path)}")
+            self.print_summary(report)
+            self.add_result(video_path, report)
+        
+        worker = partial(_process_video, output_mode=self.output_mode, zones_path=self.zones_path,
+                         session_log=self.session_log)
+        scheduler = BatchScheduler(self.manifest, worker, self.workers, self.threads_per_worker,
+                                   self.checkpoint_every)
+        failed = scheduler.run(jobs, on_done)
+        
+        if self.results:
+            self.generate_combined_report()
             print(f"\n{'='*60}")
-            print(f"Processing Video {idx}/{len(video_files)}: {os.path.basename(video_path)}")
+            print("📊 COMBINED REPORT GENERATED")
             print(f"{'='*60}")
-            
-            analyzer = StudentEngagementAnalyzer(output_video=True)
-            
-            try:
-                video_name = os.path.splitext(os.path.basename(video_path))[0]
-                output_video_path = f"output_{video_name}.mp4"
-                
-                report = analyzer.process_video(
-                    video_path,
-                    progress_callback=lambda p: print(f"Progress: {p:.1f}%", end='\r'),
-                    output_path=output_video_path
-                )
-                
-                # Save individual report
-                report_path = f"report_{video_name}.json"
-                analyzer.save_report(report, report_path)
-                
-                print(f"\n🎬 Output video: {output_video_path}")
-                
-                self.results.append({
-                    'video': video_name,
-                    'report': report
-                })
-                
-                print(f"\n✅ Completed: {video_name}")
-                self.print_summary(report)
-                
-            except Exception as e:
-                print(f"\n❌ Error processing {video_path}: {str(e)}")
-        
-        self.generate_combined_report()
+            print(f"Total Videos: {len(self.results)}" + (f" ({failed} failed, rerun to resume)" if failed else ""))
+            print(f"Report saved: combined_engagement_report.json")
+    
+    def add_result(self, video_path, report):
+        """Add one video's report; the combined report is refreshed if it is due"""
+        self.results.append({
+            'video': os.path.splitext(os.path.basename(video_path))[0],
+            'report': report
+        })
+        if self.combined_at is None or time.monotonic() - self.combined_at >= self.combined_every:
+            self.generate_combined_report()
     
     def print_summary(self, report):
         """Print quick summary of results"""
@@ -69,7 +135,7 @@ class BatchVideoProcessor:
         print(f"   🤔 Doubts: {metrics['estimated_doubts']}")
     
     def generate_combined_report(self):
-        """Generate combined report for all videos"""
+        """Write the combined report for all videos finished so far"""
         if not self.results:
             return
         
@@ -79,14 +145,9 @@ class BatchVideoProcessor:
             'overall_statistics': self.calculate_overall_stats()
         }
         
-        with open('combined_engagement_report.json', 'w') as f:
-            json.dump(combined, f, indent=2)
-        
-        print(f"\n{'='*60}")
-        print("📊 COMBINED REPORT GENERATED")
-        print(f"{'='*60}")
-        print(f"Total Videos: {len(self.results)}")
-        print(f"Report saved: combined_engagement_report.json")
+        # Atomic, so a crash mid-batch still leaves the previous complete report
+        write_atomic('combined_engagement_report.json', json.dumps(combined, indent=2))
+        self.combined_at = time.monotonic()
     
     def calculate_overall_stats(self):
         """Calculate statistics across all videos"""
@@ -111,5 +172,21 @@ class BatchVideoProcessor:
 
 
 if __name__ == "__main__":
-    processor = BatchVideoProcessor()
+    parser = argparse.ArgumentParser(description="Analyze every video in a folder, skipping ones already done")
+    parser.add_argument('--assets', default="assets")
+    parser.add_argument('--workers', type=int, default=None, help="parallel videos (default: CPU count)")
+    parser.add_argument('--threads', type=int, default=None, help="OpenCV/BLAS threads per worker (default: cores / workers)")
+    parser.add_argument('--checkpoint-minutes', type=float, default=5.0, help="minutes of video between checkpoints")
+    parser.add_argument('--manifest', default="batch_manifest.json")
+    parser.add_argument('--output', choices=OUTPUT_MODES, default='video',
+                        help="annotated video, reports only, or a per-frame annotation sidecar")
+    parser.add_argument('--zones', default=None,
+                        help="seating-zone camera config, or a directory of <video>.json / default.json configs")
+    parser.add_argument('--session-log', action='store_true',
+                        help="also write per-frame, per-student rows to session_<video>.parquet")
+    args = parser.parse_args()
+    
+    processor = BatchVideoProcessor(args.assets, workers=args.workers, manifest_path=args.manifest,
+                                    checkpoint_every=args.checkpoint_minutes * 60, threads_per_worker=args.threads,
+                                    output_mode=args.output, zones_path=args.zones, session_log=args.session_log)
     processor.process_all_videos()
@@ -0,0 +1,157 @@
+"""
+Benchmark detect-once/track-many against every-frame Haar detection.
+Runs AccurateStudentAnalyzer over the same frames with detect_interval=1
+and detect_interval=N, then reports the speedup and metric drift.
+Drift is measured on sample-weighted scores: per-student averages are
+dominated by one-frame false positives that tracking naturally suppresses.
+
+With --pyramid, instead compares full-resolution Haar detection against
+downscale-then-refine detection on the same frames resized to 720p,
+1080p and 4K.
+
+Usage: python benchmark_detection.py [video] [--interval N] [--tolerance PTS] [--max-frames N]
+       python benchmark_detection.py [video] --pyramid [--min-face 0.06] [--max-frames N]
+"""
+
+import argparse
+import time
+import cv2
+import numpy as np
+from accurate_analyzer import AccurateStudentAnalyzer
+from scaled_detection import ScaledCascadeDetector
+from student_tracker import assign, iou_matrix
+
+RESOLUTIONS = {'720p': (1280, 720), '1080p': (1920, 1080), '4K': (3840, 2160)}
+
+
+def load_frames(video_path, max_frames):
+    """Decode frames up front so decoding is not part of the timing"""
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while cap.isOpened() and len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run_analyzer(frames, detect_interval):
+    """Time analyze_frame over all frames and summarise the resulting metrics"""
+    analyzer = AccurateStudentAnalyzer(detect_interval=detect_interval)
+    h, w = frames[0].shape[:2]
+    analyzer.frame_center = (w // 2, h // 2)
+    
+    start = time.perf_counter()
+    face_counts = [len(analyzer.analyze_frame(frame)['students']) for frame in frames]
+    elapsed = time.perf_counter() - start
+    
+    # Weight by samples so one-frame false positives don't swing the average
+    engagement = [v for d in analyzer.students.values() for v in d['engagement_score']]
+    attention = [v for d in analyzer.students.values() for v in d['attention_score']]
+    report = analyzer.generate_report(25, len(frames))
+    students = report['students']
+    return {
+        'seconds': elapsed,
+        'fps': len(frames) / elapsed if elapsed > 0 else 0,
+        'avg_faces': float(np.mean(face_counts)),
+        'students': len(students),
+        'avg_engagement': float(np.mean(engagement)) if engagement else 0.0,
+        'avg_attention': float(np.mean(attention)) if attention else 0.0,
+        'per_student_engagement': float(np.mean([s['engagement_score'] for s in students])) if students else 0.0,
+        'detector': analyzer.face_tracker.stats()
+    }
+
+
+def run_pyramid(frames, min_face_size):
+    """Time full-resolution vs downscaled detection at each benchmark resolution"""
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    
+    print("=" * 72)
+    print(f"{'Resolution':12}{'scale':>7}{'full ms':>10}{'scaled ms':>11}{'speedup':>9}{'faces':>9}{'recall':>9}")
+    
+    for name, size in RESOLUTIONS.items():
+        grays = [cv2.cvtColor(cv2.resize(f, size, interpolation=cv2.INTER_LINEAR), cv2.COLOR_BGR2GRAY)
+                 for f in frames]
+        full = ScaledCascadeDetector(cascade)
+        scaled = ScaledCascadeDetector(cascade, min_face_size=min_face_size)
+        
+        start = time.perf_counter()
+        full_boxes = [full.detect(g) for g in grays]
+        full_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        scaled_boxes = [scaled.detect(g) for g in grays]
+        scaled_time = time.perf_counter() - start
+        
+        # Recall: share of full-resolution faces also found by the scaled pass
+        found = total = 0
+        for a, b in zip(full_boxes, scaled_boxes):
+            total += len(a)
+            if len(a) and len(b):
+                overlap = iou_matrix(a, b)
+                found += len(assign(1 - overlap, 0.7))
+        
+        recall = found / total if total else 1.0
+        faces = f"{total}/{sum(len(b) for b in scaled_boxes)}"
+        print(f"{name:12}{scaled.frame_scale(grays[0]):7.2f}{full_time / len(grays) * 1000:10.1f}"
+              f"{scaled_time / len(grays) * 1000:11.1f}{full_time / scaled_time:8.2f}x{faces:>9}{recall:9.2f}")
+    
+    print("=" * 72)
+    print("faces = full/scaled detections, recall = full-res faces matched by scaled pass (IoU >= 0.3)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tracked vs every-frame face detection")
+    parser.add_argument('video', nargs='?', default="assets/215475_small.mp4")
+    parser.add_argument('--interval', type=int, default=5, help="full detection every N frames")
+    parser.add_argument('--tolerance', type=float, default=5.0, help="allowed drift in score points")
+    parser.add_argument('--max-frames', type=int, default=300)
+    parser.add_argument('--pyramid', action='store_true', help="benchmark downscaled detection across resolutions")
+    parser.add_argument('--min-face', type=float, default=0.06,
+                        help="expected minimum face size (pixels, or fraction of frame height)")
+    args = parser.parse_args()
+    
+    frames = load_frames(args.video, args.max_frames)
+    if not frames:
+        print(f"❌ Cannot read frames from: {args.video}")
+        return 1
+    
+    print(f"🎬 {args.video}: {len(frames)} frames at {frames[0].shape[1]}x{frames[0].shape[0]}")
+    
+    if args.pyramid:
+        run_pyramid(frames, args.min_face)
+        return 0
+    
+    baseline = run_analyzer(frames, 1)
+    tracked = run_analyzer(frames, args.interval)
+    
+    print("=" * 60)
+    print(f"{'':18}{'every frame':>14}{'interval ' + str(args.interval):>14}")
+    print(f"{'FPS':18}{baseline['fps']:14.2f}{tracked['fps']:14.2f}")
+    print(f"{'Avg faces':18}{baseline['avg_faces']:14.2f}{tracked['avg_faces']:14.2f}")
+    print(f"{'Avg engagement':18}{baseline['avg_engagement']:14.2f}{tracked['avg_engagement']:14.2f}")
+    print(f"{'Avg attention':18}{baseline['avg_attention']:14.2f}{tracked['avg_attention']:14.2f}")
+    print(f"{'Student IDs':18}{baseline['students']:14}{tracked['students']:14}")
+    print(f"{'Per-student eng.':18}{baseline['per_student_engagement']:14.2f}{tracked['per_student_engagement']:14.2f}")
+    print(f"{'Keyframes':18}{baseline['detector']['keyframes']:14}{tracked['detector']['keyframes']:14}")
+    print("=" * 60)
+    
+    speedup = baseline['seconds'] / tracked['seconds'] if tracked['seconds'] > 0 else 0
+    drift = max(abs(baseline['avg_engagement'] - tracked['avg_engagement']),
+                abs(baseline['avg_attention'] - tracked['avg_attention']))
+    
+    print(f"⚡ Speedup: {speedup:.2f}x")
+    print(f"📏 Max metric drift: {drift:.2f} points (tolerance {args.tolerance})")
+    
+    if drift > args.tolerance:
+        print("❌ Tracked metrics outside tolerance")
+        return 1
+    
+    print("✅ Tracked metrics within tolerance")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
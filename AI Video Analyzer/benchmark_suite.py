@@ -0,0 +1,341 @@
+"""
+Benchmark suite for the AI Video Analyzer hot paths.
+Synthesizes deterministic classroom-like frames (rows of drawn students
+that sway and take turns raising a hand) at several resolutions and face
+counts, so no video file or network access is needed. Each stage and each
+end-to-end analyzer is timed per frame; the report lists FPS, latency
+percentiles, peak RSS, per-frame allocations and GC runs, and is written as
+JSON for later comparison.
+
+Usage: python benchmark_suite.py [--resolutions 720p,1080p] [--faces 6,18] [--frames 30]
+                                 [--alloc-frames 5] [--output bench.json] [--baseline old.json] [--tolerance 10]
+"""
+
+import argparse
+import gc
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+import cv2
+import numpy as np
+from benchmark_detection import RESOLUTIONS
+from face_detector import FaceDetector
+from sentiment_analyzer import SentimentAnalyzer
+from student_tracker import StudentTracker
+from hand_features import HandFeatureExtractor
+from hand_raise_classifier import HandRaiseClassifier
+from main_analyzer import MainAnalyzer
+from accurate_analyzer import AccurateStudentAnalyzer
+from fixed_analyzer import FixedStudentAnalyzer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def draw_student(frame, cx, cy, size, rng, hand_raised):
+    """Draw one cartoon student (body, hair, face, eyes, nose, mouth) the Haar cascade detects"""
+    skin = (int(rng.integers(120, 170)), int(rng.integers(150, 190)), int(rng.integers(190, 230)))
+    line = max(1, size // 20)
+    
+    cv2.rectangle(frame, (cx - int(size * 0.7), cy + int(size * 0.55)),
+                  (cx + int(size * 0.7), cy + int(size * 1.6)), (60, 80, 120), -1)
+    if hand_raised:
+        arm_x = cx + int(size * 0.55)
+        cv2.rectangle(frame, (arm_x, cy - int(size * 1.3)), (arm_x + int(size * 0.2), cy + int(size * 0.7)), skin, -1)
+    
+    cv2.ellipse(frame, (cx, cy - size // 8), (int(size * 0.55), int(size * 0.62)), 0, 180, 360, (30, 30, 40), -1)
+    cv2.ellipse(frame, (cx, cy), (int(size * 0.45), int(size * 0.58)), 0, 0, 360, skin, -1)
+    for side in (-1, 1):
+        ex, ey = cx + side * int(size * 0.2), cy - int(size * 0.1)
+        cv2.line(frame, (ex - int(size * 0.12), ey - int(size * 0.12)), (ex + int(size * 0.12), ey - int(size * 0.12)),
+                 (40, 40, 50), line)
+        cv2.ellipse(frame, (ex, ey), (int(size * 0.1), int(size * 0.05)), 0, 0, 360, (240, 240, 240), -1)
+        cv2.circle(frame, (ex, ey), max(1, int(size * 0.045)), (30, 20, 20), -1)
+    cv2.line(frame, (cx, cy - int(size * 0.05)), (cx - int(size * 0.04), cy + int(size * 0.15)),
+             tuple(int(c * 0.75) for c in skin), line)
+    cv2.ellipse(frame, (cx, cy + int(size * 0.3)), (int(size * 0.15), int(size * 0.05)), 0, 0, 180, (60, 60, 150), line)
+
+
+def synthesize_frames(width, height, faces, count, seed=0):
+    """Deterministic classroom frames and the (x, y, w, h) face box of every student"""
+    cols = min(faces, max(1, math.ceil(math.sqrt(faces * width / height))))
+    rows = math.ceil(faces / cols)
+    size = int(min(height / (rows * 2.2 + 0.6), width / (cols * 1.6)))
+    
+    rng = np.random.default_rng(seed)
+    background = np.empty((height, width, 3), dtype=np.uint8)
+    background[:] = (110, 120, 130)
+    background = cv2.add(background, rng.integers(0, 20, background.shape, dtype=np.uint8))
+    phases = rng.random(faces) * 2 * np.pi
+    skin_seeds = rng.integers(0, 2**31, faces)
+    
+    frames, boxes = [], []
+    for i in range(count):
+        frame = background.copy()
+        frame_boxes = []
+        for k in range(faces):
+            row, col = divmod(k, cols)
+            # Gentle sway so trackers and optical flow have something to follow
+            cx = int(width * (col + 0.5) / cols + size * 0.08 * math.sin(i / 8 + phases[k]))
+            cy = int(size * (1.2 + row * 2.2))
+            hand_raised = (i // 15 + k) % 7 == 0
+            draw_student(frame, cx, cy, size, np.random.default_rng(skin_seeds[k]), hand_raised)
+            frame_boxes.append((cx - int(size * 0.45), cy - int(size * 0.58), int(size * 0.9), int(size * 1.16)))
+        frames.append(cv2.GaussianBlur(frame, (3, 3), 0))
+        boxes.append(np.array(frame_boxes, dtype=np.int32))
+    
+    return frames, boxes
+
+
+def summarize(latencies):
+    """FPS and latency percentiles (ms) for one stage"""
+    ms = np.array(latencies) * 1000
+    total = ms.sum() / 1000
+    return {
+        'frames': len(ms),
+        'fps': round(len(ms) / total, 2) if total > 0 else None,
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3)
+    }
+
+
+def gc_collections():
+    return sum(generation['collections'] for generation in gc.get_stats())
+
+
+def allocation_peak_kb(step, count, warmup):
+    """Mean peak of memory allocated during one step(i) call, numpy/OpenCV images included
+    
+    Runs under tracemalloc, so it is a separate untimed pass. Full-frame
+    copies and per-frame temporaries show up here even when they are freed
+    before the call returns.
+    """
+    peaks = []
+    tracemalloc.start()
+    try:
+        for i in range(count):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            step(i)
+            _, peak = tracemalloc.get_traced_memory()
+            if i >= warmup:
+                peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+    return round(float(np.mean(peaks)) / 1024, 1) if peaks else None
+
+
+def time_stage(step, count, warmup, alloc_frames=0):
+    """Call step(i) for every frame; warm-up calls are run but not recorded
+    
+    With alloc_frames, a second pass over that many frames after the
+    warm-up measures allocations (see allocation_peak_kb).
+    """
+    latencies = []
+    rss_before = peak_rss_mb()
+    gc_before = gc_collections()
+    for i in range(count):
+        start = time.perf_counter()
+        step(i)
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            latencies.append(elapsed)
+    
+    result = summarize(latencies)
+    result['gc_collections'] = gc_collections() - gc_before
+    result['peak_rss_mb'] = peak_rss_mb()
+    if rss_before is not None:
+        result['rss_growth_mb'] = round(result['peak_rss_mb'] - rss_before, 1)
+    if alloc_frames:
+        result['alloc_peak_kb'] = allocation_peak_kb(step, min(count, warmup + alloc_frames), warmup)
+    return result
+
+
+def stage_steps(frames, boxes):
+    """Per-frame callables for each hot-path stage on this scenario's frames"""
+    face_detector = FaceDetector()
+    sentiment = SentimentAnalyzer()
+    tracker = StudentTracker()
+    extractor = HandFeatureExtractor()
+    classifier = HandRaiseClassifier.load('hand_raise_model.pkl')
+    
+    # Inputs for the later stages come from the ground-truth boxes, not timed detection
+    rois = []
+    for frame, frame_boxes in zip(frames, boxes):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        rois.append([gray[y:y+h, x:x+w].copy() for (x, y, w, h) in frame_boxes])
+    features = [extractor.extract(frame, frame_boxes)[0] for frame, frame_boxes in zip(frames, boxes)]
+    
+    steps = {
+        'detect_faces': lambda i: face_detector.detect_faces(frames[i]),
+        'extract_hand_features': lambda i: extractor.extract(frames[i], boxes[i]),
+        'analyze_sentiment': lambda i: [sentiment.analyze_sentiment(k, roi) for k, roi in enumerate(rois[i])],
+        'student_tracker': lambda i: tracker.update(boxes[i])
+    }
+    if classifier is not None:
+        steps['hand_raise_classifier'] = lambda i: classifier.predict(features[i])
+    return steps
+
+
+def analyzer_steps(frames):
+    """Per-frame callables for the end-to-end analyzers"""
+    h, w = frames[0].shape[:2]
+    
+    main = MainAnalyzer()
+    main.frame_center = (w // 2, h // 2)
+    accurate = AccurateStudentAnalyzer()
+    accurate.frame_center = (w // 2, h // 2)
+    fixed = FixedStudentAnalyzer()
+    fixed.initialize_students(frames[0])
+    
+    steps = {
+        'MainAnalyzer.analyze_frame': lambda i: main.analyze_frame(frames[i]),
+        'AccurateStudentAnalyzer.analyze_frame': lambda i: accurate.analyze_frame(frames[i]),
+        'FixedStudentAnalyzer.analyze_frame': lambda i: fixed.analyze_frame(frames[i])
+    }
+    
+    # Overlay drawing on copies of the frames, with one analysis result per analyzer
+    # taken from separate instances so the timed analyzers' state is untouched
+    canvases = [frame.copy() for frame in frames]
+    annotators = {'MainAnalyzer': MainAnalyzer(), 'AccurateStudentAnalyzer': AccurateStudentAnalyzer(),
+                  'FixedStudentAnalyzer': FixedStudentAnalyzer()}
+    annotators['FixedStudentAnalyzer'].initialize_students(frames[0])
+    for name, analyzer in annotators.items():
+        result = analyzer.analyze_frame(frames[0])
+        steps[f"{name}.annotate_frame"] = (lambda analyzer, result:
+                                           lambda i: analyzer.annotate_frame(canvases[i], result))(analyzer, result)
+    
+    try:
+        from student_engagement_analyzer import StudentEngagementAnalyzer
+    except ImportError as e:
+        print(f"⚠️  Skipping StudentEngagementAnalyzer: {e}")
+        return steps
+    
+    engagement = StudentEngagementAnalyzer()
+    # Emotion inference needs downloaded weights; time the rest of the frame path
+    engagement.emotion_batcher.predict_fn = lambda batch: np.full((len(batch), 7), 1 / 7)
+    steps['StudentEngagementAnalyzer.process_frame'] = lambda i: engagement.process_frame(frames[i])
+    return steps
+
+
+def run_scenario(resolution, faces, count, warmup, alloc_frames):
+    width, height = RESOLUTIONS[resolution]
+    frames, boxes = synthesize_frames(width, height, faces, count)
+    
+    results = {}
+    for name, step in {**stage_steps(frames, boxes), **analyzer_steps(frames)}.items():
+        np.random.seed(0)
+        results[name] = time_stage(step, count, warmup, alloc_frames)
+    return results
+
+
+def print_results(scenario, results):
+    print(f"\n📊 {scenario}")
+    print(f"{'stage':42}{'fps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'peak MB':>9}{'alloc KB':>10}{'gc':>6}")
+    for name, r in results.items():
+        alloc = r.get('alloc_peak_kb')
+        print(f"{name:42}{r['fps'] or 0:9.1f}{r['p50_ms']:9.2f}{r['p95_ms']:9.2f}{r['p99_ms']:9.2f}"
+              f"{r['peak_rss_mb'] or 0:9.0f}{alloc if alloc is not None else '-':>10}{r['gc_collections']:6}")
+
+
+def compare(results, baseline, tolerance):
+    """Print FPS change per stage against a baseline run; returns the regressions"""
+    regressions = []
+    print("\n" + "=" * 72)
+    print(f"📏 Compared with baseline from {baseline['meta']['timestamp']} (tolerance {tolerance}%)")
+    print(f"{'scenario / stage':52}{'base fps':>10}{'fps':>10}{'':10}{'base KB':>10}{'alloc KB':>10}")
+    
+    for scenario, stages in results.items():
+        for name, r in stages.items():
+            old = baseline['results'].get(scenario, {}).get(name)
+            if not old or not old['fps'] or not r['fps']:
+                continue
+            change = (r['fps'] - old['fps']) / old['fps'] * 100
+            mark = "❌" if change < -tolerance else ("⚡" if change > tolerance else "  ")
+            allocs = ""
+            if old.get('alloc_peak_kb') is not None and r.get('alloc_peak_kb') is not None:
+                allocs = f"{old['alloc_peak_kb']:10.1f}{r['alloc_peak_kb']:10.1f}"
+            print(f"{scenario + ' / ' + name:52}{old['fps']:10.1f}{r['fps']:10.1f} {mark} {change:+6.1f}%{allocs}")
+            if change < -tolerance:
+                regressions.append((scenario, name, change))
+    
+    print("=" * 72)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark analyzer hot paths on synthetic classroom frames")
+    parser.add_argument('--resolutions', default="720p,1080p", help=f"comma list of {', '.join(RESOLUTIONS)}")
+    parser.add_argument('--faces', default="6,18", help="comma list of students per frame")
+    parser.add_argument('--frames', type=int, default=30, help="frames per scenario")
+    parser.add_argument('--warmup', type=int, default=3, help="untimed frames at the start of each stage")
+    parser.add_argument('--alloc-frames', type=int, default=5,
+                        help="frames per stage measured for allocations after timing (0 to skip)")
+    parser.add_argument('--output', default="benchmark_results.json")
+    parser.add_argument('--baseline', help="earlier --output file to compare against")
+    parser.add_argument('--tolerance', type=float, default=10.0, help="allowed FPS drop in percent")
+    args = parser.parse_args()
+    
+    resolutions = [r.strip() for r in args.resolutions.split(',')]
+    face_counts = [int(f) for f in args.faces.split(',')]
+    for resolution in resolutions:
+        if resolution not in RESOLUTIONS:
+            print(f"❌ Unknown resolution: {resolution}")
+            return 1
+    
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'frames': args.frames,
+            'warmup': args.warmup,
+            'alloc_frames': args.alloc_frames
+        },
+        'results': {}
+    }
+    
+    print(f"🎬 {len(resolutions) * len(face_counts)} scenarios, {args.frames} frames each ({args.warmup} warm-up)")
+    for resolution in resolutions:
+        for faces in face_counts:
+            scenario = f"{resolution}_{faces}faces"
+            report['results'][scenario] = run_scenario(resolution, faces, args.frames, args.warmup, args.alloc_frames)
+            print_results(scenario, report['results'][scenario])
+    
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results saved: {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report['results'], baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} stage(s) slower than baseline")
+            return 1
+        print("✅ No regressions beyond tolerance")
+    
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,181 @@
+"""
+Seating-zone masks: analyze only the part of the frame where students sit.
+
+A wide-angle classroom camera also sees the whiteboard, the ceiling and
+the teacher. The analyzers used to search all of it for faces and hands.
+This counted the teacher as a student and spent most of the detection
+time on pixels that never hold one.
+
+A camera config names its seating regions as polygons:
+
+    {
+      "camera": "room-204-back",
+      "frame_size": [1920, 1080],
+      "margin": 0.05,
+      "zones": {
+        "front-left":  [[120, 610], [930, 610], [960, 1080], [40, 1080]],
+        "front-right": [[990, 610], [1800, 610], [1880, 1080], [1020, 1080]]
+      }
+    }
+
+Points are pixels at frame_size, or fractions of the frame when frame_size
+is left out, so one config also fits a downscaled copy of the recording.
+Detection runs on the union bounding box of the zones, grown by margin (a
+fraction of the frame height) so heads at the edge of a zone are not cut
+off. Faces are assigned to the zone under their box center, and faces
+outside every zone are ignored. Where zones overlap, the one listed first
+wins.
+"""
+
+import json
+import os
+from collections import Counter, defaultdict
+import cv2
+import numpy as np
+from student_tracker import box_centers
+
+
+class ClassroomZones:
+    """Seating-region polygons of one camera, fitted to a frame size on first use"""
+    
+    def __init__(self, zones, frame_size=None, margin=0.05, camera=None):
+        self.names = list(zones)
+        self.polygons = [np.asarray(points, dtype=np.float64).reshape(-1, 2) for points in zones.values()]
+        self.frame_size = tuple(frame_size) if frame_size else None
+        self.margin = margin
+        self.camera = camera
+        
+        self.size = None
+        self.labels = None    # (h, w) uint8: 0 outside every zone, i + 1 inside zone i
+        self.crop_box = None  # (x, y, w, h) union bounding box of the zones plus margin
+    
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            config = json.load(f)
+        return cls(config['zones'], frame_size=config.get('frame_size'), margin=config.get('margin', 0.05),
+                   camera=config.get('camera', os.path.splitext(os.path.basename(path))[0]))
+    
+    def fingerprint(self):
+        """Stable text of the config, for batch job keys"""
+        return json.dumps({'zones': {name: polygon.tolist() for name, polygon in zip(self.names, self.polygons)},
+                           'frame_size': self.frame_size, 'margin': self.margin}, sort_keys=True)
+    
+    def fit(self, img_w, img_h):
+        """Rasterize the zones for this frame size (cached until the size changes)"""
+        if self.size == (img_w, img_h):
+            return self
+        
+        scale = ([img_w / self.frame_size[0], img_h / self.frame_size[1]] if self.frame_size
+                 else [img_w, img_h])
+        polygons = [np.round(polygon * scale).astype(np.int32) for polygon in self.polygons]
+        
+        self.labels = np.zeros((img_h, img_w), dtype=np.uint8)
+        # Drawn last to first so the first listed zone wins where two overlap
+        for label in range(len(polygons), 0, -1):
+            cv2.fillPoly(self.labels, [polygons[label - 1]], label)
+        
+        x, y, w, h = cv2.boundingRect(np.concatenate(polygons))
+        pad = int(round(self.margin * img_h))
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        x1, y1 = min(img_w, x + w + pad), min(img_h, y + h + pad)
+        self.crop_box = (x0, y0, max(1, x1 - x0), max(1, y1 - y0))
+        self.size = (img_w, img_h)
+        
+        print(f"🪑 {len(self.names)} seating zone(s) for {self.camera or 'camera'}: analyzing "
+              f"{self.crop_box[2]}x{self.crop_box[3]} of {img_w}x{img_h} ({self.coverage() * 100:.0f}% of pixels)")
+        return self
+    
+    def crop(self, frame):
+        """View of the frame inside crop_box; add crop_box[:2] to map coordinates back"""
+        img_h, img_w = frame.shape[:2]
+        x, y, w, h = self.fit(img_w, img_h).crop_box
+        return frame[y:y+h, x:x+w]
+    
+    def detect(self, detector, gray):
+        """Faces a ScaledCascadeDetector or TrackedFaceDetector finds in the seating area of gray
+        
+        The detector only sees crop_box. Returns the full-frame (N, 4) boxes
+        of faces inside a zone and the zone name of each; faces outside
+        every zone are dropped.
+        """
+        img_h, img_w = gray.shape[:2]
+        x0, y0 = self.fit(img_w, img_h).crop_box[:2]
+        # A fractional min_face_size is of the full frame height, not of the crop
+        getattr(detector, 'scaled_detector', detector).frame_height = img_h
+        boxes = np.asarray(detector.detect(self.crop(gray)), dtype=np.int32).reshape(-1, 4) + (x0, y0, 0, 0)
+        zones = self.zones_of(boxes)
+        inside = [i for i, zone in enumerate(zones) if zone is not None]
+        return boxes[inside], [zones[i] for i in inside]
+    
+    def zones_of(self, boxes):
+        """Zone name under each full-frame (x, y, w, h) box center, None outside every zone"""
+        centers = box_centers(boxes).astype(np.int64)
+        if not len(centers):
+            return []
+        img_h, img_w = self.labels.shape
+        labels = self.labels[np.clip(centers[:, 1], 0, img_h - 1), np.clip(centers[:, 0], 0, img_w - 1)]
+        return [self.names[label - 1] if label else None for label in labels.tolist()]
+    
+    def coverage(self):
+        """Fraction of the frame's pixels inside crop_box"""
+        return self.crop_box[2] * self.crop_box[3] / (self.size[0] * self.size[1])
+
+
+def zones_for(video_path, zones_path):
+    """Camera config for a video: zones_path itself, or from a directory of configs
+    
+    In a directory, <video name>.json is used if it exists, default.json
+    otherwise. Returns None when there is no config (analyze the whole frame).
+    """
+    if not zones_path:
+        return None
+    if os.path.isdir(zones_path):
+        video_name = os.path.splitext(os.path.basename(video_path))[0]
+        for name in (f"{video_name}.json", "default.json"):
+            path = os.path.join(zones_path, name)
+            if os.path.exists(path):
+                return ClassroomZones.load(path)
+        return None
+    return ClassroomZones.load(zones_path)
+
+
+class ZoneTally:
+    """Frames each student was seen in each zone; a student belongs to their most frequent zone"""
+    
+    def __init__(self, counts=None):
+        self.counts = defaultdict(Counter)
+        self.merge(counts or {})
+    
+    def add(self, student_id, zone):
+        self.counts[student_id][zone] += 1
+    
+    def merge(self, counts):
+        """Add counts from export() of a checkpoint or a later shard"""
+        for student_id, zones in counts.items():
+            self.counts[student_id].update(zones)
+    
+    def export(self):
+        return {student_id: dict(zones) for student_id, zones in self.counts.items()}
+    
+    def zone_of(self, student_id):
+        zones = self.counts.get(student_id)
+        return zones.most_common(1)[0][0] if zones else None
+
+
+def zone_metrics(zone_names, student_reports, averages, totals):
+    """Per-zone aggregates of student reports that carry a 'zone' field
+    
+    averages and totals map output names to student report fields, e.g.
+    {'average_focus_score': 'focus_score'}. Every zone is listed, including
+    ones where nobody was seen.
+    """
+    metrics = {}
+    for zone in zone_names:
+        students = [report for report in student_reports if report.get('zone') == zone]
+        metrics[zone] = {'students': len(students)}
+        for name, field in averages.items():
+            metrics[zone][name] = round(sum(s[field] for s in students) / len(students), 2) if students else 0
+        for name, field in totals.items():
+            metrics[zone][name] = sum(s[field] for s in students)
+    return metrics
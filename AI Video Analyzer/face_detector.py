@@ -1,26 +1,53 @@
-import cv2
 import numpy as np
+from face_tracking import TrackedFaceDetector
+from frame_buffers import FrameBuffers
+from model_registry import models
 
 class FaceDetector:
-    def __init__(self):
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+    def __init__(self, detect_interval=1, min_face_size=30, zones=None):
+        # Loaded once per process and shared between analyzers (see model_registry)
+        self.face_cascade = models.get('cascade', 'haarcascade_frontalface_default.xml')
+        self.eye_cascade = models.get('cascade', 'haarcascade_eye.xml')
+        # Full cascade every detect_interval frames, optical-flow tracking in between
+        # min_face_size > 30 (or a fraction of frame height) detects on a downscaled frame
+        self.tracker = TrackedFaceDetector(self.face_cascade, detect_interval=detect_interval,
+                                           min_face_size=min_face_size)
+        # Grayscale conversion reuses two buffers; the tracker holds the previous one
+        self.buffers = FrameBuffers(depth=2)
+        # ClassroomZones: detect only inside the seating area and drop faces outside every zone
+        self.zones = zones
     
     def detect_faces(self, frame):
         """Detect all faces in frame"""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(30, 30))
+        offset_x = offset_y = 0
+        if self.zones:
+            img_h, img_w = frame.shape[:2]
+            # A fractional min_face_size is of the full frame height, not of the cropped seating area
+            self.tracker.scaled_detector.frame_height = img_h
+            offset_x, offset_y = self.zones.fit(img_w, img_h).crop_box[:2]
+            frame = self.zones.crop(frame)
+        
+        gray = self.buffers.gray(frame)
+        faces = self.tracker.detect(gray)
+        
+        zones = [None] * len(faces)
+        if self.zones:
+            zones = self.zones.zones_of([(x + offset_x, y + offset_y, w, h) for (x, y, w, h) in faces])
         
         results = []
-        for (x, y, w, h) in faces:
+        for (x, y, w, h), zone in zip(faces, zones):
+            if self.zones and zone is None:
+                continue
             face_roi = gray[y:y+h, x:x+w]
             eyes = self.eye_cascade.detectMultiScale(face_roi, 1.1, 3)
             
+            x, y = x + offset_x, y + offset_y
             results.append({
                 'bbox': (x, y, w, h),
                 'face_roi': face_roi,
                 'eyes': eyes,
-                'center': (x + w//2, y + h//2)
+                'center': (x + w//2, y + h//2),
+                'zone': zone
             })
         
         return results
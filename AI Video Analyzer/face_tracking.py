@@ -0,0 +1,133 @@
+import cv2
+import numpy as np
+from scaled_detection import ScaledCascadeDetector, BASE_MIN_FACE
+
+
+class TrackedFaceDetector:
+    """Runs the Haar face cascade every N frames and tracks boxes in between
+    
+    Between detections each box is moved by the median Lucas-Kanade optical
+    flow of corner features inside it. A full detection is forced early when
+    the scene changes (thumbnail difference) or a track loses its features.
+    With detect_interval=1 this is exactly detectMultiScale on every frame.
+    
+    min_face_size/scale enable downscaled detection for high-resolution
+    sources (see ScaledCascadeDetector); tracking stays at full resolution.
+    """
+    
+    THUMB_SIZE = (64, 36)
+    
+    def __init__(self, face_cascade, detect_interval=1, scene_change_threshold=25.0,
+                 min_track_points=3, max_corners=12, min_face_size=BASE_MIN_FACE, scale=None):
+        self.face_cascade = face_cascade
+        self.scaled_detector = ScaledCascadeDetector(face_cascade, min_face_size=min_face_size, scale=scale)
+        self.detect_interval = max(1, int(detect_interval))
+        self.scene_change_threshold = scene_change_threshold
+        self.min_track_points = min_track_points
+        self.max_corners = max_corners
+        
+        self.boxes = np.empty((0, 4), dtype=np.int32)
+        self.points = None
+        self.point_owner = None
+        self.prev_gray = None
+        self.key_thumb = None
+        self.frames_since_detect = 0
+        self.force_detect = True
+        
+        self.keyframes = 0
+        self.tracked_frames = 0
+    
+    def detect_full(self, gray):
+        """Full-frame cascade detection"""
+        return self.scaled_detector.detect(gray)
+    
+    def detect(self, gray):
+        """Return face boxes (x, y, w, h) for this grayscale frame"""
+        if self.detect_interval == 1:
+            self.keyframes += 1
+            return self.detect_full(gray)
+        
+        thumb = cv2.resize(gray, self.THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        scene_changed = (self.key_thumb is not None and
+                         cv2.absdiff(thumb, self.key_thumb).mean() > self.scene_change_threshold)
+        
+        if self.force_detect or scene_changed or self.frames_since_detect >= self.detect_interval:
+            faces = self.detect_full(gray)
+            self.boxes = np.array(faces, dtype=np.int32).reshape(-1, 4)
+            self.seed_points(gray)
+            self.key_thumb = thumb
+            self.frames_since_detect = 1
+            self.force_detect = False
+            self.keyframes += 1
+        else:
+            self.track(gray)
+            self.frames_since_detect += 1
+            self.tracked_frames += 1
+        
+        self.prev_gray = gray
+        return self.boxes.copy()
+    
+    def seed_points(self, gray):
+        """Pick corner features inside every box to follow with optical flow"""
+        points = []
+        owners = []
+        
+        for i, (x, y, w, h) in enumerate(self.boxes):
+            roi = gray[y:y+h, x:x+w]
+            corners = cv2.goodFeaturesToTrack(roi, self.max_corners, 0.01, max(2, w // 10))
+            if corners is None:
+                continue
+            corners = corners.reshape(-1, 2) + (x, y)
+            points.append(corners)
+            owners.append(np.full(len(corners), i))
+        
+        if points:
+            self.points = np.concatenate(points).astype(np.float32).reshape(-1, 1, 2)
+            self.point_owner = np.concatenate(owners)
+        else:
+            self.points = None
+            self.point_owner = None
+    
+    def track(self, gray):
+        """Move each box by the median flow of its features"""
+        if self.points is None or len(self.boxes) == 0:
+            if len(self.boxes):
+                self.force_detect = True
+            self.boxes = np.empty((0, 4), dtype=np.int32)
+            return
+        
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, self.points, None)
+        good = status.reshape(-1) == 1
+        flow = (new_points - self.points).reshape(-1, 2)
+        
+        img_h, img_w = gray.shape[:2]
+        keep = []
+        
+        for i in range(len(self.boxes)):
+            mask = good & (self.point_owner == i)
+            if mask.sum() < self.min_track_points:
+                # Lost this face; drop it now and re-detect on the next frame
+                self.force_detect = True
+                continue
+            
+            dx, dy = np.median(flow[mask], axis=0)
+            x, y, w, h = self.boxes[i]
+            self.boxes[i, 0] = min(max(0, int(round(x + dx))), img_w - w)
+            self.boxes[i, 1] = min(max(0, int(round(y + dy))), img_h - h)
+            keep.append(i)
+        
+        keep_points = good & np.isin(self.point_owner, keep)
+        remap = {old: new for new, old in enumerate(keep)}
+        
+        self.boxes = self.boxes[keep]
+        self.points = new_points[keep_points]
+        self.point_owner = np.array([remap[o] for o in self.point_owner[keep_points]], dtype=np.int64)
+    
+    def stats(self):
+        """Keyframe vs tracked frame counts"""
+        total = self.keyframes + self.tracked_frames
+        return {
+            'keyframes': self.keyframes,
+            'tracked_frames': self.tracked_frames,
+            'detection_ratio': round(self.keyframes / total, 3) if total else 0
+        }
@@ -1,72 +1,42 @@
 import cv2
 import numpy as np
 import csv
-import pickle
 import os
-from collections import defaultdict, deque
+import sys
+from collections import deque
+from video_pipeline import VideoPipeline
+from annotation_sidecar import AnnotationSidecar, OUTPUT_MODES
+from session_log import SessionLog
+from frame_buffers import FrameBuffers, shade_panel
+from scaled_detection import ScaledCascadeDetector
+from student_tracker import assign, centroid_distances
+from hand_features import HandFeatureExtractor
+from model_registry import models
+from classroom_zones import ClassroomZones, ZoneTally, zone_metrics
 
 class FixedStudentAnalyzer:
-    def __init__(self):
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+    def __init__(self, min_face_size=30, zones=None):
+        # Loaded once per process and shared between analyzers (see model_registry)
+        self.face_cascade = models.get('cascade', 'haarcascade_frontalface_default.xml')
+        self.eye_cascade = models.get('cascade', 'haarcascade_eye.xml')
+        # min_face_size > 30 (or a fraction of frame height) detects on a downscaled frame
+        self.face_detector = ScaledCascadeDetector(self.face_cascade, min_face_size=min_face_size)
+        self.buffers = FrameBuffers(depth=1)  # Grayscale scratch image, reused every frame
+        # zones (ClassroomZones) limits detection to the seating area and adds per-zone metrics
+        self.zones = zones
+        self.zone_tally = ZoneTally()
         
-        if os.path.exists('hand_raise_model.pkl'):
-            with open('hand_raise_model.pkl', 'rb') as f:
-                self.hand_raise_model = pickle.load(f)
-        else:
-            self.hand_raise_model = None
+        self.hand_raise_model = models.get('hand_raise', 'hand_raise_model.pkl', 0.6)
+        self.hand_features = HandFeatureExtractor()
         
         self.students = {}
         self.frame_count = 0
         self.max_students = 6  # Fixed number
     
-    def extract_hand_features(self, frame, face_bbox):
-        x, y, w, h = face_bbox
-        above_h = int(h * 1.5)
-        above_y = max(0, y - above_h)
-        above_region = frame[above_y:y, max(0, x-w//2):min(frame.shape[1], x+w+w//2)]
-        
-        if above_region.size == 0:
-            return None
-        
-        hsv = cv2.cvtColor(above_region, cv2.COLOR_BGR2HSV)
-        lower_skin = np.array([0, 20, 70], dtype=np.uint8)
-        upper_skin = np.array([20, 255, 255], dtype=np.uint8)
-        skin_mask = cv2.inRange(hsv, lower_skin, upper_skin)
-        
-        features = [np.sum(skin_mask > 0) / skin_mask.size]
-        
-        vertical_profile = np.sum(skin_mask, axis=1)
-        if len(vertical_profile) > 0:
-            top = np.sum(vertical_profile[:len(vertical_profile)//3])
-            mid = np.sum(vertical_profile[len(vertical_profile)//3:2*len(vertical_profile)//3])
-            bot = np.sum(vertical_profile[2*len(vertical_profile)//3:])
-            total = top + mid + bot
-            features.extend([top/total if total > 0 else 0, mid/total if total > 0 else 0, bot/total if total > 0 else 0])
-        else:
-            features.extend([0, 0, 0])
-        
-        horizontal_profile = np.sum(skin_mask, axis=0)
-        if len(horizontal_profile) > 0:
-            left = np.sum(horizontal_profile[:len(horizontal_profile)//2])
-            right = np.sum(horizontal_profile[len(horizontal_profile)//2:])
-            total = left + right
-            features.extend([left/total if total > 0 else 0.5, right/total if total > 0 else 0.5])
-        else:
-            features.extend([0.5, 0.5])
-        
-        gray_above = cv2.cvtColor(above_region, cv2.COLOR_BGR2GRAY)
-        features.append(np.mean(gray_above) / 255.0)
-        edges = cv2.Canny(gray_above, 50, 150)
-        features.append(np.sum(edges > 0) / edges.size)
-        features.append(above_region.shape[0] / above_region.shape[1] if above_region.shape[1] > 0 else 1)
-        
-        return np.array(features)
-    
     def initialize_students(self, first_frame):
         """Initialize fixed student positions from first frame"""
         gray = cv2.cvtColor(first_frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(30, 30))
+        faces = self.detect(gray)[0]
         
         # Sort faces left to right, top to bottom
         faces_sorted = sorted(faces, key=lambda f: (f[1], f[0]))
@@ -87,21 +57,39 @@ class FixedStudentAnalyzer:
         
         print(f"✓ Initialized {len(self.students)} students")
     
-    def match_face_to_student(self, face_center):
-        """Match detected face to closest student"""
-        min_dist = float('inf')
-        matched_id = None
-        
-        for sid, data in self.students.items():
-            dist = np.sqrt((face_center[0] - data['base_position'][0])**2 + 
-                          (face_center[1] - data['base_position'][1])**2)
-            if dist < min_dist:
-                min_dist = dist
-                matched_id = sid
-        
-        return matched_id if min_dist < 150 else None
+    def detect(self, gray):
+        """Face boxes and their seating zones (None for every face without zones)"""
+        if self.zones:
+            return self.zones.detect(self.face_detector, gray)
+        faces = self.face_detector.detect(gray)
+        return faces, [None] * len(faces)
+    
+    def match_faces_to_students(self, face_centers):
+        """Match detected faces to fixed students (one face per student)"""
+        matches = [None] * len(face_centers)
+        if not self.students or not len(face_centers):
+            return matches
+        
+        student_ids = list(self.students.keys())
+        base_positions = [self.students[sid]['base_position'] for sid in student_ids]
+        distances = centroid_distances(face_centers, base_positions)
+        
+        for face_idx, student_idx in assign(distances, 150):
+            matches[face_idx] = student_ids[student_idx]
+        
+        return matches
     
-    def process_video(self, video_path, output_path):
+    def process_video(self, video_path, output_path, output_mode='video', session_log_path=None):
+        """Process video and generate annotated output
+        
+        output_mode 'metrics' skips drawing and encoding, 'sidecar' writes
+        per-frame results to output_path instead (see annotation_sidecar).
+        session_log_path also writes one row per student per frame as
+        Parquet/Arrow part files (see session_log).
+        """
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"output_mode must be one of {OUTPUT_MODES}, got {output_mode!r}")
+        
         cap = cv2.VideoCapture(video_path)
         
         if not cap.isOpened():
@@ -113,8 +101,24 @@ class FixedStudentAnalyzer:
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        out, sidecar = None, None
+        if output_mode == 'video':
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        elif output_mode == 'sidecar':
+            sidecar = AnnotationSidecar(output_path, video_path, 'fixed_analyzer.FixedStudentAnalyzer', fps, (width, height))
+            sidecar.begin()
+        
+        session_log = None
+        if session_log_path:
+            video_name = os.path.splitext(os.path.basename(video_path))[0]
+            session_log = SessionLog(session_log_path, video_name, fps, self.session_rows)
+            session_log.begin()
+        recorders = [recorder for recorder in (sidecar, session_log) if recorder]
+        
+        def record_result(frame_idx, result):
+            for recorder in recorders:
+                recorder.write(frame_idx, result)
         
         print(f"🎬 Processing: {video_path}")
         
@@ -124,114 +128,144 @@ class FixedStudentAnalyzer:
             self.initialize_students(first_frame)
             cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            self.frame_count += 1
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(30, 30))
-            
-            # Track which students were detected this frame
-            detected_students = set()
-            
-            for (x, y, w, h) in faces:
-                center = (x + w//2, y + h//2)
-                student_id = self.match_face_to_student(center)
+        def progress(frames_read):
+            if frames_read % 30 == 0:
+                print(f"Progress: {(frames_read/total_frames)*100:.1f}%", end='\r')
+        
+        # Without a writer the pipeline has no annotate/encode stages at all
+        pipeline = VideoPipeline(self.analyze_frame, self.annotate_frame, out, progress_fn=progress,
+                                 recycle_frames=True, result_fn=record_result if recorders else None)
+        pipeline.run(cap)
+        
+        cap.release()
+        if out:
+            out.release()
+        for recorder in recorders:
+            recorder.close()
+        
+        print(f"\n✅ Complete!" + (f" Output: {output_path}" if out else ""))
+        pipeline.print_stats()
+        return self.generate_report(fps, total_frames)
+    
+    def analyze_frame(self, frame):
+        """Match detected faces to the fixed students and score them"""
+        self.frame_count += 1
+        gray = self.buffers.gray(frame)
+        faces, zones = self.detect(gray)
+        
+        centers = [(x + w//2, y + h//2) for (x, y, w, h) in faces]
+        student_ids = self.match_faces_to_students(centers)
+        students = []
+        
+        # Classify hand raises for all matched faces in one batch
+        hands = np.zeros(len(faces), dtype=bool)
+        matched = [i for i, student_id in enumerate(student_ids) if student_id]
+        if self.hand_raise_model and matched:
+            boxes = np.asarray(faces).reshape(-1, 4)[matched]
+            hands[matched] = self.hand_features.hand_raised(self.hand_raise_model, frame, boxes)
+        
+        for (x, y, w, h), center, student_id, hand_raised, zone in zip(faces, centers, student_ids, hands, zones):
+            if student_id:
+                data = self.students[student_id]
+                if self.zones:
+                    self.zone_tally.add(student_id, zone)
                 
-                if student_id and student_id not in detected_students:
-                    detected_students.add(student_id)
-                    data = self.students[student_id]
-                    
-                    data['positions'].append(center)
-                    
-                    if len(data['positions']) > 1:
-                        prev_pos = data['positions'][-2]
-                        movement = np.sqrt((center[0] - prev_pos[0])**2 + (center[1] - prev_pos[1])**2)
-                        data['movement'].append(movement)
-                    
-                    face_roi = gray[y:y+h, x:x+w]
-                    eyes = self.eye_cascade.detectMultiScale(face_roi, 1.1, 3)
-                    data['eye_visibility'].append(1 if len(eyes) >= 2 else 0)
-                    
-                    # Hand raise detection
-                    hand_raised = False
-                    if self.hand_raise_model:
-                        features = self.extract_hand_features(frame, (x, y, w, h))
-                        if features is not None:
-                            pred = self.hand_raise_model.predict([features])[0]
-                            prob = self.hand_raise_model.predict_proba([features])[0][1]
-                            hand_raised = pred == 1 and prob > 0.6
-                            
-                            if hand_raised and (self.frame_count - data['last_hand_raise']) > 30:
-                                data['hand_raises'] += 1
-                                data['last_hand_raise'] = self.frame_count
-                    
-                    # Calculate scores
-                    eye_score = np.mean(data['eye_visibility']) * 100 if data['eye_visibility'] else 0
-                    
-                    if len(data['movement']) > 5:
-                        avg_movement = np.mean(list(data['movement'])[-10:])
-                        movement_score = max(0, 100 - avg_movement * 2)
-                    else:
-                        movement_score = 50
-                    
-                    engagement = eye_score * 0.7 + movement_score * 0.3
-                    
-                    if len(data['positions']) >= 10:
-                        recent = list(data['positions'])[-10:]
-                        x_var = np.var([p[0] for p in recent])
-                        y_var = np.var([p[1] for p in recent])
-                        attention = max(0, 100 - (x_var + y_var) / 10)
-                    else:
-                        attention = 50
-                    
-                    data['engagement_score'].append(engagement)
-                    data['attention_score'].append(attention)
-                    
-                    # Draw
-                    color = (0, 255, 0) if engagement > 60 else (0, 165, 255) if engagement > 40 else (0, 0, 255)
-                    cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
-                    cv2.putText(frame, student_id.replace('Student_', 'S'), (x, y-10), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                    
-                    status = "Engaged" if engagement > 60 else "Moderate" if engagement > 40 else "Distracted"
-                    cv2.putText(frame, status, (x, y+h+15), cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
-                    
-                    if hand_raised:
-                        cv2.putText(frame, "HAND UP!", (x, y+h+30), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 2)
-            
-            # Draw stats
-            overlay = frame.copy()
-            cv2.rectangle(overlay, (10, 10), (300, 120), (0, 0, 0), -1)
-            cv2.addWeighted(overlay, 0.6, frame, 0.4, 0, frame)
-            
-            cv2.putText(frame, f"Students: {len(self.students)}", (20, 35), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            avg_eng = np.mean([np.mean(d['engagement_score']) for d in self.students.values() if d['engagement_score']])
-            avg_att = np.mean([np.mean(d['attention_score']) for d in self.students.values() if d['attention_score']])
-            total_hands = sum(d['hand_raises'] for d in self.students.values())
+                data['positions'].append(center)
+                
+                if len(data['positions']) > 1:
+                    prev_pos = data['positions'][-2]
+                    movement = np.sqrt((center[0] - prev_pos[0])**2 + (center[1] - prev_pos[1])**2)
+                    data['movement'].append(movement)
+                
+                face_roi = gray[y:y+h, x:x+w]
+                eyes = self.eye_cascade.detectMultiScale(face_roi, 1.1, 3)
+                data['eye_visibility'].append(1 if len(eyes) >= 2 else 0)
+                
+                # Hand raise detection
+                hand_raised = bool(hand_raised)
+                if hand_raised and (self.frame_count - data['last_hand_raise']) > 30:
+                    data['hand_raises'] += 1
+                    data['last_hand_raise'] = self.frame_count
+                
+                # Calculate scores
+                eye_score = np.mean(data['eye_visibility']) * 100 if data['eye_visibility'] else 0
+                
+                if len(data['movement']) > 5:
+                    avg_movement = np.mean(list(data['movement'])[-10:])
+                    movement_score = max(0, 100 - avg_movement * 2)
+                else:
+                    movement_score = 50
+                
+                engagement = eye_score * 0.7 + movement_score * 0.3
+                
+                if len(data['positions']) >= 10:
+                    recent = list(data['positions'])[-10:]
+                    x_var = np.var([p[0] for p in recent])
+                    y_var = np.var([p[1] for p in recent])
+                    attention = max(0, 100 - (x_var + y_var) / 10)
+                else:
+                    attention = 50
+                
+                data['engagement_score'].append(engagement)
+                data['attention_score'].append(attention)
+                
+                students.append({
+                    'student_id': student_id,
+                    'bbox': (x, y, w, h),
+                    'engagement': engagement,
+                    'attention': attention,
+                    'hand_raised': hand_raised
+                })
+        
+        stats = {
+            'student_count': len(self.students),
+            'avg_engagement': np.mean([np.mean(d['engagement_score']) for d in self.students.values() if d['engagement_score']]),
+            'avg_attention': np.mean([np.mean(d['attention_score']) for d in self.students.values() if d['attention_score']]),
+            'total_hands': sum(d['hand_raises'] for d in self.students.values())
+        }
+        
+        return {'students': students, 'stats': stats}
+    
+    @staticmethod
+    def session_rows(result):
+        """Session log rows of one frame's result; attention is the focus measure, with no decision or emotion"""
+        for student in result['students']:
+            yield (student['student_id'], student['bbox'], student['attention'], None, None,
+                   student['hand_raised'], student['engagement'])
+    
+    @staticmethod
+    def annotate_frame(frame, result):
+        """Draw a frame's analysis result onto it; also renders sidecar results at playback"""
+        for student in result['students']:
+            x, y, w, h = student['bbox']
+            engagement = student['engagement']
             
-            cv2.putText(frame, f"Avg Engagement: {avg_eng:.1f}%", (20, 60), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-            cv2.putText(frame, f"Avg Attention: {avg_att:.1f}%", (20, 85), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
-            cv2.putText(frame, f"Hand Raises: {total_hands}", (20, 110), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
+            color = (0, 255, 0) if engagement > 60 else (0, 165, 255) if engagement > 40 else (0, 0, 255)
+            cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
+            cv2.putText(frame, student['student_id'].replace('Student_', 'S'), (x, y-10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
             
-            out.write(frame)
+            status = "Engaged" if engagement > 60 else "Moderate" if engagement > 40 else "Distracted"
+            cv2.putText(frame, status, (x, y+h+15), cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
             
-            if self.frame_count % 30 == 0:
-                print(f"Progress: {(self.frame_count/total_frames)*100:.1f}%", end='\r')
+            if student['hand_raised']:
+                cv2.putText(frame, "HAND UP!", (x, y+h+30), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 2)
         
-        cap.release()
-        out.release()
+        # Draw stats
+        stats = result['stats']
+        shade_panel(frame, (10, 10), (300, 120), 0.6)
         
-        print(f"\n✅ Complete! Output: {output_path}")
-        return self.generate_report(fps, total_frames)
+        cv2.putText(frame, f"Students: {stats['student_count']}", (20, 35), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        cv2.putText(frame, f"Avg Engagement: {stats['avg_engagement']:.1f}%", (20, 60), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        cv2.putText(frame, f"Avg Attention: {stats['avg_attention']:.1f}%", (20, 85), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
+        cv2.putText(frame, f"Hand Raises: {stats['total_hands']}", (20, 110), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
+        
+        return frame
     
     def generate_report(self, fps, total_frames):
         duration = total_frames / fps if fps > 0 else 0
@@ -247,13 +281,22 @@ class FixedStudentAnalyzer:
                 'attention_score': round(attention, 2),
                 'hand_raises': data['hand_raises']
             })
+            if self.zones:
+                student_reports[-1]['zone'] = self.zone_tally.zone_of(sid)
         
-        return {
+        report = {
             'duration': round(duration, 2),
             'total_students': len(self.students),
             'frames': self.frame_count,
             'students': student_reports
         }
+        if self.zones:
+            report['zone_metrics'] = zone_metrics(
+                self.zones.names, student_reports,
+                averages={'average_engagement': 'engagement_score', 'average_attention': 'attention_score'},
+                totals={'total_hand_raises': 'hand_raises'})
+        
+        return report
     
     def save_report(self, report, path):
         with open(path, 'w', newline='') as f:
@@ -274,6 +317,15 @@ class FixedStudentAnalyzer:
             writer.writerow(['Total Hand Raises', total_hands])
             writer.writerow([])
             
+            # Per seating zone, when the analyzer ran with ClassroomZones
+            if report.get('zone_metrics'):
+                writer.writerow(['ZONE METRICS', ''])
+                writer.writerow(['Zone', 'Students', 'Engagement Score', 'Attention Score', 'Hand Raises'])
+                for zone, metrics in report['zone_metrics'].items():
+                    writer.writerow([zone, metrics['students'], f"{metrics['average_engagement']}%",
+                                     f"{metrics['average_attention']}%", metrics['total_hand_raises']])
+                writer.writerow([])
+            
             writer.writerow(['Student ID', 'Engagement Score', 'Attention Score', 'Hand Raises'])
             for s in report['students']:
                 writer.writerow([s['student_id'], f"{s['engagement_score']}%", f"{s['attention_score']}%", s['hand_raises']])
@@ -309,8 +361,12 @@ if __name__ == "__main__":
     print("🎓 Fixed Student Analyzer (6 Students)")
     print("=" * 60)
     
-    analyzer = FixedStudentAnalyzer()
-    report = analyzer.process_video("assets/215475_small.mp4", "output_fixed.mp4")
+    # --zones CAMERA.json analyzes only the seating zones of that camera config (see classroom_zones)
+    zones = ClassroomZones.load(sys.argv[sys.argv.index("--zones") + 1]) if "--zones" in sys.argv else None
+    analyzer = FixedStudentAnalyzer(zones=zones)
+    # --session-log PATH writes per-frame, per-student rows as Parquet parts
+    session_log_path = sys.argv[sys.argv.index("--session-log") + 1] if "--session-log" in sys.argv else None
+    report = analyzer.process_video("assets/215475_small.mp4", "output_fixed.mp4", session_log_path=session_log_path)
     
     if report:
         analyzer.save_report(report, "student_scores.csv")
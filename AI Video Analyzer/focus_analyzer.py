@@ -7,8 +7,13 @@ class FocusAnalyzer:
         self.student_focus_history = {}
         self.history_length = 30
     
-    def analyze_focus(self, student_id, face_data, frame_center):
-        """Analyze student focus based on eyes, position, and movement"""
+    def analyze_focus(self, student_id, face_data, frame_center, half_size=None):
+        """Analyze student focus based on eyes, position, and movement
+        
+        frame_center is the center of the area students sit in and half_size
+        its half width/height; half_size defaults to frame_center, i.e. the
+        whole frame.
+        """
         if student_id not in self.student_focus_history:
             self.student_focus_history[student_id] = {
                 'positions': deque(maxlen=self.history_length),
@@ -25,7 +30,8 @@ class FocusAnalyzer:
         face_center = face_data['center']
         distance_from_center = np.sqrt((face_center[0] - frame_center[0])**2 + 
                                        (face_center[1] - frame_center[1])**2)
-        max_distance = np.sqrt(frame_center[0]**2 + frame_center[1]**2)
+        half_w, half_h = half_size or frame_center
+        max_distance = np.sqrt(half_w**2 + half_h**2)
         position_score = 1.0 - (distance_from_center / max_distance)
         
         # Movement score (less movement = more focused)
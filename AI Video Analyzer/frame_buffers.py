@@ -0,0 +1,105 @@
+import threading
+import cv2
+import numpy as np
+
+
+def shade_panel(frame, top_left, bottom_right, opacity=0.6):
+    """Blend a filled black rectangle over frame in place, touching only the rectangle
+    
+    Same pixels as drawing the rectangle on a full-frame copy and blending it
+    back with addWeighted(overlay, opacity, frame, 1 - opacity), without the
+    copy or the full-frame pass. Corners are inclusive, as in cv2.rectangle.
+    """
+    (x0, y0), (x1, y1) = top_left, bottom_right
+    panel = frame[max(0, y0):y1 + 1, max(0, x0):x1 + 1]
+    if panel.size:
+        # beta=0 keeps the arithmetic identical to blending with a black overlay
+        cv2.addWeighted(panel, 1 - opacity, panel, 0, 0, panel)
+    return frame
+
+
+class FrameBuffers:
+    """Reusable scratch images for per-frame color conversions
+    
+    cvtColor writes into a buffer kept per name instead of allocating a new
+    image every frame. Each name has `depth` buffers used in turn, so a
+    result stays valid while the next `depth - 1` frames are converted (the
+    face tracker keeps the previous grayscale frame for optical flow).
+    Copy anything that has to live longer. Buffers are reallocated when the
+    frame size changes. Not thread-safe: one instance per analysis thread.
+    """
+    
+    def __init__(self, depth=2):
+        self.depth = max(1, depth)
+        self.rings = {}   # name -> list of arrays of one shape
+        self.turns = {}
+        self.allocated = 0
+        self.reused = 0
+    
+    def get(self, name, shape, dtype=np.uint8):
+        """Next buffer of the given shape for name"""
+        ring = self.rings.get(name)
+        if ring is None or ring[0].shape != shape or ring[0].dtype != dtype:
+            ring = self.rings[name] = [np.empty(shape, dtype=dtype) for _ in range(self.depth)]
+            self.turns[name] = 0
+            self.allocated += self.depth
+        else:
+            self.reused += 1
+        turn = self.turns[name]
+        self.turns[name] = (turn + 1) % self.depth
+        return ring[turn]
+    
+    def convert(self, src, code, name, channels):
+        shape = src.shape[:2] if channels == 1 else src.shape[:2] + (channels,)
+        return cv2.cvtColor(src, code, dst=self.get(name, shape))
+    
+    def gray(self, frame):
+        return self.convert(frame, cv2.COLOR_BGR2GRAY, 'gray', 1)
+    
+    def rgb(self, frame):
+        return self.convert(frame, cv2.COLOR_BGR2RGB, 'rgb', 3)
+    
+    def hsv(self, frame):
+        return self.convert(frame, cv2.COLOR_BGR2HSV, 'hsv', 3)
+    
+    def stats(self):
+        return {'buffers': sum(len(ring) for ring in self.rings.values()),
+                'allocated': self.allocated, 'reused': self.reused}
+
+
+class FramePool:
+    """Free list of decoded frames for VideoCapture.read(image=...)
+    
+    Frames go back with release() once the last stage is done with them
+    and are decoded into again, so steady-state decoding allocates nothing.
+    Thread-safe: the decode thread acquires, another stage releases.
+    """
+    
+    def __init__(self, max_free=32):
+        self.max_free = max_free
+        self.free = []
+        self.lock = threading.Lock()
+        self.allocated = 0
+        self.reused = 0
+    
+    def acquire(self):
+        """A frame to decode into, or None to let OpenCV allocate a new one"""
+        with self.lock:
+            if self.free:
+                self.reused += 1
+                return self.free.pop()
+            self.allocated += 1
+            return None
+    
+    def release(self, frame):
+        with self.lock:
+            if len(self.free) < self.max_free:
+                self.free.append(frame)
+    
+    def read(self, cap):
+        """cap.read() into a recycled frame"""
+        return cap.read(image=self.acquire())
+    
+    def stats(self):
+        with self.lock:
+            return {'allocated': self.allocated, 'reused': self.reused, 'free': len(self.free)}
@@ -0,0 +1,164 @@
+import cv2
+import numpy as np
+
+# Skin ranges used when hand_raise_model.pkl was trained (see hand_raise_trainer.py)
+LOWER_SKIN_1 = np.array([0, 20, 70], dtype=np.uint8)
+UPPER_SKIN_1 = np.array([20, 255, 255], dtype=np.uint8)
+LOWER_SKIN_2 = np.array([0, 40, 60], dtype=np.uint8)
+UPPER_SKIN_2 = np.array([25, 255, 255], dtype=np.uint8)
+
+FEATURE_NAMES = [
+    'skin_ratio',
+    'skin_top_third', 'skin_middle_third', 'skin_bottom_third',
+    'skin_left_half', 'skin_right_half',
+    'brightness', 'edge_density', 'aspect_ratio'
+]
+FEATURE_COUNT = len(FEATURE_NAMES)
+
+# Channels of the per-tile integral image
+SKIN, EDGE, GRAY = 0, 1, 2
+
+
+def hand_regions(boxes, frame_shape):
+    """Region above each face where a raised hand would be, as (N, 4) y0, y1, x0, x1"""
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    x, y, w, h = boxes.T
+    frame_w = frame_shape[1]
+    
+    above_h = (h * 1.5).astype(np.int64)
+    y0 = np.maximum(0, y - above_h)
+    y1 = np.maximum(y0, y)
+    x0 = np.maximum(0, x - w // 2)
+    x1 = np.maximum(x0, np.minimum(frame_w, x + w + w // 2))
+    return np.stack([y0, y1, x0, x1], axis=1)
+
+
+def region_tiles(regions):
+    """Group overlapping regions into tiles; returns a tile label per region"""
+    y0, y1, x0, x1 = regions.T
+    overlap = ((np.minimum(y1[:, None], y1[None, :]) > np.maximum(y0[:, None], y0[None, :])) &
+               (np.minimum(x1[:, None], x1[None, :]) > np.maximum(x0[:, None], x0[None, :])))
+    
+    # Propagate the smallest index through each connected group
+    labels = np.arange(len(regions))
+    while True:
+        merged = np.where(overlap, labels[None, :], len(regions)).min(axis=1)
+        if np.array_equal(merged, labels):
+            break
+        labels = merged
+    return np.unique(labels, return_inverse=True)[1]
+
+
+class HandFeatureExtractor:
+    """Hand-raise features for every face in a frame from one pass over the pixels
+    
+    Overlapping hand regions are grouped into tiles and each tile is converted
+    to HSV, skin mask, grayscale and Canny edges exactly once, so neighbouring
+    students share pixels instead of re-converting them per face. Every tile's
+    integral image is laid out in one flat buffer, which turns all region
+    statistics into a handful of vectorised lookups and yields an (N, 9)
+    matrix the classifier can consume in a single call.
+    """
+    
+    def extract(self, frame, boxes):
+        """Return (features (N, 9), valid (N,) bool) for (x, y, w, h) face boxes"""
+        regions = hand_regions(boxes, frame.shape)
+        features = np.zeros((len(regions), FEATURE_COUNT), dtype=np.float64)
+        valid = (regions[:, 1] > regions[:, 0]) & (regions[:, 3] > regions[:, 2])
+        
+        idx = np.flatnonzero(valid)
+        if len(idx) == 0:
+            return features, valid
+        
+        regions = regions[idx]
+        labels = region_tiles(regions)
+        tile_count = labels.max() + 1
+        
+        # Tile bounds: union of the regions in each tile
+        ty0 = np.full(tile_count, frame.shape[0], dtype=np.int64)
+        tx0 = np.full(tile_count, frame.shape[1], dtype=np.int64)
+        ty1 = np.zeros(tile_count, dtype=np.int64)
+        tx1 = np.zeros(tile_count, dtype=np.int64)
+        np.minimum.at(ty0, labels, regions[:, 0])
+        np.maximum.at(ty1, labels, regions[:, 1])
+        np.minimum.at(tx0, labels, regions[:, 2])
+        np.maximum.at(tx1, labels, regions[:, 3])
+        
+        # Integral images of all tiles back to back in one buffer; float64 because
+        # 255-valued channel sums overflow int32 past ~8.4M pixels per tile
+        row_stride = (tx1 - tx0 + 1) * 3
+        sizes = (ty1 - ty0 + 1) * row_stride
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        integrals = np.empty(int(sizes.sum()), dtype=np.float64)
+        
+        for t in range(tile_count):
+            planes = self.tile_planes(frame[ty0[t]:ty1[t], tx0[t]:tx1[t]])
+            out = integrals[offsets[t]:offsets[t] + sizes[t]].reshape(ty1[t] - ty0[t] + 1, -1, 3)
+            cv2.integral(planes, sum=out, sdepth=cv2.CV_64F)
+        
+        # Region coordinates relative to their tile
+        base = offsets[labels]
+        stride = row_stride[labels]
+        ry0, ry1 = regions[:, 0] - ty0[labels], regions[:, 1] - ty0[labels]
+        rx0, rx1 = regions[:, 2] - tx0[labels], regions[:, 3] - tx0[labels]
+        
+        def corner(y, x):
+            return integrals[(base + y * stride + x * 3)[:, None] + np.arange(3)]
+        
+        def rect_sums(y0, y1, x0, x1):
+            """(N, 3) channel sums over [y0, y1) x [x0, x1) in each region's tile"""
+            return corner(y1, x1) - corner(y0, x1) - corner(y1, x0) + corner(y0, x0)
+        
+        n, m = ry1 - ry0, rx1 - rx0
+        area = (n * m).astype(np.float64)
+        
+        # Masks are 0/255, so their sums are 255 * pixel counts
+        whole = rect_sums(ry0, ry1, rx0, rx1)
+        features[idx, 0] = whole[:, SKIN] / 255.0 / area
+        
+        # Vertical distribution of skin pixels (thirds of the region)
+        t1, t2 = ry0 + n // 3, ry0 + 2 * n // 3
+        thirds = np.stack([rect_sums(ry0, t1, rx0, rx1)[:, SKIN],
+                           rect_sums(t1, t2, rx0, rx1)[:, SKIN],
+                           rect_sums(t2, ry1, rx0, rx1)[:, SKIN]], axis=1)
+        total = thirds.sum(axis=1, keepdims=True)
+        features[idx, 1:4] = np.divide(thirds, total, out=np.zeros_like(thirds), where=total > 0)
+        
+        # Horizontal spread (left/right halves)
+        mid = rx0 + m // 2
+        halves = np.stack([rect_sums(ry0, ry1, rx0, mid)[:, SKIN],
+                           rect_sums(ry0, ry1, mid, rx1)[:, SKIN]], axis=1)
+        total = halves.sum(axis=1, keepdims=True)
+        features[idx, 4:6] = np.divide(halves, total, out=np.full_like(halves, 0.5), where=total > 0)
+        
+        features[idx, 6] = whole[:, GRAY] / area / 255.0
+        features[idx, 7] = whole[:, EDGE] / 255.0 / area
+        features[idx, 8] = n / m
+        
+        return features, valid
+    
+    def tile_planes(self, patch):
+        """Skin mask, Canny edges and grayscale of one tile as a 3-channel image"""
+        hsv = cv2.cvtColor(patch, cv2.COLOR_BGR2HSV)
+        skin = cv2.bitwise_or(cv2.inRange(hsv, LOWER_SKIN_1, UPPER_SKIN_1),
+                              cv2.inRange(hsv, LOWER_SKIN_2, UPPER_SKIN_2))
+        gray = cv2.cvtColor(patch, cv2.COLOR_BGR2GRAY)
+        edges = cv2.Canny(gray, 50, 150)
+        return cv2.merge([skin, edges, gray])
+    
+    def hand_raised(self, classifier, frame, boxes):
+        """Classify every face with one HandRaiseClassifier call; returns an (N,) bool array"""
+        features, valid = self.extract(frame, boxes)
+        raised = np.zeros(len(valid), dtype=bool)
+        if valid.any():
+            raised[valid] = classifier.predict(features[valid])
+        return raised
+
+
+_default_extractor = HandFeatureExtractor()
+
+
+def extract_hand_features(frame, face_bbox):
+    """Single-face convenience wrapper; returns a 9-feature vector or None"""
+    features, valid = _default_extractor.extract(frame, [face_bbox])
+    return features[0] if valid[0] else None
@@ -3,85 +3,19 @@ import numpy as np
 import pickle
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
+from hand_features import HandFeatureExtractor
 
 class HandRaiseTrainer:
     def __init__(self):
         self.model = RandomForestClassifier(n_estimators=100, random_state=42)
         self.upper_body_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_upperbody.xml')
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.hand_features = HandFeatureExtractor()
     
     def extract_features(self, frame, face_bbox):
         """Extract features for hand raise detection"""
-        x, y, w, h = face_bbox
-        
-        # Region above face (where hand would be)
-        above_h = int(h * 1.5)
-        above_y = max(0, y - above_h)
-        above_region = frame[above_y:y, max(0, x-w//2):min(frame.shape[1], x+w+w//2)]
-        
-        if above_region.size == 0:
-            return None
-        
-        # Convert to HSV for skin detection
-        hsv = cv2.cvtColor(above_region, cv2.COLOR_BGR2HSV)
-        
-        # Skin color masks
-        lower_skin1 = np.array([0, 20, 70], dtype=np.uint8)
-        upper_skin1 = np.array([20, 255, 255], dtype=np.uint8)
-        lower_skin2 = np.array([0, 40, 60], dtype=np.uint8)
-        upper_skin2 = np.array([25, 255, 255], dtype=np.uint8)
-        
-        mask1 = cv2.inRange(hsv, lower_skin1, upper_skin1)
-        mask2 = cv2.inRange(hsv, lower_skin2, upper_skin2)
-        skin_mask = cv2.bitwise_or(mask1, mask2)
-        
-        # Features
-        features = []
-        
-        # 1. Skin ratio in upper region
-        skin_ratio = np.sum(skin_mask > 0) / skin_mask.size
-        features.append(skin_ratio)
-        
-        # 2. Vertical distribution of skin pixels
-        vertical_profile = np.sum(skin_mask, axis=1)
-        if len(vertical_profile) > 0:
-            top_third = np.sum(vertical_profile[:len(vertical_profile)//3])
-            middle_third = np.sum(vertical_profile[len(vertical_profile)//3:2*len(vertical_profile)//3])
-            bottom_third = np.sum(vertical_profile[2*len(vertical_profile)//3:])
-            total = top_third + middle_third + bottom_third
-            if total > 0:
-                features.extend([top_third/total, middle_third/total, bottom_third/total])
-            else:
-                features.extend([0, 0, 0])
-        else:
-            features.extend([0, 0, 0])
-        
-        # 3. Horizontal spread
-        horizontal_profile = np.sum(skin_mask, axis=0)
-        if len(horizontal_profile) > 0:
-            left_half = np.sum(horizontal_profile[:len(horizontal_profile)//2])
-            right_half = np.sum(horizontal_profile[len(horizontal_profile)//2:])
-            total = left_half + right_half
-            if total > 0:
-                features.extend([left_half/total, right_half/total])
-            else:
-                features.extend([0.5, 0.5])
-        else:
-            features.extend([0.5, 0.5])
-        
-        # 4. Brightness in upper region
-        gray_above = cv2.cvtColor(above_region, cv2.COLOR_BGR2GRAY)
-        features.append(np.mean(gray_above) / 255.0)
-        
-        # 5. Edge density (movement indicator)
-        edges = cv2.Canny(gray_above, 50, 150)
-        edge_density = np.sum(edges > 0) / edges.size
-        features.append(edge_density)
-        
-        # 6. Aspect ratio of region
-        features.append(above_region.shape[0] / above_region.shape[1] if above_region.shape[1] > 0 else 1)
-        
-        return np.array(features)
+        features, valid = self.hand_features.extract(frame, [face_bbox])
+        return features[0] if valid[0] else None
     
     def train_from_video(self, video_path, is_hand_raise_video=True):
         """Train model from labeled video"""
@@ -103,11 +37,10 @@ class HandRaiseTrainer:
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
             faces = self.face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(30, 30))
             
-            for face in faces:
-                features = self.extract_features(frame, face)
-                if features is not None:
-                    features_list.append(features)
-                    labels_list.append(1 if is_hand_raise_video else 0)
+            if len(faces):
+                features, valid = self.hand_features.extract(frame, faces)
+                features_list.extend(features[valid])
+                labels_list.extend([1 if is_hand_raise_video else 0] * int(valid.sum()))
             
             frame_count += 1
             if frame_count % 30 == 0:
@@ -162,10 +95,10 @@ class HandRaiseTrainer:
         if features is None:
             return False, 0.0
         
-        prediction = self.model.predict([features])[0]
-        probability = self.model.predict_proba([features])[0][1]
+        # One probability call; for a binary forest predict() == 1 exactly when P > 0.5
+        probability = self.model.predict_proba([features])[0][list(self.model.classes_).index(1)]
         
-        return prediction == 1, probability
+        return probability > 0.5, probability
 
 
 if __name__ == "__main__":
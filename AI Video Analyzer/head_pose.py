@@ -0,0 +1,232 @@
+"""
+Face boxes and head pose for every MediaPipe face in a frame at once.
+
+The per-face path read 468+ landmark objects one attribute at a time in
+Python: two coordinate lists per face for the bounding box, plus a loop
+over the six key points. Here all faces become one (faces, landmarks, 3)
+NumPy array per frame. MediaPipe landmark lists are proto2 messages with
+a fixed 17-byte wire record per landmark (x, y, z as float32), so one
+SerializeToString() and np.frombuffer() replace the attribute loop; other
+landmark containers fall back to reading attributes. Boxes come from array
+reductions, and the key points for every face from one gather.
+
+cv2.solvePnP, Rodrigues and RQDecomp3x3 still run per face. The iterative
+solve has no batched OpenCV form, and a closed-form estimate would not
+reproduce its yaw/pitch, so the is_looking_forward decisions would change.
+
+Usage: python head_pose.py [--faces 1,5,10,20,30] [--runs 100]
+"""
+
+import argparse
+import time
+from types import SimpleNamespace
+import cv2
+import numpy as np
+
+# Nose tip, eye outer corners, mouth corners, chin
+KEY_POINTS = [1, 33, 263, 61, 291, 199]
+
+# Wire format of one NormalizedLandmark inside a NormalizedLandmarkList (fields 1-3 set, 4-5 unset)
+_LANDMARK_RECORD = np.dtype([('tag', 'u1'), ('size', 'u1'),
+                             ('x_tag', 'u1'), ('x', '<f4'),
+                             ('y_tag', 'u1'), ('y', '<f4'),
+                             ('z_tag', 'u1'), ('z', '<f4')])
+_RECORD_TAGS = {'tag': 0x0a, 'size': 15, 'x_tag': 0x0d, 'y_tag': 0x15, 'z_tag': 0x1d}
+
+
+def _parse_landmark_lists(multi_face_landmarks, points):
+    """Decode serialized landmark lists in one pass, or None if the layout isn't x/y/z only"""
+    if not hasattr(multi_face_landmarks[0], 'SerializeToString'):
+        return None
+    data = b''.join(face.SerializeToString() for face in multi_face_landmarks)
+    if len(data) != len(multi_face_landmarks) * points * _LANDMARK_RECORD.itemsize:
+        return None
+    records = np.frombuffer(data, dtype=_LANDMARK_RECORD)
+    if not all((records[field] == value).all() for field, value in _RECORD_TAGS.items()):
+        return None
+    return np.stack([records['x'], records['y'], records['z']], axis=-1).astype(np.float64)
+
+
+def landmark_array(multi_face_landmarks):
+    """(faces, landmarks, 3) float64 array of normalized x, y, z
+    
+    Values are the float32 landmarks widened to float64, exactly what
+    reading lm.x from Python gives.
+    """
+    points = len(multi_face_landmarks[0].landmark)
+    parsed = _parse_landmark_lists(multi_face_landmarks, points)
+    if parsed is not None:
+        return parsed.reshape(len(multi_face_landmarks), points, 3)
+    
+    coords = np.array([[[lm.x for lm in face.landmark],
+                        [lm.y for lm in face.landmark],
+                        [lm.z for lm in face.landmark]]
+                       for face in multi_face_landmarks], dtype=np.float64)
+    return np.ascontiguousarray(coords.transpose(0, 2, 1))
+
+
+def face_boxes(landmarks, img_w, img_h):
+    """(x, y, w, h) per face around all its landmarks, as int tuples
+    
+    Truncates like the per-face int(min(x_coords)) / int(max(x_coords) - x).
+    """
+    xs = landmarks[..., 0] * img_w
+    ys = landmarks[..., 1] * img_h
+    x = np.trunc(xs.min(axis=1))
+    y = np.trunc(ys.min(axis=1))
+    boxes = np.stack([x, y, np.trunc(xs.max(axis=1) - x), np.trunc(ys.max(axis=1) - y)], axis=1)
+    return [tuple(box) for box in boxes.astype(int).tolist()]
+
+
+def camera_matrix(img_w, img_h):
+    focal_length = 1 * img_w
+    return np.array([[focal_length, 0, img_h / 2],
+                     [0, focal_length, img_w / 2],
+                     [0, 0, 1]])
+
+
+def head_pose(landmarks, img_w, img_h):
+    """Yaw and pitch of one face from its landmark objects (the per-face reference path)"""
+    face_2d = []
+    face_3d = []
+    
+    for idx in KEY_POINTS:
+        lm = landmarks[idx]
+        x, y = int(lm.x * img_w), int(lm.y * img_h)
+        face_2d.append([x, y])
+        face_3d.append([x, y, lm.z])
+    
+    face_2d = np.array(face_2d, dtype=np.float64)
+    face_3d = np.array(face_3d, dtype=np.float64)
+    
+    cam_matrix = camera_matrix(img_w, img_h)
+    dist_matrix = np.zeros((4, 1), dtype=np.float64)
+    
+    success, rot_vec, trans_vec = cv2.solvePnP(face_3d, face_2d, cam_matrix, dist_matrix)
+    rmat, _ = cv2.Rodrigues(rot_vec)
+    angles, _, _, _, _, _ = cv2.RQDecomp3x3(rmat)
+    
+    yaw = angles[1] * 360
+    pitch = angles[0] * 360
+    
+    return yaw, pitch
+
+
+def head_poses(landmarks, img_w, img_h):
+    """(yaw, pitch) arrays for a (faces, landmarks, 3) array; same values as head_pose() per face"""
+    key = landmarks[:, KEY_POINTS]
+    # solvePnP wants each face's points as a contiguous (6, 2) / (6, 3) block
+    face_2d = np.ascontiguousarray(np.trunc(key[..., :2] * np.array([img_w, img_h])))
+    face_3d = np.ascontiguousarray(np.concatenate([face_2d, key[..., 2:]], axis=-1))
+    
+    cam_matrix = camera_matrix(img_w, img_h)
+    dist_matrix = np.zeros((4, 1), dtype=np.float64)
+    
+    angles = np.empty((len(landmarks), 3))
+    for i in range(len(landmarks)):
+        success, rot_vec, trans_vec = cv2.solvePnP(face_3d[i], face_2d[i], cam_matrix, dist_matrix)
+        rmat, _ = cv2.Rodrigues(rot_vec)
+        angles[i] = cv2.RQDecomp3x3(rmat)[0]
+    
+    return angles[:, 1] * 360, angles[:, 0] * 360
+
+
+def looking_forward(yaw, pitch):
+    """Vectorized StudentEngagementAnalyzer.is_looking_forward"""
+    return (np.abs(yaw) < 25) & (np.abs(pitch) < 20)
+
+
+def synthetic_faces(count, img_w, img_h, rng, points=478):
+    """MediaPipe-like landmark lists for count faces with small random head turns
+    
+    Real NormalizedLandmarkList messages when MediaPipe is installed, plain
+    objects (the attribute fallback) otherwise.
+    """
+    try:
+        from mediapipe.framework.formats import landmark_pb2
+    except ImportError:
+        landmark_pb2 = None
+    
+    template = rng.normal(0, 0.35, (points, 3)) * [1, 1, 0.2]
+    template[KEY_POINTS] = [[0, 0.05, -0.1], [-0.35, -0.2, 0], [0.35, -0.2, 0],
+                            [-0.25, 0.35, 0], [0.25, 0.35, 0], [0, 0.7, -0.02]]
+    
+    faces = []
+    for _ in range(count):
+        rot_vec = rng.normal(0, 0.15, 3)
+        rmat, _ = cv2.Rodrigues(rot_vec)
+        size = rng.uniform(40, 120)
+        center = rng.uniform([size, size], [img_w - size, img_h - size])
+        pts = template @ rmat.T * size
+        coords = np.column_stack([(center[0] + pts[:, 0]) / img_w, (center[1] + pts[:, 1]) / img_h,
+                                  pts[:, 2] / img_w]).astype(np.float32).tolist()
+        
+        if landmark_pb2:
+            face = landmark_pb2.NormalizedLandmarkList()
+            for x, y, z in coords:
+                lm = face.landmark.add()
+                lm.x, lm.y, lm.z = x, y, z
+        else:
+            face = SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, z=z) for x, y, z in coords])
+        faces.append(face)
+    return faces
+
+
+def per_face_frame(multi_face_landmarks, img_w, img_h):
+    """The previous analyze_frame path: coordinate lists and head_pose() for each face"""
+    boxes, decisions = [], []
+    for face_landmarks in multi_face_landmarks:
+        x_coords = [lm.x * img_w for lm in face_landmarks.landmark]
+        y_coords = [lm.y * img_h for lm in face_landmarks.landmark]
+        x, y = int(min(x_coords)), int(min(y_coords))
+        w, h = int(max(x_coords) - x), int(max(y_coords) - y)
+        boxes.append((x, y, w, h))
+        yaw, pitch = head_pose(face_landmarks.landmark, img_w, img_h)
+        decisions.append(abs(yaw) < 25 and abs(pitch) < 20)
+    return boxes, decisions
+
+
+def array_frame(multi_face_landmarks, img_w, img_h):
+    landmarks = landmark_array(multi_face_landmarks)
+    yaw, pitch = head_poses(landmarks, img_w, img_h)
+    return face_boxes(landmarks, img_w, img_h), looking_forward(yaw, pitch).tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-face and array head-pose paths by face count")
+    parser.add_argument('--faces', default="1,5,10,20,30", help="comma list of faces per frame")
+    parser.add_argument('--runs', type=int, default=100, help="frames to time per face count")
+    parser.add_argument('--size', default="1280x720", help="frame size the landmarks are scaled to")
+    args = parser.parse_args()
+    
+    img_w, img_h = (int(v) for v in args.size.split('x'))
+    rng = np.random.default_rng(0)
+    
+    def time_it(fn, frames):
+        start = time.perf_counter()
+        results = [fn(faces, img_w, img_h) for faces in frames]
+        return (time.perf_counter() - start) / len(frames) * 1000, results
+    
+    agree = True
+    sample = synthetic_faces(1, img_w, img_h, rng)[0]
+    source = "NormalizedLandmarkList" if hasattr(sample, 'SerializeToString') else "plain objects (MediaPipe not installed)"
+    print(f"📊 {args.runs} frames per face count, {img_w}x{img_h}, landmarks from {source}")
+    print(f"{'faces':>6}{'per-face ms':>13}{'array ms':>10}{'convert ms':>12}{'speedup':>9}  decisions")
+    
+    for count in (int(c) for c in args.faces.split(',')):
+        frames = [synthetic_faces(count, img_w, img_h, rng) for _ in range(args.runs)]
+        per_face_ms, per_face = time_it(per_face_frame, frames)
+        array_ms, array = time_it(array_frame, frames)
+        convert_ms, _ = time_it(lambda faces, w, h: landmark_array(faces), frames)
+        
+        same = per_face == array
+        agree = agree and same
+        print(f"{count:6d}{per_face_ms:13.2f}{array_ms:10.2f}{convert_ms:12.2f}{per_face_ms / array_ms:8.2f}x  "
+              f"{'identical' if same else 'DIFFER'}")
+    
+    print("✅ Boxes and is_looking_forward decisions identical" if agree else "❌ Results differ")
+    return 0 if agree else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
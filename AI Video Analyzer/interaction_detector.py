@@ -33,6 +33,10 @@ class InteractionDetector:
     
     def analyze_interaction(self, student_id, frame, face_data):
         """Analyze student interaction (hand raises, movement)"""
+        return self.record_interaction(student_id, self.detect_hand_raise(frame, face_data['bbox']))
+    
+    def record_interaction(self, student_id, hand_raised):
+        """Add one frame's hand-raise detection to the student's history"""
         if student_id not in self.student_interaction_history:
             self.student_interaction_history[student_id] = {
                 'hand_raises': 0,
@@ -42,9 +46,6 @@ class InteractionDetector:
         
         history = self.student_interaction_history[student_id]
         
-        # Detect hand raise
-        hand_raised = self.detect_hand_raise(frame, face_data['bbox'])
-        
         # Count hand raise (with cooldown to avoid duplicates)
         current_frame = len(history['interactions'])
         if hand_raised and (current_frame - history['last_hand_raise_frame']) > 30:
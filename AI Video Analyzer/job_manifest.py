@@ -0,0 +1,198 @@
+"""
+Job manifest and mid-video checkpoints for batch processing.
+
+The manifest is a JSON file that records every video a batch run has
+finished. Each entry is keyed by the video's content fingerprint plus the
+analyzer name and version, so:
+- renaming a file does not make it run again;
+- a changed file or a new analyzer version does run again;
+- anything already done is skipped.
+
+While a video is running, a Checkpointer writes the analyzer's
+per-student state to disk every few minutes of video. A run that crashes
+or is interrupted resumes from its last checkpoint, not from frame 0.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import time
+import cv2
+
+MANIFEST_VERSION = 1
+
+
+def content_fingerprint(path, sample_size=1 << 20):
+    """sha256 over the file size and its first, middle and last sample_size bytes
+    
+    Reading three samples keeps this instant for multi-GB recordings. Any
+    re-encode or trim changes the size or the sampled bytes.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(path, 'rb') as f:
+        for offset in sorted({0, max(0, size // 2 - sample_size // 2), max(0, size - sample_size)}):
+            f.seek(offset)
+            digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+
+def write_atomic(path, data, binary=False):
+    """Write to a temp file and rename it over path, so a crash never leaves half a file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb' if binary else 'w') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class Checkpointer:
+    """Periodic analyzer snapshots for one video
+    
+    The analyzer must implement checkpoint_state() (picklable per-student
+    state) and restore_checkpoint(state). Snapshots are taken between
+    segments of every_seconds of video, when all pipeline stages have
+    drained and the state matches the frames written so far.
+    """
+    
+    def __init__(self, path, every_seconds=300.0):
+        self.path = path
+        self.every_seconds = every_seconds
+        self.saved = 0
+    
+    def segment_frames(self, fps):
+        return max(1, int(round(self.every_seconds * (fps if fps and fps > 0 else 30.0))))
+    
+    def resume(self, analyzer):
+        """Restore the last snapshot into analyzer; returns (next frame, finished output parts)"""
+        if not os.path.exists(self.path):
+            return 0, []
+        with open(self.path, 'rb') as f:
+            checkpoint = pickle.load(f)
+        if not all(os.path.exists(part) for part in checkpoint['parts']):
+            return 0, []  # Annotated output parts are gone, nothing to stitch onto; start over
+        analyzer.restore_checkpoint(checkpoint['state'])
+        print(f"⏯️  Resuming at frame {checkpoint['next_frame']} from {self.path}")
+        return checkpoint['next_frame'], list(checkpoint['parts'])
+    
+    def save(self, analyzer, next_frame, parts):
+        checkpoint = {'next_frame': next_frame, 'parts': parts, 'state': analyzer.checkpoint_state(),
+                      'saved_at': time.time()}
+        write_atomic(self.path, pickle.dumps(checkpoint, protocol=pickle.HIGHEST_PROTOCOL), binary=True)
+        self.saved += 1
+    
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def join_parts(parts, output_path, fps, frame_size):
+    """Concatenate per-segment videos into output_path and delete the parts"""
+    if len(parts) == 1:
+        os.replace(parts[0], output_path)
+        return
+    
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, frame_size)
+    for part in parts:
+        cap = cv2.VideoCapture(part)
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            writer.write(frame)
+        cap.release()
+    writer.release()
+    for part in parts:
+        os.remove(part)
+
+
+def run_checkpointed(cap, analyzer, make_pipeline, checkpointer, fps, output_path=None, frame_size=None):
+    """Run a video as consecutive VideoPipeline segments with a checkpoint after each one
+    
+    make_pipeline(writer, start_frame, end_frame) builds the pipeline for
+    one segment. With output_path, each segment is written to its own part
+    file. A finished part is complete even if a later segment crashes, and
+    the parts are joined at the end. Returns the pipeline of the last
+    segment that read any frames, for its stats.
+    """
+    start, parts = checkpointer.resume(analyzer)
+    step = checkpointer.segment_frames(fps)
+    base, ext = os.path.splitext(output_path) if output_path else (None, None)
+    pipeline = None
+    
+    while True:
+        end = start + step
+        writer, part = None, None
+        if output_path:
+            part = f"{base}.part{len(parts):03d}{ext}"
+            writer = cv2.VideoWriter(part, cv2.VideoWriter_fourcc(*'mp4v'), fps, frame_size)
+        
+        segment = make_pipeline(writer, start, end)
+        segment.run(cap)
+        if writer:
+            writer.release()
+            if segment.frames_read:
+                parts.append(part)
+            elif os.path.exists(part):
+                os.remove(part)
+        if segment.frames_read or pipeline is None:
+            pipeline = segment
+        
+        start += segment.frames_read
+        # A short segment means the video ended; no checkpoint needed after the last one
+        if segment.frames_read < step:
+            break
+        checkpointer.save(analyzer, start, parts)
+    
+    if output_path:
+        join_parts(parts, output_path, fps, frame_size)
+    return pipeline
+
+
+class JobManifest:
+    """JSON record of finished and failed videos, keyed by content and analyzer version
+    
+    Only the batch parent process writes the manifest. Workers write their
+    own checkpoint files under checkpoint_dir.
+    """
+    
+    def __init__(self, path='batch_manifest.json', checkpoint_dir='checkpoints'):
+        self.path = path
+        self.checkpoint_dir = checkpoint_dir
+        self.jobs = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.jobs = data['jobs']
+    
+    def job_key(self, video_path, analyzer_name, analyzer_version, options=''):
+        """Stable key for one video under one analyzer configuration"""
+        config = f"{analyzer_name}:{analyzer_version}:{options}"
+        return f"{content_fingerprint(video_path)[:24]}-{hashlib.sha256(config.encode()).hexdigest()[:8]}"
+    
+    def is_done(self, key):
+        job = self.jobs.get(key)
+        return bool(job and job['status'] == 'done' and os.path.exists(job['report']))
+    
+    def checkpoint_path(self, key):
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        return os.path.join(self.checkpoint_dir, f"{key}.ckpt")
+    
+    def start(self, key, video_path):
+        job = self.jobs.setdefault(key, {'video': video_path, 'attempts': 0})
+        job.update(status='running', video=video_path, attempts=job['attempts'] + 1, started=time.time())
+        self.save()
+    
+    def finish(self, key, report_path, output_path=None):
+        self.jobs[key].update(status='done', report=report_path, output=output_path, finished=time.time())
+        self.jobs[key].pop('error', None)
+        self.save()
+    
+    def fail(self, key, error):
+        self.jobs[key].update(status='failed', error=str(error), finished=time.time())
+        self.save()
+    
+    def save(self):
+        write_atomic(self.path, json.dumps({'version': MANIFEST_VERSION, 'jobs': self.jobs}, indent=2))
+
@@ -1,47 +1,64 @@
 import cv2
 import numpy as np
 import csv
+import os
 from datetime import datetime
 from face_detector import FaceDetector
 from focus_analyzer import FocusAnalyzer
 from sentiment_analyzer import SentimentAnalyzer
 from interaction_detector import InteractionDetector
 from doubt_estimator import DoubtEstimator
+from video_pipeline import VideoPipeline
+from student_tracker import StudentTracker
+from frame_buffers import shade_panel
+from job_manifest import run_checkpointed
+from annotation_sidecar import AnnotationSidecar, OUTPUT_MODES
+from session_log import SessionLog
+from classroom_zones import ZoneTally, zone_metrics
+from motion_gate import MotionGate
 
 class MainAnalyzer:
-    def __init__(self):
-        self.face_detector = FaceDetector()
+    # Bump when detection or scoring changes so batch runs redo old reports
+    VERSION = '1'
+    
+    def __init__(self, detect_interval=1, min_face_size=30, zones=None, motion_threshold=None, motion_max_reuse=30):
+        # zones (ClassroomZones) limits detection to the seating area and adds per-zone metrics
+        self.zones = zones
+        self.face_detector = FaceDetector(detect_interval=detect_interval, min_face_size=min_face_size, zones=zones)
         self.focus_analyzer = FocusAnalyzer()
         self.sentiment_analyzer = SentimentAnalyzer()
         self.interaction_detector = InteractionDetector()
         self.doubt_estimator = DoubtEstimator()
         
+        # Last known center per student ID, for every student seen so far
         self.student_tracker = {}
-        self.next_student_id = 1
+        self.tracker = StudentTracker(max_distance=100, id_prefix='S')
         self.frame_count = 0
+        self.frame_center = (0, 0)
+        self.frame_half_size = None
+        self.zone_tally = ZoneTally()
+        self.sidecar = None
+        self.session_log = None
+        
+        # With a threshold, frames that barely changed reuse the last analyzed frame's detections
+        self.motion_gate = MotionGate(motion_threshold, motion_max_reuse) if motion_threshold else None
+        self.last_observations = []
     
-    def track_student(self, face_center):
-        """Track students across frames"""
-        # Simple tracking based on proximity
-        min_distance = 100
-        matched_id = None
-        
-        for student_id, last_pos in self.student_tracker.items():
-            distance = np.sqrt((face_center[0] - last_pos[0])**2 + 
-                             (face_center[1] - last_pos[1])**2)
-            if distance < min_distance:
-                min_distance = distance
-                matched_id = student_id
-        
-        if matched_id is None:
-            matched_id = f"S{self.next_student_id}"
-            self.next_student_id += 1
-        
-        self.student_tracker[matched_id] = face_center
-        return matched_id
-    
-    def process_video(self, video_path, output_path):
-        """Process video and generate annotated output"""
+    def process_video(self, video_path, output_path, checkpointer=None, progress_callback=None,
+                      output_mode='video', session_log_path=None):
+        """Process video and generate annotated output
+        
+        progress_callback(percent) replaces the console progress line. With
+        a job_manifest.Checkpointer, state is saved every few minutes
+        of video and an interrupted run resumes from the last save.
+        output_mode 'metrics' skips drawing and encoding, 'sidecar' writes
+        per-frame results to output_path instead (see annotation_sidecar).
+        session_log_path also writes one row per student per frame as
+        Parquet/Arrow part files (see session_log).
+        """
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"output_mode must be one of {OUTPUT_MODES}, got {output_mode!r}")
+        
         cap = cv2.VideoCapture(video_path)
         
         if not cap.isOpened():
@@ -53,93 +70,219 @@ class MainAnalyzer:
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-        
-        frame_center = (width // 2, height // 2)
+        self.frame_center = (width // 2, height // 2)
+        if self.zones:
+            # Focus position score is measured from the middle of the seating area
+            x, y, w, h = self.zones.fit(width, height).crop_box
+            self.frame_center = (x + w // 2, y + h // 2)
+            self.frame_half_size = (w // 2, h // 2)
         
         print(f"🎬 Processing video: {video_path}")
         print(f"📊 Total frames: {total_frames}")
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            self.frame_count += 1
-            
-            # Detect faces
-            faces = self.face_detector.detect_faces(frame)
-            
-            # Process each student
-            for face_data in faces:
-                student_id = self.track_student(face_data['center'])
-                
-                # Analyze focus
-                focus_score = self.focus_analyzer.analyze_focus(student_id, face_data, frame_center)
-                
-                # Analyze sentiment
-                sentiment_score, emotion = self.sentiment_analyzer.analyze_sentiment(student_id, face_data['face_roi'])
-                
-                # Detect interactions
-                hand_raised, total_interactions = self.interaction_detector.analyze_interaction(student_id, frame, face_data)
-                
-                # Estimate doubts
-                total_doubts, has_doubt = self.doubt_estimator.estimate_doubts(student_id, emotion, focus_score, hand_raised)
-                
-                # Draw annotations
-                x, y, w, h = face_data['bbox']
-                
-                # Box color based on focus
-                color = (0, 255, 0) if focus_score > 60 else (0, 165, 255) if focus_score > 40 else (0, 0, 255)
-                cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
-                
-                # Student ID
-                cv2.putText(frame, student_id, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-                
-                # Emotion
-                cv2.putText(frame, emotion, (x, y+h+20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
-                
-                # Hand raise indicator
-                if hand_raised:
-                    cv2.putText(frame, "HAND UP!", (x, y+h+40), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
-                
-                # Doubt indicator
-                if has_doubt:
-                    cv2.circle(frame, (x+w-10, y+10), 8, (0, 0, 255), -1)
-                    cv2.putText(frame, "?", (x+w-15, y+15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-            
-            # Draw overall stats
-            self.draw_stats(frame, faces)
-            
-            out.write(frame)
-            
-            if self.frame_count % 30 == 0:
-                progress = (self.frame_count / total_frames) * 100
-                print(f"Progress: {progress:.1f}%", end='\r')
+        def progress(frames_read):
+            if frames_read % 30 == 0:
+                percent = (frames_read / total_frames) * 100
+                if progress_callback:
+                    progress_callback(percent)
+                else:
+                    print(f"Progress: {percent:.1f}%", end='\r')
+        
+        if output_mode == 'sidecar':
+            self.sidecar = AnnotationSidecar(output_path, video_path, 'main_analyzer.MainAnalyzer', fps, (width, height))
+        if session_log_path:
+            video_name = os.path.splitext(os.path.basename(video_path))[0]
+            self.session_log = SessionLog(session_log_path, video_name, fps, self.session_rows)
+        video_output = output_path if output_mode == 'video' else None
+        
+        def make_pipeline(writer, start_frame=0, end_frame=None):
+            # Without a writer the pipeline has no annotate/encode stages at all
+            if self.sidecar:
+                self.sidecar.begin(start_frame)
+            if self.session_log:
+                self.session_log.begin(start_frame)
+            recording = self.sidecar or self.session_log
+            return VideoPipeline(self.analyze_frame, self.annotate_frame, writer, progress_fn=progress,
+                                 start_frame=start_frame, end_frame=end_frame, recycle_frames=True,
+                                 result_fn=self.record_result if recording else None)
+        
+        if checkpointer:
+            pipeline = run_checkpointed(cap, self, make_pipeline, checkpointer, fps, video_output, (width, height))
+        else:
+            out = None
+            if video_output:
+                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                out = cv2.VideoWriter(video_output, fourcc, fps, (width, height))
+            pipeline = make_pipeline(out)
+            pipeline.run(cap)
+            if out:
+                out.release()
         
         cap.release()
-        out.release()
+        if self.sidecar:
+            self.sidecar.close()
+            self.sidecar = None
+        if self.session_log:
+            self.session_log.close()
+            self.session_log = None
         
         print(f"\n✅ Video processing complete!")
-        print(f"📹 Output saved: {output_path}")
+        if video_output:
+            print(f"📹 Output saved: {video_output}")
+        pipeline.print_stats()
+        if self.motion_gate:
+            gate = self.motion_gate.stats()
+            print(f"⏩ Motion gate reused {gate['frames_skipped']} of {gate['frames_checked']} frames "
+                  f"({gate['skipped_fraction'] * 100:.1f}%, threshold {gate['threshold']})")
         
         return self.generate_report(fps, total_frames)
     
-    def draw_stats(self, frame, faces):
-        """Draw statistics overlay"""
-        h, w = frame.shape[:2]
+    def analyze_frame(self, frame):
+        """Run detection and per-student analysis on one frame
+        
+        With a motion gate, a frame that barely differs from the last analyzed
+        one reuses its faces and classifier outputs; only the per-student
+        scoring runs, so every history still advances by one frame.
+        """
+        self.frame_count += 1
+        
+        # The gate only looks at the seating area, so the teacher walking past doesn't count
+        if self.motion_gate and self.motion_gate.is_static(self.zones.crop(frame) if self.zones else frame):
+            observations = self.last_observations
+        else:
+            observations = self.observe(frame)
+            self.last_observations = observations
+        
+        # Process each student
+        students = []
+        for observation in observations:
+            student_id, face_data = observation['student_id'], observation['face_data']
+            self.student_tracker[student_id] = face_data['center']
+            if self.zones:
+                self.zone_tally.add(student_id, face_data['zone'])
+            
+            # Analyze focus
+            focus_score = self.focus_analyzer.analyze_focus(student_id, face_data, self.frame_center,
+                                                            self.frame_half_size)
+            
+            # Analyze sentiment
+            sentiment_score, emotion = self.sentiment_analyzer.record_sentiment(student_id, *observation['sentiment'])
+            
+            # Detect interactions
+            hand_raised, total_interactions = self.interaction_detector.record_interaction(student_id,
+                                                                                           observation['hand_raised'])
+            
+            # Estimate doubts
+            total_doubts, has_doubt = self.doubt_estimator.estimate_doubts(student_id, emotion, focus_score, hand_raised)
+            
+            students.append({
+                'student_id': student_id,
+                'bbox': face_data['bbox'],
+                'focus_score': focus_score,
+                'emotion': emotion,
+                'hand_raised': hand_raised,
+                'has_doubt': has_doubt
+            })
         
-        # Semi-transparent overlay
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (10, 10), (350, 180), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.6, frame, 0.4, 0, frame)
+        return {'students': students, 'stats': self.compute_stats(len(observations))}
+    
+    def observe(self, frame):
+        """Faces, student IDs and smile/hand-raise classifier outputs: the expensive part of a frame"""
+        faces = self.face_detector.detect_faces(frame)
+        
+        # Assign IDs for all faces at once
+        student_ids = self.tracker.update([face_data['bbox'] for face_data in faces])
+        
+        return [{
+            'student_id': student_id,
+            'face_data': face_data,
+            'sentiment': self.sentiment_analyzer.classify(face_data['face_roi']),
+            'hand_raised': self.interaction_detector.detect_hand_raise(frame, face_data['bbox'])
+        } for face_data, student_id in zip(faces, student_ids)]
+    
+    @staticmethod
+    def annotate_frame(frame, result):
+        """Draw a frame's analysis result onto it; also renders sidecar results at playback"""
+        for student in result['students']:
+            x, y, w, h = student['bbox']
+            focus_score = student['focus_score']
+            student_id = student['student_id']
+            
+            # Box color based on focus
+            color = (0, 255, 0) if focus_score > 60 else (0, 165, 255) if focus_score > 40 else (0, 0, 255)
+            cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
+            
+            # Student ID
+            cv2.putText(frame, student_id, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+            
+            # Emotion
+            cv2.putText(frame, student['emotion'], (x, y+h+20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
+            
+            # Hand raise indicator
+            if student['hand_raised']:
+                cv2.putText(frame, "HAND UP!", (x, y+h+40), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
+            
+            # Doubt indicator
+            if student['has_doubt']:
+                cv2.circle(frame, (x+w-10, y+10), 8, (0, 0, 255), -1)
+                cv2.putText(frame, "?", (x+w-15, y+15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
         
-        # Stats
-        cv2.putText(frame, f"Students Detected: {len(faces)}", (20, 35), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        # Draw overall stats
+        MainAnalyzer.draw_stats(frame, result['stats'])
         
-        # Calculate aggregate metrics
+        return frame
+    
+    def record_result(self, frame_idx, result):
+        """VideoPipeline result_fn: pass each frame's result to the sidecar and session log"""
+        if self.sidecar:
+            self.sidecar.write(frame_idx, result)
+        if self.session_log:
+            self.session_log.write(frame_idx, result)
+    
+    @staticmethod
+    def session_rows(result):
+        """Session log rows of one frame's result; there is no focused decision or separate engagement score"""
+        for student in result['students']:
+            yield (student['student_id'], student['bbox'], student['focus_score'], None, student['emotion'],
+                   student['hand_raised'], None)
+    
+    def checkpoint_state(self):
+        """Per-student state to resume this video part-way (see job_manifest)"""
+        if self.sidecar:
+            self.sidecar.flush()
+        if self.session_log:
+            self.session_log.flush()
+        return {
+            'frame_count': self.frame_count,
+            'student_tracker': self.student_tracker,
+            'tracker': self.tracker,
+            'focus': self.focus_analyzer.student_focus_history,
+            'sentiment': self.sentiment_analyzer.student_sentiment_history,
+            'interaction': self.interaction_detector.student_interaction_history,
+            'doubt': self.doubt_estimator.student_doubt_history,
+            'zones': self.zone_tally,
+            'motion_gate': self.motion_gate,
+            'last_observations': self.last_observations,
+            # SentimentAnalyzer draws from the global RNG; keep resumed runs reproducible
+            'random_state': np.random.get_state()
+        }
+    
+    def restore_checkpoint(self, state):
+        self.frame_count = state['frame_count']
+        self.student_tracker = state['student_tracker']
+        self.tracker = state['tracker']
+        self.focus_analyzer.student_focus_history = state['focus']
+        self.sentiment_analyzer.student_sentiment_history = state['sentiment']
+        self.interaction_detector.student_interaction_history = state['interaction']
+        self.doubt_estimator.student_doubt_history = state['doubt']
+        self.zone_tally = state.get('zones', ZoneTally())
+        if self.motion_gate and state.get('motion_gate'):
+            self.motion_gate = state['motion_gate']
+            self.last_observations = state['last_observations']
+        np.random.set_state(state['random_state'])
+    
+    def compute_stats(self, face_count):
+        """Snapshot aggregate metrics for the overlay"""
         total_focus = sum(self.focus_analyzer.get_average_focus(sid) for sid in self.student_tracker.keys())
         avg_focus = total_focus / len(self.student_tracker) if self.student_tracker else 0
         
@@ -149,13 +292,32 @@ class MainAnalyzer:
         total_interactions = sum(self.interaction_detector.get_total_interactions(sid) for sid in self.student_tracker.keys())
         total_doubts = sum(self.doubt_estimator.get_total_doubts(sid) for sid in self.student_tracker.keys())
         
-        cv2.putText(frame, f"Avg Focus Score: {avg_focus:.1f}/100", (20, 65), 
+        return {
+            'face_count': face_count,
+            'avg_focus': avg_focus,
+            'avg_sentiment': avg_sentiment,
+            'total_interactions': total_interactions,
+            'total_doubts': total_doubts
+        }
+    
+    @staticmethod
+    def draw_stats(frame, stats):
+        """Draw statistics overlay"""
+        h, w = frame.shape[:2]
+        
+        # Semi-transparent panel, blended in place over its own pixels only
+        shade_panel(frame, (10, 10), (350, 180), 0.6)
+        
+        # Stats
+        cv2.putText(frame, f"Students Detected: {stats['face_count']}", (20, 35), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        cv2.putText(frame, f"Avg Focus Score: {stats['avg_focus']:.1f}/100", (20, 65), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-        cv2.putText(frame, f"Avg Sentiment: {avg_sentiment:.1f}/100", (20, 95), 
+        cv2.putText(frame, f"Avg Sentiment: {stats['avg_sentiment']:.1f}/100", (20, 95), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-        cv2.putText(frame, f"Total Interactions: {total_interactions}", (20, 125), 
+        cv2.putText(frame, f"Total Interactions: {stats['total_interactions']}", (20, 125), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-        cv2.putText(frame, f"Estimated Doubts: {total_doubts}", (20, 155), 
+        cv2.putText(frame, f"Estimated Doubts: {stats['total_doubts']}", (20, 155), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 165, 255), 2)
     
     def generate_report(self, fps, total_frames):
@@ -178,6 +340,8 @@ class MainAnalyzer:
                 'doubts': doubts,
                 'emotion_distribution': emotions
             })
+            if self.zones:
+                student_reports[-1]['zone'] = self.zone_tally.zone_of(student_id)
         
         num_students = len(student_reports)
         
@@ -194,6 +358,13 @@ class MainAnalyzer:
             'student_details': student_reports,
             'timestamp': datetime.now().isoformat()
         }
+        if self.zones:
+            report['zone_metrics'] = zone_metrics(
+                self.zones.names, student_reports,
+                averages={'average_focus_score': 'focus_score', 'average_sentiment': 'sentiment_score'},
+                totals={'total_interactions': 'interactions', 'total_doubts': 'doubts'})
+        if self.motion_gate:
+            report['motion_gate'] = self.motion_gate.stats()
         
         return report
     
@@ -219,6 +390,15 @@ class MainAnalyzer:
             writer.writerow(['Total Doubts', report['aggregate_metrics']['total_doubts']])
             writer.writerow([])
             
+            # Per seating zone, when the analyzer ran with ClassroomZones
+            if report.get('zone_metrics'):
+                writer.writerow(['ZONE METRICS', ''])
+                writer.writerow(['Zone', 'Students', 'Focus Score', 'Sentiment Score', 'Interactions', 'Doubts'])
+                for zone, metrics in report['zone_metrics'].items():
+                    writer.writerow([zone, metrics['students'], metrics['average_focus_score'],
+                                     metrics['average_sentiment'], metrics['total_interactions'], metrics['total_doubts']])
+                writer.writerow([])
+            
             # Student details
             writer.writerow(['STUDENT DETAILS', ''])
             writer.writerow(['Student ID', 'Focus Score', 'Sentiment Score', 'Interactions', 'Doubts', 'Emotions'])
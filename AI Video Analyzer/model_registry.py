@@ -0,0 +1,220 @@
+"""
+Process-wide model registry: each model is loaded and warmed up once per process.
+
+Analyzers used to build their own Haar cascades, MediaPipe graphs and
+DeepFace emotion model in every constructor. The first DeepFace call
+happened inside the frame loop, so a batch paid model init and a
+first-frame latency spike for every video.
+
+Models here are keyed by name plus arguments, e.g. ('cascade',
+'haarcascade_eye.xml'). Each one is run once on a dummy input right after
+loading, and its load and warm-up times are printed. How a model is handed
+out depends on whether it is safe to share:
+
+- thread-safe models (hand-raise forest, Keras emotion model): get()
+  returns the single shared instance;
+- OpenCV cascades, which must not be used from two threads at once:
+  get() returns a PooledModel. Each method call borrows an idle instance,
+  so VideoPipeline and the web monitor's analysis threads can share them;
+- MediaPipe FaceMesh/Pose, which keep tracking state between frames:
+  acquire() checks one out for an analyzer's lifetime and release() resets
+  the graph and puts it back for the next video.
+"""
+
+import threading
+import time
+import cv2
+import numpy as np
+
+
+class PooledModel:
+    """Stands in for a model that is not thread-safe; every method call borrows an idle instance"""
+
+    def __init__(self, registry, key):
+        self._registry = registry
+        self._key = key
+
+    def __getattr__(self, attr):
+        def call(*args, **kwargs):
+            model = self._registry.acquire(*self._key)
+            try:
+                return getattr(model, attr)(*args, **kwargs)
+            finally:
+                self._registry.release(model, *self._key)
+        return call
+
+
+class ModelRegistry:
+    """Loads models once per process and hands out shared, pooled or exclusive instances"""
+
+    def __init__(self):
+        self.factories = {}   # name -> (load_fn, warm_fn, thread_safe, reset_fn)
+        self.shared = {}      # key -> the instance of a thread-safe model
+        self.failed = {}      # key -> the error a thread-safe model's load raised
+        self.idle = {}        # key -> instances of other models not currently in use
+        self.timings = {}     # key -> instances loaded, load and warm-up seconds
+        self.lock = threading.Lock()
+        self.shared_lock = threading.Lock()  # one load per shared model, even if two threads ask at once
+
+    def register(self, name, load_fn, warm_fn=None, thread_safe=False, reset_fn=None):
+        """load_fn(*args) builds the model, warm_fn(model) runs a dummy inference on it,
+        reset_fn(model) clears state it kept from its last user before release() pools it"""
+        self.factories[name] = (load_fn, warm_fn, thread_safe, reset_fn)
+
+    def load(self, key):
+        """Build and warm a new instance of key; records and prints the time it took"""
+        load_fn, warm_fn, _, _ = self.factories[key[0]]
+        start = time.perf_counter()
+        model = load_fn(*key[1:])
+        loaded = time.perf_counter()
+        if model is None:
+            # Nothing to load yet, e.g. the hand-raise model before it is trained
+            return None
+        if warm_fn and model is not None:
+            warm_fn(model)
+        warmed = time.perf_counter()
+
+        with self.lock:
+            timing = self.timings.setdefault(key, {'instances': 0, 'load_seconds': 0.0, 'warm_seconds': 0.0})
+            timing['instances'] += 1
+            timing['load_seconds'] += loaded - start
+            timing['warm_seconds'] += warmed - loaded
+        instance = f" (instance {timing['instances']})" if timing['instances'] > 1 else ""
+        print(f"🧠 Loaded {self.label(key)}{instance} in {(loaded - start) * 1000:.1f} ms "
+              f"+ {(warmed - loaded) * 1000:.1f} ms warm-up")
+        return model
+
+    def get(self, name, *args):
+        """The shared instance of a thread-safe model, or a PooledModel for one that is not"""
+        key = (name,) + args
+        if not self.factories[name][2]:
+            # Load one instance now, so the first frame doesn't pay for it
+            self.release(self.acquire(*key), *key)
+            return PooledModel(self, key)
+
+        with self.shared_lock:
+            if key in self.failed:
+                raise self.failed[key]
+            if key not in self.shared:
+                try:
+                    model = self.load(key)
+                except Exception as e:
+                    # A slow load that fails (e.g. a weights download) is tried once per process
+                    self.failed[key] = e
+                    raise
+                if model is None:
+                    # Not cached, so a model file written later is picked up by the next get()
+                    return None
+                self.shared[key] = model
+            return self.shared[key]
+
+    def acquire(self, name, *args):
+        """An instance for exclusive use until release(); loads another if all are busy"""
+        key = (name,) + args
+        with self.lock:
+            idle = self.idle.get(key)
+            if idle:
+                return idle.pop()
+        return self.load(key)
+
+    def release(self, model, name, *args):
+        reset_fn = self.factories[name][3]
+        if reset_fn and model is not None:
+            reset_fn(model)
+        with self.lock:
+            self.idle.setdefault((name,) + args, []).append(model)
+
+    def warm_up(self, specs):
+        """Load every (name, *args) in specs ahead of the first frame; failures are reported, not raised
+
+        A model that fails here, e.g. DeepFace weights that cannot be
+        downloaded, is reported once. get() re-raises the same error for the
+        rest of the process, so the analyzer's own fallback applies without
+        another load attempt.
+        """
+        for spec in specs:
+            if tuple(spec) in self.failed:
+                continue
+            try:
+                self.get(*spec)
+            except Exception as e:
+                print(f"⚠️  Could not load {self.label(tuple(spec))}: {e}")
+
+    @staticmethod
+    def label(key):
+        return ':'.join(str(part) for part in key)
+
+    def stats(self):
+        """Instances, load and warm-up milliseconds per model"""
+        with self.lock:
+            return {
+                self.label(key): {
+                    'instances': timing['instances'],
+                    'load_ms': round(timing['load_seconds'] * 1000, 1),
+                    'warm_ms': round(timing['warm_seconds'] * 1000, 1)
+                }
+                for key, timing in self.timings.items()
+            }
+
+
+def _load_cascade(filename):
+    return cv2.CascadeClassifier(cv2.data.haarcascades + filename)
+
+
+def _warm_cascade(cascade):
+    cascade.detectMultiScale(np.zeros((64, 64), dtype=np.uint8))
+
+
+def _load_face_mesh(max_num_faces):
+    import mediapipe as mp
+    return mp.solutions.face_mesh.FaceMesh(
+        max_num_faces=max_num_faces,
+        refine_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+def _load_pose():
+    import mediapipe as mp
+    return mp.solutions.pose.Pose(
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+def _warm_mediapipe(solution):
+    solution.process(np.zeros((256, 256, 3), dtype=np.uint8))
+    _reset_mediapipe(solution)
+
+
+def _reset_mediapipe(solution):
+    # Restarts the graph, so landmarks tracked in one video don't seed the next
+    solution.reset()
+
+
+def _load_emotion():
+    from emotion_batcher import EmotionBatcher
+    return EmotionBatcher.build_default_model()
+
+
+def _warm_emotion(predict):
+    predict(np.zeros((1, 48, 48, 1), dtype=np.float32))
+
+
+def _load_hand_raise(path, threshold):
+    from hand_raise_classifier import HandRaiseClassifier
+    return HandRaiseClassifier.load(path, threshold=threshold)
+
+
+def _warm_hand_raise(classifier):
+    classifier.predict_proba(np.zeros((1, getattr(classifier.model, 'n_features_in_', 9))))
+
+
+models = ModelRegistry()
+models.register('cascade', _load_cascade, _warm_cascade)
+models.register('face_mesh', _load_face_mesh, _warm_mediapipe, reset_fn=_reset_mediapipe)
+models.register('pose', _load_pose, _warm_mediapipe, reset_fn=_reset_mediapipe)
+# Keras predict may be called from several threads at once
+models.register('emotion', _load_emotion, _warm_emotion, thread_safe=True)
+models.register('hand_raise', _load_hand_raise, _warm_hand_raise, thread_safe=True)
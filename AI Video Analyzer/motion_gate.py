@@ -0,0 +1,114 @@
+"""
+Motion gate: skip detection on frames where nothing moved.
+
+Recorded lectures have long stretches where students barely move, yet
+MainAnalyzer ran the face, eye and smile cascades and the skin check on
+every frame. The gate compares a 64x36 grayscale thumbnail of each frame
+with the thumbnail of the last frame that was fully analyzed. Below
+threshold (mean absolute difference, 0..1), the analyzer reuses that
+frame's detections and classifier outputs. Only the cheap per-student
+scoring runs, so histories and timelines still advance once per frame.
+
+Comparing against the last analyzed frame rather than the previous one
+means slow drift adds up and eventually triggers a full analysis. Also,
+max_reuse frames in a row forces one regardless.
+
+Usage: python motion_gate.py [videos ...] [--thresholds 0.003,0.005,0.008] [--tolerance 2.0]
+"""
+
+import argparse
+import time
+import numpy as np
+from adaptive_sampler import MotionMeter
+
+
+class MotionGate:
+    """Decides per frame whether the last analyzed frame's results can be reused"""
+    
+    def __init__(self, threshold=0.003, max_reuse=30, size=(64, 36)):
+        self.threshold = threshold
+        self.max_reuse = max_reuse
+        self.meter = MotionMeter(size)
+        self.reference = None  # thumbnail of the last fully analyzed frame
+        self.reused = 0        # frames reused in a row since then
+        self.frames = 0
+        self.skipped = 0
+    
+    def is_static(self, frame):
+        """True to reuse the last analysis; False means analyze frame, which becomes the new reference"""
+        self.frames += 1
+        thumb = self.meter.thumbnail(frame)
+        if (self.reference is not None and self.reused < self.max_reuse and
+                self.meter.difference(thumb, self.reference) < self.threshold):
+            self.reused += 1
+            self.skipped += 1
+            return True
+        
+        self.reference = thumb
+        self.reused = 0
+        return False
+    
+    def stats(self):
+        return {
+            'threshold': self.threshold,
+            'max_reuse': self.max_reuse,
+            'frames_checked': self.frames,
+            'frames_skipped': self.skipped,
+            'skipped_fraction': round(self.skipped / self.frames, 3) if self.frames else 0.0
+        }
+
+
+def run_analyzer(video_path, motion_threshold):
+    """Metrics-only MainAnalyzer run; returns (report, seconds)"""
+    from main_analyzer import MainAnalyzer
+    
+    # SentimentAnalyzer adds random noise; same seed for every run
+    np.random.seed(0)
+    analyzer = MainAnalyzer(motion_threshold=motion_threshold)
+    start = time.perf_counter()
+    report = analyzer.process_video(video_path, None, progress_callback=lambda percent: None, output_mode='metrics')
+    return report, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare MainAnalyzer reports with and without the motion gate")
+    parser.add_argument('videos', nargs='*', default=["assets/215475_small.mp4"])
+    parser.add_argument('--thresholds', default="0.003,0.005,0.008", help="comma list of gate thresholds")
+    parser.add_argument('--tolerance', type=float, default=2.0,
+                        help="allowed change of average focus/sentiment, in points out of 100")
+    args = parser.parse_args()
+    
+    thresholds = [float(t) for t in args.thresholds.split(',')]
+    within = True
+    rows = []
+    for video_path in args.videos:
+        baseline, base_seconds = run_analyzer(video_path, None)
+        if baseline is None:
+            return 1
+        base_metrics = baseline['aggregate_metrics']
+        rows.append((video_path, "off", 0.0, base_seconds, 1.0, 0.0, 0.0, baseline['total_students'],
+                     base_metrics['total_interactions'], base_metrics['total_doubts']))
+        
+        for threshold in thresholds:
+            report, seconds = run_analyzer(video_path, threshold)
+            metrics = report['aggregate_metrics']
+            focus_delta = metrics['average_focus_score'] - base_metrics['average_focus_score']
+            sentiment_delta = metrics['average_sentiment'] - base_metrics['average_sentiment']
+            within = within and abs(focus_delta) <= args.tolerance and abs(sentiment_delta) <= args.tolerance
+            rows.append((video_path, f"{threshold:g}", report['motion_gate']['skipped_fraction'], seconds,
+                         base_seconds / seconds, focus_delta, sentiment_delta, report['total_students'],
+                         metrics['total_interactions'], metrics['total_doubts']))
+    
+    print(f"\n{'video':<28}{'gate':>7}{'skipped':>9}{'seconds':>9}{'speedup':>9}"
+          f"{'Δfocus':>8}{'Δsentiment':>12}{'students':>10}{'hands':>7}{'doubts':>8}")
+    for video_path, gate, skipped, seconds, speedup, focus, sentiment, students, hands, doubts in rows:
+        print(f"{video_path[-28:]:<28}{gate:>7}{skipped * 100:8.1f}%{seconds:9.2f}{speedup:8.2f}x"
+              f"{focus:+8.2f}{sentiment:+12.2f}{students:10d}{hands:7d}{doubts:8d}")
+    
+    print(f"✅ Average focus and sentiment within ±{args.tolerance}" if within
+          else f"❌ Average focus or sentiment moved more than ±{args.tolerance}")
+    return 0 if within else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,8 +1,20 @@
 import cv2
 import sys
+from annotation_sidecar import load_sidecar, load_renderer
 
-def play_video(video_path):
-    """Play analyzed video with controls"""
+def play_video(video_path, sidecar_path=None):
+    """Play analyzed video with controls
+    
+    With sidecar_path, video_path is the original recording and each frame's
+    overlay is drawn from the sidecar as it is shown (frames the analyzer
+    skipped reuse the last analyzed result).
+    """
+    annotate, records = None, {}
+    if sidecar_path:
+        header, records = load_sidecar(sidecar_path)
+        annotate = load_renderer(header)
+        video_path = video_path or header['video']
+    
     cap = cv2.VideoCapture(video_path)
     
     if not cap.isOpened():
@@ -12,10 +24,12 @@ def play_video(video_path):
     fps = int(cap.get(cv2.CAP_PROP_FPS))
     delay = int(1000 / fps) if fps > 0 else 30
     
-    print(f"🎬 Playing: {video_path}")
+    print(f"🎬 Playing: {video_path}" + (f" with overlays from {sidecar_path}" if sidecar_path else ""))
     print("Controls: SPACE=Pause/Resume | Q=Quit | R=Restart")
     
     paused = False
+    frame_idx = 0
+    result = None
     
     while True:
         if not paused:
@@ -24,6 +38,12 @@ def play_video(video_path):
                 print("\n✅ Video finished")
                 break
             
+            if annotate:
+                result = records.get(frame_idx, result)
+                if result is not None:
+                    frame = annotate(frame, result)
+            frame_idx += 1
+            
             cv2.imshow('Student Engagement Analysis', frame)
         
         key = cv2.waitKey(delay if not paused else 1) & 0xFF
@@ -35,11 +55,16 @@ def play_video(video_path):
             print("⏸️  Paused" if paused else "▶️  Playing")
         elif key == ord('r'):
             cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            frame_idx, result = 0, None
             print("🔄 Restarted")
     
     cap.release()
     cv2.destroyAllWindows()
 
 if __name__ == "__main__":
+    # play_analyzed_video.py annotations.jsonl [source.mp4] renders a sidecar over its source video
     video_file = sys.argv[1] if len(sys.argv) > 1 else "output_analyzed_video.mp4"
-    play_video(video_file)
+    if video_file.endswith('.jsonl'):
+        play_video(sys.argv[2] if len(sys.argv) > 2 else None, sidecar_path=video_file)
+    else:
+        play_video(video_file)
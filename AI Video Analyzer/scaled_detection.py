@@ -0,0 +1,66 @@
+import cv2
+import numpy as np
+
+# minSize every cascade call in this project has always used
+BASE_MIN_FACE = 30
+
+
+def auto_scale(min_face_size, frame_height, base_min_size=BASE_MIN_FACE):
+    """Largest downscale that still keeps the smallest expected face >= base_min_size
+    
+    min_face_size is in full-resolution pixels, or a fraction of the frame
+    height when below 1 (e.g. 0.06 = faces at least 6% of the frame tall).
+    """
+    if min_face_size < 1:
+        min_face_size = min_face_size * frame_height
+    return max(1.0, min_face_size / base_min_size)
+
+
+class ScaledCascadeDetector:
+    """Runs a Haar cascade on a downscaled frame and maps boxes back to full resolution
+    
+    Only the face search runs at low resolution; callers still crop the
+    returned boxes from the full-resolution frame for eye/smile cascades.
+    With the default min_face_size=30 the frame is never downscaled.
+    frame_height is the height a fractional min_face_size refers to when
+    detect() is given a crop of the frame (see ClassroomZones.detect).
+    """
+    
+    def __init__(self, cascade, min_face_size=BASE_MIN_FACE, scale=None):
+        self.cascade = cascade
+        self.min_face_size = min_face_size
+        self.scale = scale
+        self.frame_height = None
+        self.small = None
+    
+    def frame_scale(self, gray):
+        """Downscale factor for this frame"""
+        if self.scale is not None:
+            return max(1.0, self.scale)
+        return auto_scale(self.min_face_size, self.frame_height or gray.shape[0])
+    
+    def detect(self, gray):
+        """Return (N, 4) full-resolution face boxes"""
+        scale = self.frame_scale(gray)
+        
+        if scale == 1.0:
+            return self.cascade.detectMultiScale(gray, 1.1, 5, minSize=(BASE_MIN_FACE, BASE_MIN_FACE))
+        
+        img_h, img_w = gray.shape[:2]
+        size = (max(1, int(img_w / scale)), max(1, int(img_h / scale)))
+        if self.small is None or self.small.shape[::-1] != size:
+            self.small = np.empty(size[::-1], dtype=gray.dtype)
+        cv2.resize(gray, size, dst=self.small, interpolation=cv2.INTER_AREA)
+        
+        faces = self.cascade.detectMultiScale(self.small, 1.1, 5, minSize=(BASE_MIN_FACE, BASE_MIN_FACE))
+        if len(faces) == 0:
+            return faces
+        
+        # Map back using the actual per-axis ratio of the resized frame
+        ratio = np.array([img_w / size[0], img_h / size[1]] * 2)
+        boxes = np.round(np.asarray(faces, dtype=np.float64) * ratio).astype(np.int32)
+        boxes[:, 0] = np.clip(boxes[:, 0], 0, img_w - 1)
+        boxes[:, 1] = np.clip(boxes[:, 1], 0, img_h - 1)
+        boxes[:, 2] = np.minimum(boxes[:, 2], img_w - boxes[:, 0])
+        boxes[:, 3] = np.minimum(boxes[:, 3], img_h - boxes[:, 1])
+        return boxes
@@ -1,23 +1,19 @@
-import cv2
 import numpy as np
 from collections import deque
+from model_registry import models
 
 class SentimentAnalyzer:
     def __init__(self):
-        self.smile_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_smile.xml')
+        self.smile_cascade = models.get('cascade', 'haarcascade_smile.xml')
         self.student_sentiment_history = {}
         self.history_length = 30
     
     def analyze_sentiment(self, student_id, face_roi):
         """Analyze sentiment from facial features"""
-        if student_id not in self.student_sentiment_history:
-            self.student_sentiment_history[student_id] = {
-                'sentiments': deque(maxlen=self.history_length),
-                'emotions': deque(maxlen=self.history_length)
-            }
-        
-        history = self.student_sentiment_history[student_id]
-        
+        return self.record_sentiment(student_id, *self.classify(face_roi))
+    
+    def classify(self, face_roi):
+        """(sentiment_score, emotion) of one face crop"""
         # Detect smile
         smiles = self.smile_cascade.detectMultiScale(face_roi, 1.8, 20)
         
@@ -42,7 +38,17 @@ class SentimentAnalyzer:
             sentiment_score = 60 + np.random.randint(-10, 10)
         
         sentiment_score = max(0, min(100, sentiment_score))
+        return sentiment_score, emotion
+    
+    def record_sentiment(self, student_id, sentiment_score, emotion):
+        """Add one frame's classify() result to the student's history"""
+        if student_id not in self.student_sentiment_history:
+            self.student_sentiment_history[student_id] = {
+                'sentiments': deque(maxlen=self.history_length),
+                'emotions': deque(maxlen=self.history_length)
+            }
         
+        history = self.student_sentiment_history[student_id]
         history['sentiments'].append(sentiment_score)
         history['emotions'].append(emotion)
         
@@ -0,0 +1,171 @@
+"""
+Columnar per-frame, per-student session log (Parquet or Arrow IPC).
+
+Reports only hold end-of-run aggregates, and the CSV ones have a header
+block that readers must skip. A session log records one row per student
+per analyzed frame:
+
+    session_id  string        video name unless given
+    frame       int64         source frame index
+    ts          float64       seconds from the start of the video
+    student_id  string
+    bbox        int32[4]      x, y, w, h in full-frame pixels
+    focus       float32       0-100, null if the analyzer has no focus measure
+    focused     bool          focused/not-focused decision, null if the analyzer has no such decision
+    emotion     string        null if the analyzer has no emotion measure
+    hand_raised bool          null if hand raises are not attributed to students
+    engagement  float32       0-100, null if the analyzer has no engagement measure
+
+Rows are buffered and written as row groups of row_group_size while the
+video is processed. The log is a directory of part files, readable as one
+dataset with pyarrow.dataset or pandas.read_parquet, with predicate
+pushdown on any column. Each checkpoint closes the current part. A part is
+written under a hidden temporary name and renamed when complete, so
+readers never see a half-written file. A resumed run drops the parts from
+frames at or after its start frame, then carries on.
+
+Requires pyarrow. A path ending in .arrow or .feather writes Arrow IPC
+parts, anything else Parquet.
+"""
+
+import os
+import re
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pds
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+HAS_PYARROW = pa is not None
+
+_PART_NAME = re.compile(r'^part-(\d+)\.(parquet|arrow)$')
+
+
+def session_schema():
+    return pa.schema([
+        ('session_id', pa.string()),
+        ('frame', pa.int64()),
+        ('ts', pa.float64()),
+        ('student_id', pa.string()),
+        ('bbox', pa.list_(pa.int32(), 4)),
+        ('focus', pa.float32()),
+        ('focused', pa.bool_()),
+        ('emotion', pa.string()),
+        ('hand_raised', pa.bool_()),
+        ('engagement', pa.float32())
+    ])
+
+
+def _optional(value, cast):
+    return None if value is None else cast(value)
+
+
+class SessionLog:
+    """Writes one row per student per analyzed frame as row groups in part files
+    
+    rows_fn(result) yields (student_id, bbox, focus, focused, emotion,
+    hand_raised, engagement) for one analysis result, using None for
+    measures the analyzer does not have. begin(start_frame) must be called before a run
+    writes frames, as with AnnotationSidecar; only the first call cleans up.
+    """
+    
+    def __init__(self, path, session_id, fps, rows_fn, row_group_size=50000):
+        if pa is None:
+            raise ImportError("Session logs need pyarrow: pip install pyarrow")
+        self.path = path
+        self.session_id = session_id
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.rows_fn = rows_fn
+        self.row_group_size = row_group_size
+        self.format = 'arrow' if path.endswith(('.arrow', '.feather')) else 'parquet'
+        self.schema = session_schema()
+        
+        self.started = False
+        self.writer = None
+        self.part_path = None
+        self.tmp_path = None
+        self.columns = {name: [] for name in self.schema.names}
+        self.buffered = 0
+        self.rows_written = 0
+        self.parts_written = 0
+    
+    def begin(self, start_frame=0):
+        if self.started:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        for name in os.listdir(self.path):
+            match = _PART_NAME.match(name)
+            # Unfinished parts of a crashed run, and parts a resumed run will redo
+            if name.startswith('.') or (match and int(match.group(1)) >= start_frame):
+                os.remove(os.path.join(self.path, name))
+        self.started = True
+    
+    def write(self, frame_idx, result):
+        """VideoPipeline result_fn: buffer this frame's rows, writing a row group when one is full"""
+        for student_id, bbox, focus, focused, emotion, hand_raised, engagement in self.rows_fn(result):
+            if self.writer is None:
+                self.open_part(frame_idx)
+            self.columns['session_id'].append(self.session_id)
+            self.columns['frame'].append(frame_idx)
+            self.columns['ts'].append(frame_idx / self.fps)
+            self.columns['student_id'].append(str(student_id))
+            self.columns['bbox'].append([int(v) for v in bbox])
+            self.columns['focus'].append(_optional(focus, float))
+            self.columns['focused'].append(_optional(focused, bool))
+            self.columns['emotion'].append(emotion)
+            self.columns['hand_raised'].append(_optional(hand_raised, bool))
+            self.columns['engagement'].append(_optional(engagement, float))
+            self.buffered += 1
+        
+        if self.buffered >= self.row_group_size:
+            self.write_row_group()
+    
+    def open_part(self, first_frame):
+        name = f"part-{first_frame:08d}.{self.format}"
+        self.part_path = os.path.join(self.path, name)
+        self.tmp_path = os.path.join(self.path, f".{name}.tmp")
+        if self.format == 'arrow':
+            self.writer = ipc.new_file(self.tmp_path, self.schema)
+        else:
+            self.writer = pq.ParquetWriter(self.tmp_path, self.schema)
+    
+    def write_row_group(self):
+        if not self.buffered:
+            return
+        table = pa.Table.from_pydict(self.columns, schema=self.schema)
+        if self.format == 'arrow':
+            self.writer.write_table(table, max_chunksize=self.row_group_size)
+        else:
+            self.writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows_written += self.buffered
+        self.columns = {name: [] for name in self.schema.names}
+        self.buffered = 0
+    
+    def flush(self):
+        """Called before a checkpoint: finish the current part so every checkpointed frame is on disk"""
+        if self.writer is None:
+            return
+        self.write_row_group()
+        self.writer.close()
+        os.replace(self.tmp_path, self.part_path)
+        self.writer = None
+        self.parts_written += 1
+    
+    def close(self):
+        self.begin()
+        self.flush()
+        print(f"🧾 Session log saved: {self.path} ({self.rows_written} rows in {self.parts_written} part(s))")
+
+
+def read_session_log(path, columns=None, where=None):
+    """Session log as a pyarrow Table; where is a pyarrow.dataset expression, pushed down to the files
+    
+    e.g. read_session_log(path, ['frame', 'focus'], pds.field('student_id') == 'S3')
+    """
+    if pa is None:
+        raise ImportError("Session logs need pyarrow: pip install pyarrow")
+    file_format = 'ipc' if path.rstrip('/').endswith(('.arrow', '.feather')) else 'parquet'
+    return pds.dataset(path, format=file_format).to_table(columns=columns, filter=where)
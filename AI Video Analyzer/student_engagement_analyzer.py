@@ -1,31 +1,108 @@
 import cv2
 import numpy as np
+import os
+import sys
+import math
+import multiprocessing
 from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import mediapipe as mp
-from deepface import DeepFace
 import json
+from emotion_batcher import EmotionBatcher
+from video_pipeline import VideoPipeline
+from adaptive_sampler import AdaptiveSampler
+from frame_buffers import FrameBuffers
+from job_manifest import run_checkpointed
+from annotation_sidecar import AnnotationSidecar, OUTPUT_MODES
+from session_log import SessionLog
+from model_registry import models
+from head_pose import landmark_array, face_boxes, head_poses, looking_forward, head_pose
+from classroom_zones import ClassroomZones, ZoneTally, zone_metrics
+from student_tracker import StudentTracker
+from timeline_store import TimelineStore
 from datetime import datetime
 
+# Sentiment weight per emotion; sad/fear with confidence > 0.5 count towards doubts
+EMOTION_WEIGHTS = {
+    'happy': 1.0,
+    'neutral': 0.5,
+    'surprise': 0.6,
+    'sad': -0.5,
+    'angry': -1.0,
+    'fear': -0.7,
+    'disgust': -0.8
+}
+CONFUSED_EMOTIONS = ('sad', 'fear')
+
+# Without adaptive sampling every 2nd frame is analyzed; counters and cadences count frames at this stride
+FIXED_STRIDE = 2
+
+
+def _analyze_shard(video_path, start_frame, end_frame, zones=None):
+    """Worker entry point: observe frames [start_frame, end_frame) with its own models
+    
+    Returns (start_frame, observations, emotions, emotion_stats): observe()
+    results as (frame_count, observation) pairs, and the emotion of every
+    face on an every-10th frame keyed by (frame_count, face index). Student
+    IDs are left to the parent, which tracks all shards in order.
+    """
+    # Each worker owns a core; keep OpenCV from spawning its own thread pool on top
+    cv2.setNumThreads(1)
+    analyzer = StudentEngagementAnalyzer(output_video=False, zones=zones)
+    
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+    
+    # Start from the serial processed-frame count so the every-10th emotion
+    # and every-15th hand raise cadence lines up with the serial path
+    analyzer.frame_count = (start_frame + FIXED_STRIDE - 1) // FIXED_STRIDE
+    observations = []
+    emotions = {}
+    batcher = EmotionBatcher(lambda key, emotion, confidence: emotions.__setitem__(key, (emotion, confidence)))
+    
+    def observe(frame):
+        analyzer.frame_count += 1
+        observation = analyzer.observe(frame)
+        if analyzer.frame_count % 10 == 0:
+            for index, box in enumerate(observation['boxes']):
+                batcher.submit((analyzer.frame_count, index), frame, box)
+        batcher.poll()
+        observations.append((analyzer.frame_count, observation))
+    
+    # Process every 2nd frame, same as process_video with adaptive=False
+    pipeline = VideoPipeline(
+        observe,
+        should_process=lambda frame_idx: frame_idx % FIXED_STRIDE == 0,
+        start_frame=start_frame,
+        end_frame=end_frame,
+        recycle_frames=True
+    )
+    pipeline.run(cap)
+    cap.release()
+    batcher.flush()
+    analyzer.close()
+    
+    return start_frame, observations, emotions, batcher.stats()
+
+
 class StudentEngagementAnalyzer:
-    def __init__(self, output_video=False):
+    # Bump when detection or scoring changes so batch runs redo old reports
+    VERSION = '2'
+    
+    def __init__(self, output_video=False, emotion_batch_size=32, emotion_max_latency=0.5, spill_dir=None,
+                 zones=None):
         self.mp_face_mesh = mp.solutions.face_mesh
         self.mp_pose = mp.solutions.pose
         self.mp_drawing = mp.solutions.drawing_utils
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=30,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-        self.pose = self.mp_pose.Pose(
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        # Warm graphs from model_registry, checked out until close() hands them to the next analyzer
+        self.face_mesh = models.acquire('face_mesh', 30)
+        self.pose = models.acquire('pose')
+        # DeepFace's emotion model is loaded here, not on the first batch inside the frame loop
+        models.warm_up([('emotion',)])
         
         # Tracking data
         self.student_data = defaultdict(lambda: {
-            'focus_timeline': [],
-            'emotions': [],
             'hand_raises': 0,
             'distraction_count': 0,
             'gaze_history': deque(maxlen=30),
@@ -34,11 +111,32 @@ class StudentEngagementAnalyzer:
             'current_focus': True
         })
         
+        self.tracker = StudentTracker(max_distance=100, id_prefix='student_')
+        
+        # Focus/emotion timelines as typed chunked columns with running aggregates;
+        # spill_dir moves full chunks to memory-mapped files for multi-hour sessions
+        self.timelines = TimelineStore(EMOTION_WEIGHTS, CONFUSED_EMOTIONS, spill_dir=spill_dir)
         self.frame_count = 0
+        self.frames_covered = 0  # fixed-stride frames the analyzed ones stand for (see record_observation)
         self.total_students = 0
         self.output_video = output_video
         self.video_writer = None
-        
+        self.pipeline_stats = None
+        self.sampler = None  # AdaptiveSampler while process_video runs adaptively
+        self.sidecar = None  # AnnotationSidecar while process_video runs in 'sidecar' mode
+        self.session_log = None  # SessionLog while process_video runs with a session_log_path
+        self.buffers = FrameBuffers(depth=1)  # RGB copy for MediaPipe, reused every frame
+        # ClassroomZones: MediaPipe only sees the seating area, faces outside every zone are ignored
+        self.zones = zones
+        self.zone_tally = ZoneTally()
+        
+        # Emotion crops are classified in batches instead of one DeepFace call per face
+        self.emotion_batcher = EmotionBatcher(
+            self.record_emotion,
+            batch_size=emotion_batch_size,
+            max_latency=emotion_max_latency
+        )
+    
     def calculate_eye_aspect_ratio(self, landmarks, eye_indices):
         """Calculate EAR for eye openness detection"""
         points = np.array([[landmarks[i].x, landmarks[i].y] for i in eye_indices])
@@ -49,90 +147,51 @@ class StudentEngagementAnalyzer:
         return ear
     
     def calculate_head_pose(self, landmarks, img_w, img_h):
-        """Calculate head orientation (yaw, pitch, roll)"""
-        face_2d = []
-        face_3d = []
-        
-        key_points = [1, 33, 263, 61, 291, 199]
-        
-        for idx in key_points:
-            lm = landmarks[idx]
-            x, y = int(lm.x * img_w), int(lm.y * img_h)
-            face_2d.append([x, y])
-            face_3d.append([x, y, lm.z])
-        
-        face_2d = np.array(face_2d, dtype=np.float64)
-        face_3d = np.array(face_3d, dtype=np.float64)
-        
-        focal_length = 1 * img_w
-        cam_matrix = np.array([[focal_length, 0, img_h / 2],
-                               [0, focal_length, img_w / 2],
-                               [0, 0, 1]])
-        dist_matrix = np.zeros((4, 1), dtype=np.float64)
-        
-        success, rot_vec, trans_vec = cv2.solvePnP(face_3d, face_2d, cam_matrix, dist_matrix)
-        rmat, _ = cv2.Rodrigues(rot_vec)
-        angles, _, _, _, _, _ = cv2.RQDecomp3x3(rmat)
-        
-        yaw = angles[1] * 360
-        pitch = angles[0] * 360
-        
-        return yaw, pitch
+        """Calculate head orientation (yaw, pitch) of one face"""
+        return head_pose(landmarks, img_w, img_h)
     
     def is_looking_forward(self, yaw, pitch):
         """Determine if student is looking at board/teacher"""
         return abs(yaw) < 25 and abs(pitch) < 20
     
-    def detect_hand_raise(self, pose_landmarks, img_h):
-        """Detect if hand is raised above shoulder level"""
+    def detect_hand_raise(self, pose_landmarks, img_h, crop_h=None):
+        """Detect if hand is raised above shoulder level
+        
+        With crop_h, the landmarks are normalized to a crop of that height
+        and the margin is rescaled to stay 10% of the full frame.
+        """
         if not pose_landmarks:
             return False
         
+        margin = 0.1 * img_h / (crop_h or img_h)
+        
         try:
             left_wrist = pose_landmarks.landmark[self.mp_pose.PoseLandmark.LEFT_WRIST]
             right_wrist = pose_landmarks.landmark[self.mp_pose.PoseLandmark.RIGHT_WRIST]
             left_shoulder = pose_landmarks.landmark[self.mp_pose.PoseLandmark.LEFT_SHOULDER]
             right_shoulder = pose_landmarks.landmark[self.mp_pose.PoseLandmark.RIGHT_SHOULDER]
             
-            left_raised = left_wrist.y < left_shoulder.y - 0.1
-            right_raised = right_wrist.y < right_shoulder.y - 0.1
+            left_raised = left_wrist.y < left_shoulder.y - margin
+            right_raised = right_wrist.y < right_shoulder.y - margin
             
             return left_raised or right_raised
         except:
             return False
     
-    def analyze_emotion(self, frame, face_box):
-        """Analyze facial emotion using DeepFace"""
-        try:
-            x, y, w, h = face_box
-            face_roi = frame[y:y+h, x:x+w]
-            
-            if face_roi.size == 0:
-                return 'neutral', 0.5
-            
-            result = DeepFace.analyze(face_roi, actions=['emotion'], enforce_detection=False, silent=True)
-            
-            if isinstance(result, list):
-                result = result[0]
-            
-            emotion = result['dominant_emotion']
-            confidence = result['emotion'][emotion] / 100.0
-            
-            return emotion, confidence
-        except:
-            return 'neutral', 0.5
+    def record_emotion(self, student_id, emotion, confidence):
+        """Store a classified emotion for a student"""
+        self.timelines[student_id].add_emotion(emotion, confidence)
+        self.student_data[student_id]['current_emotion'] = emotion
     
     def calculate_focus_score(self, student_id):
         """Calculate individual student focus score"""
         data = self.student_data[student_id]
+        timeline = self.timelines[student_id]
         
-        if len(data['focus_timeline']) == 0:
+        if timeline.frames == 0:
             return 0.0
         
-        focused_frames = sum(data['focus_timeline'])
-        total_frames = len(data['focus_timeline'])
-        
-        focus_ratio = focused_frames / total_frames
+        focus_ratio = timeline.focus_ratio()
         distraction_penalty = min(data['distraction_count'] * 0.05, 0.3)
         
         focus_score = max(0, (focus_ratio - distraction_penalty) * 100)
@@ -141,108 +200,184 @@ class StudentEngagementAnalyzer:
     
     def calculate_sentiment_score(self, student_id):
         """Calculate sentiment score from emotions"""
-        data = self.student_data[student_id]
+        timeline = self.timelines[student_id]
         
-        if len(data['emotions']) == 0:
+        if timeline.emotion_count == 0:
             return 50.0
         
-        emotion_weights = {
-            'happy': 1.0,
-            'neutral': 0.5,
-            'surprise': 0.6,
-            'sad': -0.5,
-            'angry': -1.0,
-            'fear': -0.7,
-            'disgust': -0.8
-        }
-        
-        total_score = 0
-        for emotion, confidence in data['emotions']:
-            weight = emotion_weights.get(emotion, 0)
-            total_score += weight * confidence
-        
-        sentiment = ((total_score / len(data['emotions'])) + 1) * 50
+        # Running sum of EMOTION_WEIGHTS[emotion] * confidence, kept as emotions arrive
+        sentiment = (timeline.sentiment_mean() + 1) * 50
         
         return round(max(0, min(100, sentiment)), 2)
     
     def process_frame(self, frame):
         """Process single video frame"""
+        result = self.analyze_frame(frame)
+        output_frame = self.annotate_frame(frame.copy(), result) if self.output_video else None
+        return result['current_students'], output_frame
+    
+    def analyze_frame(self, frame):
+        """Run face/pose analysis on one frame and update student state"""
         self.frame_count += 1
+        return self.record_observation(self.observe(frame), frame)
+    
+    def observe(self, frame):
+        """Face boxes, zones, head-pose decisions and the hand-raise check of one frame
+        
+        The MediaPipe part of a frame. It keeps no per-student state, so
+        shards of a parallel run can observe while one analyzer does all the
+        tracking and scoring (see record_observation).
+        """
         img_h, img_w = frame.shape[:2]
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        output_frame = frame.copy() if self.output_video else None
+        crop_x, crop_y, crop_w, crop_h = 0, 0, img_w, img_h
+        if self.zones:
+            crop_x, crop_y, crop_w, crop_h = self.zones.fit(img_w, img_h).crop_box
+        rgb_frame = self.buffers.rgb(self.zones.crop(frame) if self.zones else frame)
         
         # Face detection and analysis
         face_results = self.face_mesh.process(rgb_frame)
         pose_results = self.pose.process(rgb_frame)
         
-        current_students = 0
         hand_raised = False
-        
         if pose_results.pose_landmarks:
-            hand_raised = self.detect_hand_raise(pose_results.pose_landmarks, img_h)
+            hand_raised = self.detect_hand_raise(pose_results.pose_landmarks, img_h, crop_h)
         
+        points = None
         if face_results.multi_face_landmarks:
-            current_students = len(face_results.multi_face_landmarks)
+            # Landmarks of all faces as one array, normalized to the full frame
+            points = landmark_array(face_results.multi_face_landmarks)
+            if self.zones:
+                points *= (crop_w / img_w, crop_h / img_h, crop_w / img_w)
+                points[..., 0] += crop_x / img_w
+                points[..., 1] += crop_y / img_h
+        
+        boxes, zones, focused = [], [], []
+        if points is not None:
+            boxes = face_boxes(points, img_w, img_h)
+            zones = self.zones.zones_of(boxes) if self.zones else [None] * len(boxes)
+            if self.zones and None in zones:
+                keep = [i for i, zone in enumerate(zones) if zone is not None]
+                points, boxes, zones = points[keep], [boxes[i] for i in keep], [zones[i] for i in keep]
+        
+        if boxes:
+            # Head pose of every face; looking forward means focused
+            yaws, pitches = head_poses(points, img_w, img_h)
+            focused = looking_forward(yaws, pitches).tolist()
+        
+        return {'boxes': boxes, 'zones': zones, 'focused': focused, 'hand_raised': hand_raised}
+    
+    def record_observation(self, observation, frame=None, emotions=None):
+        """Assign student IDs to an observe() result and update every student's state
+        
+        Emotion crops are cut from frame and queued for the batcher. A
+        parallel run has no frame here and passes the emotions its shards
+        classified instead, keyed by (frame_count, face index).
+        """
+        boxes = observation['boxes']
+        current_students = len(boxes)
+        hand_raised = observation['hand_raised']
+        faces = []
+        
+        # Under adaptive sampling this frame stands for the skipped ones before it. Weighting by
+        # that span keeps counters and the emotion/hand-raise cadence in video time, the same
+        # rate as at the fixed stride whatever stride the sampler picks.
+        weight = self.sampler.span / FIXED_STRIDE if self.sampler else 1
+        previous = self.frames_covered
+        self.frames_covered += weight
+        emotion_due = self.cadence_due(previous, 10)
+        
+        if boxes:
             self.total_students = max(self.total_students, current_students)
             
-            for idx, face_landmarks in enumerate(face_results.multi_face_landmarks):
-                student_id = f"student_{idx}"
-                
-                # Calculate head pose
-                yaw, pitch = self.calculate_head_pose(face_landmarks.landmark, img_w, img_h)
-                
-                # Check if looking forward (focused)
-                is_focused = self.is_looking_forward(yaw, pitch)
-                self.student_data[student_id]['focus_timeline'].append(1 if is_focused else 0)
+            # One ID assignment for all faces
+            student_ids = self.tracker.update(boxes)
+            
+            for index, ((x, y, w, h), student_id, is_focused, zone) in enumerate(
+                    zip(boxes, student_ids, observation['focused'], observation['zones'])):
+                if self.zones:
+                    self.zone_tally.add(student_id, zone)
+                self.timelines[student_id].add_focus(is_focused, self.sampler.span if self.sampler else 1)
                 self.student_data[student_id]['gaze_history'].append(is_focused)
                 self.student_data[student_id]['current_focus'] = is_focused
                 
                 if not is_focused:
-                    self.student_data[student_id]['distraction_count'] += 1
+                    self.student_data[student_id]['distraction_count'] += weight
                 
-                # Get face bounding box for emotion analysis
-                x_coords = [lm.x * img_w for lm in face_landmarks.landmark]
-                y_coords = [lm.y * img_h for lm in face_landmarks.landmark]
-                x, y = int(min(x_coords)), int(min(y_coords))
-                w, h = int(max(x_coords) - x), int(max(y_coords) - y)
+                # Queue emotion analysis every 10 frames
+                if emotion_due:
+                    if frame is not None:
+                        self.emotion_batcher.submit(student_id, frame, (x, y, w, h))
+                    elif (self.frame_count, index) in emotions:
+                        self.record_emotion(student_id, *emotions[(self.frame_count, index)])
                 
-                # Analyze emotion every 10 frames
-                if self.frame_count % 10 == 0:
-                    emotion, confidence = self.analyze_emotion(frame, (x, y, w, h))
-                    self.student_data[student_id]['emotions'].append((emotion, confidence))
-                    self.student_data[student_id]['current_emotion'] = emotion
-                
-                # Draw on output frame
-                if self.output_video:
-                    color = (0, 255, 0) if is_focused else (0, 0, 255)
-                    cv2.rectangle(output_frame, (x, y), (x+w, y+h), color, 2)
-                    
-                    emotion = self.student_data[student_id]['current_emotion']
-                    focus_text = "Focused" if is_focused else "Distracted"
-                    
-                    cv2.putText(output_frame, f"S{idx+1}: {focus_text}", (x, y-25), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                    cv2.putText(output_frame, f"{emotion}", (x, y-10), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 0), 1)
+                faces.append({
+                    'student_id': student_id,
+                    'label': student_id.replace('student_', 'S'),
+                    'bbox': (x, y, w, h),
+                    'is_focused': is_focused,
+                    'emotion': self.student_data[student_id]['current_emotion']
+                })
+        
+        self.emotion_batcher.poll()
         
         # Hand raise detection
-        if hand_raised and self.frame_count % 15 == 0:
+        if hand_raised and self.cadence_due(previous, 15):
             for student_id in list(self.student_data.keys())[:current_students]:
                 self.student_data[student_id]['hand_raises'] += 1
         
+        return {'faces': faces, 'current_students': current_students, 'hand_raised': hand_raised}
+    
+    def cadence_due(self, previous, every):
+        """True if frames_covered passed a multiple of every since previous (every every-th frame at the fixed stride)"""
+        return int(self.frames_covered // every) > int(previous // every)
+    
+    @staticmethod
+    def annotate_frame(frame, result):
+        """Draw a frame's analysis result onto it; also renders sidecar results at playback"""
+        for face in result['faces']:
+            x, y, w, h = face['bbox']
+            is_focused = face['is_focused']
+            
+            color = (0, 255, 0) if is_focused else (0, 0, 255)
+            cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
+            
+            focus_text = "Focused" if is_focused else "Distracted"
+            
+            cv2.putText(frame, f"{face['label']}: {focus_text}", (x, y-25), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            cv2.putText(frame, f"{face['emotion']}", (x, y-10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 0), 1)
+        
         # Draw overall stats
-        if self.output_video:
-            cv2.putText(output_frame, f"Students: {current_students}", (10, 30), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            if hand_raised:
-                cv2.putText(output_frame, "HAND RAISED!", (10, 60), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        cv2.putText(frame, f"Students: {result['current_students']}", (10, 30), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        if result['hand_raised']:
+            cv2.putText(frame, "HAND RAISED!", (10, 60), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
         
-        return current_students, output_frame
+        return frame
     
-    def process_video(self, video_path, progress_callback=None, output_path=None):
-        """Process entire video and return analytics"""
+    def process_video(self, video_path, progress_callback=None, output_path=None, adaptive=False, realtime=False,
+                      checkpointer=None, output_mode=None, session_log_path=None):
+        """Process entire video and return analytics
+        
+        Every 2nd frame is analyzed by default. adaptive picks the stride from
+        scene motion and student-count changes instead; realtime additionally
+        keeps it high enough for analysis to keep pace with the video's fps,
+        which makes the frames analyzed depend on timing.
+        With a job_manifest.Checkpointer, state is saved every few minutes of
+        video and an interrupted run resumes from the last save.
+        output_mode defaults to 'video' when output_video is set and an
+        output_path is given, 'metrics' otherwise; 'sidecar' writes per-frame
+        results to output_path instead of drawing (see annotation_sidecar).
+        session_log_path also writes one row per student per analyzed frame
+        as Parquet/Arrow part files (see session_log).
+        """
+        if output_mode is None:
+            output_mode = 'video' if self.output_video and output_path else 'metrics'
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"output_mode must be one of {OUTPUT_MODES}, got {output_mode!r}")
+        
         cap = cv2.VideoCapture(video_path)
         
         if not cap.isOpened():
@@ -253,36 +388,205 @@ class StudentEngagementAnalyzer:
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         
-        # Setup video writer if output requested
-        if self.output_video and output_path:
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            self.video_writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        write_output = output_mode == 'video'
+        if output_mode == 'sidecar':
+            self.sidecar = AnnotationSidecar(output_path, video_path,
+                                             'student_engagement_analyzer.StudentEngagementAnalyzer',
+                                             fps, (width, height))
+        if session_log_path:
+            video_name = os.path.splitext(os.path.basename(video_path))[0]
+            self.session_log = SessionLog(session_log_path, video_name, fps, self.session_rows)
+        
+        def progress(frames_read):
+            if progress_callback and frames_read % 30 == 0:
+                progress_callback((frames_read / total_frames) * 100)
+        
+        if adaptive:
+            self.sampler = AdaptiveSampler(fps, realtime=realtime, max_stride=4,
+                                           count_fn=lambda result: result['current_students'])
+            should_process = None
+        else:
+            # Process every 2nd frame for speed
+            self.sampler = None
+            should_process = lambda frame_idx: frame_idx % FIXED_STRIDE == 0
+        
+        def make_pipeline(writer, start_frame=0, end_frame=None):
+            if self.sidecar:
+                self.sidecar.begin(start_frame)
+            if self.session_log:
+                self.session_log.begin(start_frame)
+            return VideoPipeline(
+                self.analyze_frame,
+                self.annotate_frame if write_output else None,
+                writer,
+                should_process=should_process,
+                start_frame=start_frame,
+                end_frame=end_frame,
+                progress_fn=progress,
+                sampler=self.sampler,
+                recycle_frames=True,
+                result_fn=self.record_result if self.sidecar or self.session_log else None
+            )
+        
+        if checkpointer:
+            pipeline = run_checkpointed(cap, self, make_pipeline, checkpointer, fps,
+                                        output_path if write_output else None, (width, height))
+        else:
+            # Setup video writer if output requested
+            if write_output:
+                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                self.video_writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+            pipeline = make_pipeline(self.video_writer)
+            pipeline.run(cap)
+            if self.video_writer:
+                self.video_writer.release()
+        if self.sidecar:
+            self.sidecar.close()
+            self.sidecar = None
+        if self.session_log:
+            self.session_log.close()
+            self.session_log = None
+        self.pipeline_stats = pipeline.stats()
         
-        frame_idx = 0
+        cap.release()
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Process every 2nd frame for speed
-            if frame_idx % 2 == 0:
-                _, output_frame = self.process_frame(frame)
-                if self.video_writer and output_frame is not None:
-                    self.video_writer.write(output_frame)
-            
-            frame_idx += 1
-            
-            if progress_callback and frame_idx % 30 == 0:
-                progress = (frame_idx / total_frames) * 100
-                progress_callback(progress)
+        self.emotion_batcher.flush()
+        
+        return self.generate_report(fps, total_frames)
+    
+    def record_result(self, frame_idx, result):
+        """VideoPipeline result_fn: pass each frame's result to the sidecar and session log"""
+        if self.sidecar:
+            self.sidecar.write(frame_idx, result)
+        if self.session_log:
+            self.session_log.write(frame_idx, result)
+    
+    @staticmethod
+    def session_rows(result):
+        """Session log rows of one frame's result
+        
+        There is no focus score, only the head-pose decision in focused. Hand
+        raises are seen per frame, not per student, so hand_raised stays null.
+        """
+        for face in result['faces']:
+            yield (face['student_id'], face['bbox'], None, face['is_focused'], face['emotion'],
+                   None, None)
+    
+    def process_video_parallel(self, video_path, num_workers=None, progress_callback=None,
+                               min_shard_frames=300, session_log_path=None):
+        """Process video as time-range shards across worker processes
+        
+        Workers only run MediaPipe and the emotion model (see _analyze_shard).
+        Their observations are then tracked and scored here in frame order,
+        through the same record_observation() as process_video with
+        adaptive=False. So a student who crosses a shard boundary keeps one
+        ID, and the report matches the serial one. session_log_path writes
+        the session log from that replay, as process_video does.
+        """
+        cap = cv2.VideoCapture(video_path)
+        
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open video: {video_path}")
         
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
         cap.release()
-        if self.video_writer:
-            self.video_writer.release()
+        
+        if session_log_path:
+            video_name = os.path.splitext(os.path.basename(video_path))[0]
+            self.session_log = SessionLog(session_log_path, video_name, fps, self.session_rows)
+            self.session_log.begin()
+        
+        num_workers = num_workers or os.cpu_count() or 1
+        num_shards = max(1, min(num_workers, math.ceil(total_frames / min_shard_frames)))
+        shard_size = math.ceil(total_frames / num_shards)
+        shards = [(start, min(start + shard_size, total_frames))
+                  for start in range(0, total_frames, shard_size)]
+        
+        # Spawn instead of fork: MediaPipe graphs and TF sessions are not fork-safe
+        context = multiprocessing.get_context('spawn')
+        results = []
+        
+        with ProcessPoolExecutor(max_workers=min(num_workers, len(shards)), mp_context=context) as pool:
+            futures = [pool.submit(_analyze_shard, video_path, start, end, self.zones) for start, end in shards]
+            
+            for done, future in enumerate(as_completed(futures), 1):
+                results.append(future.result())
+                if progress_callback:
+                    progress_callback(done / len(futures) * 100)
+        
+        # Every shard frame stands for one analyzed frame, as in the serial every-2nd-frame run
+        self.sampler = None
+        for _, observations, emotions, emotion_stats in sorted(results, key=lambda r: r[0]):
+            for frame_count, observation in observations:
+                self.frame_count = frame_count
+                result = self.record_observation(observation, emotions=emotions)
+                if self.session_log:
+                    # Shards analyze every FIXED_STRIDE-th source frame from frame 0
+                    self.session_log.write((frame_count - 1) * FIXED_STRIDE, result)
+            self.emotion_batcher.merge_stats(emotion_stats)
+        
+        if self.session_log:
+            self.session_log.close()
+            self.session_log = None
         
         return self.generate_report(fps, total_frames)
     
+    def export_state(self):
+        """Export per-student tracking state as plain picklable data"""
+        students = {}
+        for student_id, data in self.student_data.items():
+            students[student_id] = {
+                'timeline': self.timelines[student_id].export(),
+                'hand_raises': data['hand_raises'],
+                'distraction_count': data['distraction_count'],
+                'gaze_history': list(data['gaze_history']),
+                'head_pose_history': list(data['head_pose_history']),
+                'current_emotion': data['current_emotion'],
+                'current_focus': data['current_focus']
+            }
+        
+        return {
+            'student_data': students,
+            'frame_count': self.frame_count,
+            'frames_covered': self.frames_covered,
+            'total_students': self.total_students,
+            'emotion_stats': self.emotion_batcher.stats(),
+            'zones': self.zone_tally.export()
+        }
+    
+    def checkpoint_state(self):
+        """export_state() plus tracker identities, to resume this video part-way (see job_manifest)"""
+        self.emotion_batcher.flush()
+        if self.sidecar:
+            self.sidecar.flush()
+        if self.session_log:
+            self.session_log.flush()
+        return dict(self.export_state(), tracker=self.tracker)
+    
+    def restore_checkpoint(self, state):
+        """Load a checkpoint_state() into this fresh analyzer"""
+        self.merge_state(state)
+        self.tracker = state['tracker']
+    
+    def merge_state(self, state):
+        """Add an export_state() onto this analyzer, e.g. a checkpoint into a fresh one"""
+        for student_id, shard_data in state['student_data'].items():
+            data = self.student_data[student_id]
+            self.timelines[student_id].merge(shard_data['timeline'])
+            data['hand_raises'] += shard_data['hand_raises']
+            data['distraction_count'] += shard_data['distraction_count']
+            data['gaze_history'].extend(shard_data['gaze_history'])
+            data['head_pose_history'].extend(shard_data['head_pose_history'])
+            data['current_emotion'] = shard_data['current_emotion']
+            data['current_focus'] = shard_data['current_focus']
+        
+        self.frame_count += state['frame_count']
+        self.frames_covered += state.get('frames_covered', state['frame_count'])
+        self.total_students = max(self.total_students, state['total_students'])
+        self.emotion_batcher.merge_stats(state['emotion_stats'])
+        self.zone_tally.merge(state.get('zones', {}))
+    
     def generate_report(self, fps, total_frames):
         """Generate final analytics report"""
         duration_seconds = total_frames / fps if fps > 0 else 0
@@ -305,7 +609,7 @@ class StudentEngagementAnalyzer:
             questions = int(hand_raises * 0.6)
             
             # Estimate doubts (confused emotions + some hand raises)
-            confused_count = sum(1 for e, c in data['emotions'] if e in ['sad', 'fear'] and c > 0.5)
+            confused_count = self.timelines[student_id].confused_count
             doubts = int(confused_count * 0.3 + hand_raises * 0.4)
             
             total_focus_score += focus
@@ -322,6 +626,8 @@ class StudentEngagementAnalyzer:
                 'questions_estimated': questions,
                 'doubts_estimated': doubts
             })
+            if self.zones:
+                student_reports[-1]['zone'] = self.zone_tally.zone_of(student_id)
         
         num_students = len(self.student_data) if self.student_data else 1
         
@@ -329,6 +635,7 @@ class StudentEngagementAnalyzer:
             'video_duration_seconds': round(duration_seconds, 2),
             'total_students_detected': self.total_students,
             'frames_processed': self.frame_count,
+            'sampling': self.sampler.stats() if self.sampler else None,
             'aggregate_metrics': {
                 'average_focus_score': round(total_focus_score / num_students, 2),
                 'average_sentiment': round(total_sentiment / num_students, 2),
@@ -337,11 +644,24 @@ class StudentEngagementAnalyzer:
                 'estimated_doubts': total_doubts
             },
             'student_details': student_reports,
+            'zone_metrics': zone_metrics(
+                self.zones.names, student_reports,
+                averages={'average_focus_score': 'focus_score', 'average_sentiment': 'sentiment'},
+                totals={'total_interactions': 'hand_raises', 'estimated_doubts': 'doubts_estimated'}
+            ) if self.zones else None,
             'timestamp': datetime.now().isoformat()
         }
         
         return report
     
+    def close(self):
+        """Remove any spilled timeline files and return the MediaPipe graphs to the registry"""
+        self.timelines.close()
+        if self.face_mesh is not None:
+            models.release(self.face_mesh, 'face_mesh', 30)
+            models.release(self.pose, 'pose')
+            self.face_mesh = self.pose = None
+    
     def save_report(self, report, output_path):
         """Save report to JSON file"""
         with open(output_path, 'w') as f:
@@ -349,8 +669,59 @@ class StudentEngagementAnalyzer:
         print(f"Report saved to: {output_path}")
 
 
+def compare_reports(serial, parallel, tolerance=0.01):
+    """(field, serial value, parallel value) for every report field that differs by more than tolerance"""
+    differences = []
+    
+    def compare(field, a, b):
+        numbers = isinstance(a, (int, float)) and isinstance(b, (int, float))
+        if (abs(a - b) > tolerance) if numbers else a != b:
+            differences.append((field, a, b))
+    
+    compare('total_students_detected', serial['total_students_detected'], parallel['total_students_detected'])
+    compare('frames_processed', serial['frames_processed'], parallel['frames_processed'])
+    for name, value in serial['aggregate_metrics'].items():
+        compare(name, value, parallel['aggregate_metrics'][name])
+    
+    serial_students = {s['student_id']: s for s in serial['student_details']}
+    parallel_students = {s['student_id']: s for s in parallel['student_details']}
+    for student_id in sorted(serial_students.keys() | parallel_students.keys()):
+        a, b = serial_students.get(student_id), parallel_students.get(student_id)
+        if a is None or b is None:
+            differences.append((student_id, 'seen' if a else 'missing', 'seen' if b else 'missing'))
+            continue
+        for name, value in a.items():
+            if name != 'student_id':
+                compare(f"{student_id}.{name}", value, b[name])
+    return differences
+
+
 if __name__ == "__main__":
-    analyzer = StudentEngagementAnalyzer(output_video=True)
+    # --spill DIR keeps per-student timelines in memory-mapped files under DIR
+    spill_dir = sys.argv[sys.argv.index("--spill") + 1] if "--spill" in sys.argv else None
+    # --zones CAMERA.json analyzes only the seating zones of that camera config (see classroom_zones)
+    zones = ClassroomZones.load(sys.argv[sys.argv.index("--zones") + 1]) if "--zones" in sys.argv else None
+    # --session-log PATH writes per-frame, per-student rows as Parquet parts
+    session_log_path = sys.argv[sys.argv.index("--session-log") + 1] if "--session-log" in sys.argv else None
+    
+    if "--check-parallel" in sys.argv:
+        # Serial every-2nd-frame report vs. the sharded one; small shards so students cross boundaries
+        video_path = sys.argv[sys.argv.index("--check-parallel") + 1]
+        serial_analyzer = StudentEngagementAnalyzer(zones=zones)
+        serial_report = serial_analyzer.process_video(video_path, adaptive=False)
+        serial_analyzer.close()
+        parallel_analyzer = StudentEngagementAnalyzer(zones=zones)
+        parallel_report = parallel_analyzer.process_video_parallel(video_path, num_workers=4, min_shard_frames=60)
+        parallel_analyzer.close()
+        
+        differences = compare_reports(serial_report, parallel_report)
+        for field, serial_value, parallel_value in differences:
+            print(f"   {field}: serial {serial_value}, parallel {parallel_value}")
+        print(f"✅ Parallel report matches the serial one ({serial_report['total_students_detected']} students)"
+              if not differences else f"❌ {len(differences)} field(s) differ")
+        raise SystemExit(1 if differences else 0)
+    
+    analyzer = StudentEngagementAnalyzer(output_video=True, spill_dir=spill_dir, zones=zones)
     
     video_path = "assets/215475_small.mp4"
     output_video_path = "output_analyzed_video.mp4"
@@ -361,7 +732,17 @@ if __name__ == "__main__":
     def progress_update(progress):
         print(f"Progress: {progress:.1f}%", end='\r')
     
-    report = analyzer.process_video(video_path, progress_callback=progress_update, output_path=output_video_path)
+    if "--parallel" in sys.argv:
+        # Sharded across all cores; metrics only, no annotated video
+        analyzer.output_video = False
+        report = analyzer.process_video_parallel(video_path, progress_callback=progress_update,
+                                                 session_log_path=session_log_path)
+    else:
+        # --adaptive picks the stride from motion; --realtime also keeps it at the video's pace
+        report = analyzer.process_video(video_path, progress_callback=progress_update, output_path=output_video_path,
+                                        adaptive="--adaptive" in sys.argv or "--realtime" in sys.argv,
+                                        realtime="--realtime" in sys.argv,
+                                        session_log_path=session_log_path)
     
     print("\n" + "=" * 60)
     print("📊 ANALYSIS COMPLETE")
@@ -374,6 +755,19 @@ if __name__ == "__main__":
     print(f"   Interactions: {report['aggregate_metrics']['total_interactions']}")
     print(f"   Questions (Est.): {report['aggregate_metrics']['estimated_questions']}")
     print(f"   Doubts (Est.): {report['aggregate_metrics']['estimated_doubts']}")
+    for zone, metrics in (report['zone_metrics'] or {}).items():
+        print(f"   🪑 {zone}: {metrics['students']} student(s), focus {metrics['average_focus_score']}/100")
+    
+    if analyzer.pipeline_stats:
+        print(f"⏱️  Pipeline: {analyzer.pipeline_stats['fps']} fps, bottleneck: {analyzer.pipeline_stats['bottleneck']}")
+    if report['sampling']:
+        print(f"⚡ Adaptive sampling: {report['sampling']['effective_fps']} of {report['sampling']['source_fps']} fps "
+              f"analyzed (mean stride {report['sampling']['mean_stride']})")
+    emotion_stats = analyzer.emotion_batcher.stats()
+    print(f"\n⚡ Emotion Throughput: {emotion_stats['faces_per_second']} faces/s "
+          f"({emotion_stats['faces_processed']} faces in {emotion_stats['batches_run']} batches)")
     
     analyzer.save_report(report, "engagement_report.json")
-    print(f"\n🎬 Analyzed video saved: {output_video_path}")
+    analyzer.close()
+    if analyzer.output_video:
+        print(f"\n🎬 Analyzed video saved: {output_video_path}")
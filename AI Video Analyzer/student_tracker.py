@@ -0,0 +1,142 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# Cost given to pairs that fail the distance gate; never chosen over a real match
+_GATED = 1e6
+
+
+def box_centers(boxes):
+    """(N, 4) x, y, w, h boxes -> (N, 2) centers"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return boxes[:, :2] + boxes[:, 2:] / 2.0
+
+
+def centroid_distances(a, b):
+    """Pairwise Euclidean distances between (N, 2) and (M, 2) points"""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 2)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 2)
+    return np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2))
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) x, y, w, h boxes"""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 0] + a[:, None, 2], b[None, :, 0] + b[None, :, 2])
+    y2 = np.minimum(a[:, None, 1] + a[:, None, 3], b[None, :, 1] + b[None, :, 3])
+    
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def assign(cost, max_cost):
+    """Optimal one-to-one assignment; returns (row, col) pairs with cost <= max_cost"""
+    if cost.size == 0:
+        return []
+    rows, cols = linear_sum_assignment(cost)
+    keep = cost[rows, cols] <= max_cost
+    return list(zip(rows[keep].tolist(), cols[keep].tolist()))
+
+
+class StudentTracker:
+    """Frame-to-frame student identity using optimal (Hungarian) assignment
+    
+    Each frame, detections are matched to active tracks by minimising a cost
+    that mixes centroid distance and box overlap; pairs further apart than
+    max_distance are never matched, and no two faces can share an ID. Tracks
+    unseen for max_age frames move to a lost buffer, where a new detection
+    within reid_distance can reclaim the old ID for up to lost_ttl frames.
+    """
+    
+    def __init__(self, max_distance=100, max_age=30, lost_ttl=300, reid_distance=None,
+                 iou_weight=0.5, id_prefix='S', first_id=1):
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.lost_ttl = lost_ttl
+        self.reid_distance = reid_distance if reid_distance is not None else max_distance * 1.5
+        self.iou_weight = iou_weight
+        self.id_prefix = id_prefix
+        self.next_id = first_id
+        
+        self.tracks = {}   # id -> {'box', 'center', 'age', 'hits'}
+        self.lost = {}     # id -> {'box', 'center', 'lost_for'}
+    
+    def new_id(self):
+        track_id = self.next_id if self.id_prefix is None else f"{self.id_prefix}{self.next_id}"
+        self.next_id += 1
+        return track_id
+    
+    def match_cost(self, det_boxes, det_centers, track_boxes, track_centers, gate):
+        """Distance + (1 - IoU) cost matrix with distance gating"""
+        dist = centroid_distances(det_centers, track_centers)
+        cost = (1 - self.iou_weight) * dist / gate + self.iou_weight * (1 - iou_matrix(det_boxes, track_boxes))
+        cost[dist >= gate] = _GATED
+        return cost
+    
+    def update(self, boxes):
+        """Assign an ID to every (x, y, w, h) box; returns IDs in box order"""
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        centers = box_centers(boxes)
+        ids = [None] * len(boxes)
+        
+        # 1. Match against active tracks
+        active_ids = list(self.tracks.keys())
+        if active_ids and len(boxes):
+            track_boxes = np.array([self.tracks[t]['box'] for t in active_ids])
+            track_centers = np.array([self.tracks[t]['center'] for t in active_ids])
+            cost = self.match_cost(boxes, centers, track_boxes, track_centers, self.max_distance)
+            for det, trk in assign(cost, _GATED - 1):
+                ids[det] = active_ids[trk]
+        
+        # 2. Re-identify leftovers against recently lost tracks
+        unmatched = [i for i, track_id in enumerate(ids) if track_id is None]
+        lost_ids = list(self.lost.keys())
+        if unmatched and lost_ids:
+            lost_boxes = np.array([self.lost[t]['box'] for t in lost_ids])
+            lost_centers = np.array([self.lost[t]['center'] for t in lost_ids])
+            cost = self.match_cost(boxes[unmatched], centers[unmatched], lost_boxes, lost_centers, self.reid_distance)
+            for det, trk in assign(cost, _GATED - 1):
+                track_id = lost_ids[trk]
+                ids[unmatched[det]] = track_id
+                self.tracks[track_id] = {'box': None, 'center': None, 'age': 0, 'hits': 0}
+                del self.lost[track_id]
+        
+        # 3. Births
+        for i, track_id in enumerate(ids):
+            if track_id is None:
+                ids[i] = self.new_id()
+                self.tracks[ids[i]] = {'box': None, 'center': None, 'age': 0, 'hits': 0}
+        
+        # Update matched tracks, age the rest
+        seen = set(ids)
+        for i, track_id in enumerate(ids):
+            track = self.tracks[track_id]
+            track['box'] = boxes[i]
+            track['center'] = centers[i]
+            track['age'] = 0
+            track['hits'] += 1
+        
+        for track_id in list(self.tracks.keys()):
+            if track_id in seen:
+                continue
+            track = self.tracks[track_id]
+            track['age'] += 1
+            if track['age'] > self.max_age:
+                # Death: keep around briefly for re-identification
+                self.lost[track_id] = {'box': track['box'], 'center': track['center'], 'lost_for': 0}
+                del self.tracks[track_id]
+        
+        for track_id in list(self.lost.keys()):
+            self.lost[track_id]['lost_for'] += 1
+            if self.lost[track_id]['lost_for'] > self.lost_ttl:
+                del self.lost[track_id]
+        
+        return ids
+    
+    def active_count(self):
+        """Tracks seen within the last max_age frames"""
+        return len(self.tracks)
@@ -0,0 +1,194 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+from emotion_batcher import EmotionBatcher
+
+# Emotions are stored as uint8 codes; anything unexpected gets UNKNOWN_EMOTION
+EMOTION_CODES = {emotion: code for code, emotion in enumerate(EmotionBatcher.EMOTION_LABELS)}
+UNKNOWN_EMOTION = 255
+
+
+class TimelineColumn:
+    """Append-only typed column stored in fixed-size NumPy chunks
+    
+    Values go into a preallocated chunk; full chunks are kept in memory or,
+    when spill_path is set, appended to a raw file and read back through a
+    read-only memmap, so resident memory stays at one chunk per column.
+    """
+    
+    def __init__(self, dtype, chunk_size=4096, spill_path=None):
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self.spill_path = spill_path
+        
+        self.chunks = []
+        self.current = np.empty(chunk_size, dtype=self.dtype)
+        self.fill = 0
+        self.spilled = 0
+    
+    def __len__(self):
+        return self.spilled + len(self.chunks) * self.chunk_size + self.fill
+    
+    def append(self, value):
+        self.current[self.fill] = value
+        self.fill += 1
+        if self.fill == self.chunk_size:
+            self.seal()
+    
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.dtype)
+        while len(values):
+            take = min(len(values), self.chunk_size - self.fill)
+            self.current[self.fill:self.fill + take] = values[:take]
+            self.fill += take
+            values = values[take:]
+            if self.fill == self.chunk_size:
+                self.seal()
+    
+    def seal(self):
+        """Retire the full current chunk to memory or the spill file"""
+        if self.spill_path:
+            with open(self.spill_path, 'ab') as f:
+                f.write(self.current.tobytes())
+            self.spilled += self.chunk_size
+        else:
+            self.chunks.append(self.current)
+            self.current = np.empty(self.chunk_size, dtype=self.dtype)
+        self.fill = 0
+    
+    def last(self):
+        """Most recently appended value"""
+        if self.fill:
+            return self.current[self.fill - 1]
+        if self.chunks:
+            return self.chunks[-1][-1]
+        return np.memmap(self.spill_path, dtype=self.dtype, mode='r', offset=(self.spilled - 1) * self.dtype.itemsize,
+                         shape=(1,))[0]
+    
+    def to_array(self):
+        """Whole column as one array (spilled part is read through a memmap)"""
+        parts = []
+        if self.spilled:
+            parts.append(np.memmap(self.spill_path, dtype=self.dtype, mode='r', shape=(self.spilled,)))
+        parts.extend(self.chunks)
+        parts.append(self.current[:self.fill])
+        return np.concatenate(parts)
+    
+    def nbytes(self):
+        """Bytes held in memory (spilled chunks excluded)"""
+        return (len(self.chunks) + 1) * self.chunk_size * self.dtype.itemsize
+
+
+class StudentTimeline:
+    """Focus and emotion timelines for one student with running aggregates
+    
+    Report metrics read the aggregates, so they cost O(1) regardless of
+    session length; the columns are kept for export and later analysis.
+    """
+    
+    def __init__(self, emotion_weights, confused_emotions, chunk_size=4096, spill_prefix=None):
+        self.emotion_weights = emotion_weights
+        self.confused_emotions = confused_emotions
+        
+        spill = (lambda name: f"{spill_prefix}_{name}.bin") if spill_prefix else (lambda name: None)
+        self.focus = TimelineColumn(np.uint8, chunk_size, spill('focus'))
+        self.emotion = TimelineColumn(np.uint8, chunk_size, spill('emotion'))
+        self.confidence = TimelineColumn(np.float32, chunk_size, spill('confidence'))
+        
+        self.focused_frames = 0
+        self.sentiment_total = 0.0
+        self.confused_count = 0
+    
+    @property
+    def frames(self):
+        return len(self.focus)
+    
+    @property
+    def emotion_count(self):
+        return len(self.emotion)
+    
+    def add_focus(self, is_focused, span=1):
+        """Record focus for the analyzed frame; span > 1 also fills the skipped frames before it
+        
+        Skipped frames are interpolated between the previous sample and this
+        one (nearest neighbour for a binary signal: first half keeps the old
+        value, second half takes the new one).
+        """
+        value = 1 if is_focused else 0
+        if span > 1:
+            previous = self.focus.last() if len(self.focus) else value
+            held = (span - 1) // 2
+            values = np.full(span, value, dtype=np.uint8)
+            values[:held] = previous
+            self.focus.extend(values)
+            self.focused_frames += int(values.sum())
+            return
+        self.focus.append(value)
+        self.focused_frames += value
+    
+    def add_emotion(self, emotion, confidence):
+        self.emotion.append(EMOTION_CODES.get(emotion, UNKNOWN_EMOTION))
+        self.confidence.append(confidence)
+        self.sentiment_total += self.emotion_weights.get(emotion, 0) * confidence
+        if emotion in self.confused_emotions and confidence > 0.5:
+            self.confused_count += 1
+    
+    def focus_ratio(self):
+        return self.focused_frames / self.frames if self.frames else 0.0
+    
+    def sentiment_mean(self):
+        """Mean of weight * confidence over all emotion samples"""
+        return self.sentiment_total / self.emotion_count if self.emotion_count else 0.0
+    
+    def export(self):
+        """Picklable arrays plus aggregates"""
+        return {
+            'focus': self.focus.to_array(),
+            'emotion': self.emotion.to_array(),
+            'confidence': self.confidence.to_array(),
+            'focused_frames': self.focused_frames,
+            'sentiment_total': self.sentiment_total,
+            'confused_count': self.confused_count
+        }
+    
+    def merge(self, state):
+        """Append an exported later time range"""
+        self.focus.extend(state['focus'])
+        self.emotion.extend(state['emotion'])
+        self.confidence.extend(state['confidence'])
+        self.focused_frames += state['focused_frames']
+        self.sentiment_total += state['sentiment_total']
+        self.confused_count += state['confused_count']
+
+
+class TimelineStore(dict):
+    """Per-student timelines, created on first access like a defaultdict
+    
+    With spill_dir set, full chunks of every column are written to raw
+    files in a private directory under spill_dir and read back via memmap;
+    close() removes them.
+    """
+    
+    def __init__(self, emotion_weights, confused_emotions, chunk_size=4096, spill_dir=None):
+        super().__init__()
+        self.emotion_weights = emotion_weights
+        self.confused_emotions = confused_emotions
+        self.chunk_size = chunk_size
+        self.spill_dir = tempfile.mkdtemp(prefix='timelines_', dir=spill_dir) if spill_dir else None
+    
+    def __missing__(self, student_id):
+        spill_prefix = os.path.join(self.spill_dir, str(student_id)) if self.spill_dir else None
+        timeline = StudentTimeline(self.emotion_weights, self.confused_emotions,
+                                   self.chunk_size, spill_prefix)
+        self[student_id] = timeline
+        return timeline
+    
+    def memory_bytes(self):
+        """Resident bytes held by all timeline columns"""
+        return sum(t.focus.nbytes() + t.emotion.nbytes() + t.confidence.nbytes() for t in self.values())
+    
+    def close(self):
+        if self.spill_dir:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir = None
@@ -0,0 +1,283 @@
+import queue
+import threading
+import time
+import cv2
+from frame_buffers import FramePool
+
+_END = object()
+
+
+class StageStats:
+    """Timing counters for one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.busy = 0.0       # doing the stage's own work
+        self.starved = 0.0    # waiting on an empty input queue
+        self.blocked = 0.0    # waiting on a full output queue (backpressure)
+        self.queue_depth_total = 0
+
+    def to_dict(self):
+        return {
+            'frames': self.frames,
+            'busy_seconds': round(self.busy, 3),
+            'starved_seconds': round(self.starved, 3),
+            'blocked_seconds': round(self.blocked, 3),
+            'avg_input_queue': round(self.queue_depth_total / self.frames, 2) if self.frames else 0,
+            'ms_per_frame': round(self.busy / self.frames * 1000, 2) if self.frames else 0
+        }
+
+
+class VideoPipeline:
+    """Runs decode -> analyze -> annotate -> encode on one thread per stage
+
+    Stages are joined by bounded queues so a slow stage applies backpressure
+    instead of buffering the whole video. OpenCV releases the GIL while
+    decoding, detecting and encoding, so the stages genuinely overlap.
+
+    analyze_fn(frame) runs on a single thread in frame order and may keep
+    per-video state. It must return everything annotate_fn(frame, result)
+    needs, since annotation runs concurrently with analysis of later frames.
+
+    With an AdaptiveSampler, the sampler picks which frames are analyzed and
+    each analysis is wrapped in sampler.begin()/end() to feed back latency,
+    motion and the analysis result. A realtime sampler decides on the decode
+    thread, so dropped frames are never converted. Offline, the decode
+    thread runs ahead of end() by up to queue_size frames, so the choice is
+    made on the analyze thread instead. There it always follows the
+    previous frame's end(), and a run analyzes the same frames every time.
+
+    recycle_frames decodes into frames handed back by the last stage (see
+    FramePool) instead of allocating one per frame; analyze_fn must then not
+    keep references to the frame or views of it past its own call.
+
+    result_fn(frame_idx, result) is called on the analyze thread after each
+    frame, e.g. to record results to an AnnotationSidecar instead of drawing.
+    """
+
+    def __init__(self, analyze_fn, annotate_fn=None, writer=None, queue_size=8,
+                 should_process=None, start_frame=0, end_frame=None, progress_fn=None, sampler=None,
+                 recycle_frames=False, result_fn=None):
+        self.analyze_fn = analyze_fn
+        self.annotate_fn = annotate_fn
+        self.writer = writer
+        self.queue_size = queue_size
+        self.sampler = sampler
+        # Offline sampling waits for the analysis before it (see class docstring)
+        self.sample_on_analyze = sampler is not None and not sampler.realtime and should_process is None
+        realtime_sampler = sampler.should_process if sampler and not self.sample_on_analyze else None
+        self.should_process = should_process or realtime_sampler
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.progress_fn = progress_fn
+        self.result_fn = result_fn
+        self.frame_pool = FramePool(max_free=queue_size * 3 + 4) if recycle_frames else None
+
+        self.stage_stats = {}
+        self.frames_read = 0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._error = None
+
+    def _put(self, q, item, stats):
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        stats.blocked += time.perf_counter() - start
+
+    def _get(self, q, stats):
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                item = q.get(timeout=0.1)
+                break
+            except queue.Empty:
+                continue
+        else:
+            item = _END
+        stats.starved += time.perf_counter() - start
+        stats.queue_depth_total += q.qsize()
+        return item
+
+    def _run_stage(self, target, *args):
+        try:
+            target(*args)
+        except BaseException as e:
+            self._error = e
+            self._stop.set()
+
+    def _decode(self, cap, out_q):
+        stats = self.stage_stats['decode']
+        frame_idx = self.start_frame
+
+        while not self._stop.is_set():
+            if self.end_frame is not None and frame_idx >= self.end_frame:
+                break
+
+            start = time.perf_counter()
+            if self.should_process is None or self.should_process(frame_idx):
+                ret, frame = self.frame_pool.read(cap) if self.frame_pool else cap.read()
+            else:
+                # grab() skips the decode-to-BGR conversion for frames we drop
+                ret, frame = cap.grab(), None
+            if not ret:
+                break
+            stats.busy += time.perf_counter() - start
+
+            if frame is not None:
+                stats.frames += 1
+                self._put(out_q, (frame_idx, frame), stats)
+
+            frame_idx += 1
+            self.frames_read = frame_idx - self.start_frame
+            if self.progress_fn:
+                self.progress_fn(frame_idx)
+
+        self._put(out_q, _END, stats)
+
+    def _analyze(self, in_q, out_q):
+        stats = self.stage_stats['analyze']
+
+        while True:
+            item = self._get(in_q, stats)
+            if item is _END:
+                break
+            frame_idx, frame = item
+
+            if self.sample_on_analyze and not self.sampler.should_process(frame_idx):
+                if self.frame_pool:
+                    self.frame_pool.release(frame)
+                continue
+
+            start = time.perf_counter()
+            if self.sampler:
+                self.sampler.begin(frame_idx, frame)
+            result = self.analyze_fn(frame)
+            if self.sampler:
+                self.sampler.end(result)
+            if self.result_fn:
+                self.result_fn(frame_idx, result)
+            stats.busy += time.perf_counter() - start
+            stats.frames += 1
+
+            if out_q is not None:
+                self._put(out_q, (frame_idx, frame, result), stats)
+            elif self.frame_pool:
+                self.frame_pool.release(frame)
+
+        if out_q is not None:
+            self._put(out_q, _END, stats)
+
+    def _annotate(self, in_q, out_q):
+        stats = self.stage_stats['annotate']
+
+        while True:
+            item = self._get(in_q, stats)
+            if item is _END:
+                break
+            frame_idx, frame, result = item
+
+            start = time.perf_counter()
+            annotated = self.annotate_fn(frame, result)
+            stats.busy += time.perf_counter() - start
+            stats.frames += 1
+
+            # The decoded frame travels along so encode can recycle it after writing
+            self._put(out_q, (frame, annotated), stats)
+
+        self._put(out_q, _END, stats)
+
+    def _encode(self, in_q):
+        stats = self.stage_stats['encode']
+
+        while True:
+            item = self._get(in_q, stats)
+            if item is _END:
+                break
+            frame, annotated = item
+
+            start = time.perf_counter()
+            self.writer.write(annotated)
+            stats.busy += time.perf_counter() - start
+            stats.frames += 1
+            if self.frame_pool:
+                self.frame_pool.release(frame)
+
+    def run(self, cap):
+        """Drive the capture through all stages; returns number of frames analyzed"""
+        # Consecutive segments on one capture are already in place; only seek when resuming
+        if self.start_frame and cap.get(cv2.CAP_PROP_POS_FRAMES) != self.start_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+
+        with_output = self.annotate_fn is not None and self.writer is not None
+        names = ['decode', 'analyze'] + (['annotate', 'encode'] if with_output else [])
+        self.stage_stats = {name: StageStats(name) for name in names}
+
+        decoded_q = queue.Queue(self.queue_size)
+        analyzed_q = queue.Queue(self.queue_size) if with_output else None
+        annotated_q = queue.Queue(self.queue_size) if with_output else None
+
+        threads = [
+            threading.Thread(target=self._run_stage, args=(self._decode, cap, decoded_q), name='decode'),
+            threading.Thread(target=self._run_stage, args=(self._analyze, decoded_q, analyzed_q), name='analyze')
+        ]
+        if with_output:
+            threads.append(threading.Thread(target=self._run_stage, args=(self._annotate, analyzed_q, annotated_q), name='annotate'))
+            threads.append(threading.Thread(target=self._run_stage, args=(self._encode, annotated_q), name='encode'))
+
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.elapsed = time.perf_counter() - start
+
+        if self._error is not None:
+            raise self._error
+
+        return self.stage_stats['analyze'].frames
+
+    def bottleneck(self):
+        """Stage with the most busy time"""
+        if not self.stage_stats:
+            return None
+        return max(self.stage_stats.values(), key=lambda s: s.busy).name
+
+    def stats(self):
+        """Per-stage timing and backpressure metrics"""
+        analyzed = self.stage_stats['analyze'].frames if self.stage_stats else 0
+        summary = {
+            'elapsed_seconds': round(self.elapsed, 3),
+            'frames_read': self.frames_read,
+            'frames_analyzed': analyzed,
+            'fps': round(analyzed / self.elapsed, 2) if self.elapsed > 0 else 0,
+            'bottleneck': self.bottleneck(),
+            'stages': {name: s.to_dict() for name, s in self.stage_stats.items()}
+        }
+        if self.sampler:
+            summary['sampling'] = self.sampler.stats()
+        if self.frame_pool:
+            summary['frame_pool'] = self.frame_pool.stats()
+        return summary
+
+    def print_stats(self):
+        """Print per-stage metrics"""
+        summary = self.stats()
+        print(f"\n⏱️  Pipeline: {summary['frames_analyzed']} frames in {summary['elapsed_seconds']}s "
+              f"({summary['fps']} fps), bottleneck: {summary['bottleneck']}")
+        for name, s in summary['stages'].items():
+            print(f"   {name:9} {s['ms_per_frame']:7.2f} ms/frame | busy {s['busy_seconds']:7.2f}s | "
+                  f"starved {s['starved_seconds']:7.2f}s | blocked {s['blocked_seconds']:7.2f}s | "
+                  f"queue {s['avg_input_queue']}")
+        if 'sampling' in summary:
+            sampling = summary['sampling']
+            print(f"   sampling  {sampling['effective_fps']} of {sampling['source_fps']} fps analyzed | "
+                  f"mean stride {sampling['mean_stride']} | skipped {sampling['frames_skipped']}")
+        if 'frame_pool' in summary:
+            pool = summary['frame_pool']
+            print(f"   frames    {pool['allocated']} decode buffers allocated, reused {pool['reused']} times")
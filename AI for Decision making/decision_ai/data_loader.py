@@ -4,12 +4,47 @@ import os
 class DataLoader:
     def __init__(self):
         self.base_path = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+        self.video_path = os.path.join(self.base_path, "AI Video Analyzer")
         
 
     def load_video_data(self):
-        path = os.path.join(self.base_path, "AI Video Analyzer", "accurate_report.csv")
-        df = pd.read_csv(path, skiprows=4)
-        return df
+        # One row per student: Student ID, Engagement Score, Attention Score, Hand Raises
+        if os.path.exists(os.path.join(self.video_path, "accurate_session.parquet")):
+            return self.summarize_sessions(self.load_video_sessions())
+        
+        # No session log: the student table is the last block of the report, after the header rows
+        path = os.path.join(self.video_path, "accurate_report.csv")
+        with open(path) as f:
+            start = next(i for i, line in enumerate(f) if line.startswith('Student ID,'))
+        return pd.read_csv(path, skiprows=start)
+    
+    def load_video_sessions(self, path=None, session=None, columns=None, filters=None):
+        # Per-frame, per-student rows; filters are pushed down, e.g. [("student_id", "==", "S3")]
+        # path is a session log directory; session reads a batch run's session_<video>.parquet;
+        # the accurate analyzer's accurate_session.parquet otherwise
+        if path is None:
+            name = f"session_{session}.parquet" if session else "accurate_session.parquet"
+            path = os.path.join(self.video_path, name)
+        return pd.read_parquet(path, columns=columns, filters=filters)
+    
+    @staticmethod
+    def summarize_sessions(sessions, history=50, hand_raise_gap=30):
+        # Same per-student scores as the accurate report: the mean of the last
+        # history frames, and raises more than hand_raise_gap frames apart
+        rows = []
+        for student_id, frames in sessions.sort_values('frame').groupby('student_id', sort=False):
+            raises, last = 0, -100
+            for frame in frames.loc[frames['hand_raised'].fillna(False).astype(bool), 'frame']:
+                if frame - last > hand_raise_gap:
+                    raises, last = raises + 1, frame
+            recent = frames.tail(history)
+            rows.append({
+                'Student ID': student_id,
+                'Engagement Score': round(float(recent['engagement'].mean()), 2),
+                'Attention Score': round(float(recent['focus'].mean()), 2),
+                'Hand Raises': raises
+            })
+        return pd.DataFrame(rows, columns=['Student ID', 'Engagement Score', 'Attention Score', 'Hand Raises'])
     
     def load_voice_data(self):
         path = os.path.join(self.base_path, "AI Voice Analysis", "analysis_results.csv")
@@ -1,8 +1,9 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import sys
 import os
 from pathlib import Path
+from metrics_hub import MetricsHub, last_event_id
 
 app = Flask(__name__)
 CORS(app)
@@ -65,34 +66,41 @@ def decision_ai():
         'status': 'success'
     })
 
-# Store video metrics
-video_metrics = {
+# Store video metrics per classroom; dashboards subscribe instead of polling
+DEFAULT_CLASS = 'default'
+video_metrics = MetricsHub(defaults={
     'engagement': 75,
     'attention': 80,
     'participation': 10,
     'students': 30,
     'hand_raises': 3
-}
+})
 
 @app.route('/update-video-metrics', methods=['POST'])
 def update_video_metrics():
-    global video_metrics
     data = request.get_json()
     if data:
-        video_metrics.update({
-            'engagement': data.get('engagement', 75),
-            'attention': data.get('attention', 80),
-            'participation': data.get('participation', 10),
-            'students': data.get('students', 30),
-            'hand_raises': data.get('hand_raises', 3)
-        })
+        class_id = str(data.get('class_id', DEFAULT_CLASS))
+        video_metrics.update(class_id, {key: data[key] for key in video_metrics.defaults if key in data})
     return jsonify({'status': 'updated'})
 
 @app.route('/live-metrics', methods=['GET'])
 def live_metrics():
-    return jsonify(video_metrics)
+    return jsonify(video_metrics.snapshot(request.args.get('class_id', DEFAULT_CLASS)))
+
+@app.route('/live-metrics/stream', methods=['GET'])
+def live_metrics_stream():
+    """Server-Sent Events: a snapshot, then metric deltas for one classroom"""
+    class_id = request.args.get('class_id', DEFAULT_CLASS)
+    events = video_metrics.stream(class_id, last_event_id(request.headers))
+    return Response(events, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/live-metrics/stats', methods=['GET'])
+def live_metrics_stats():
+    return jsonify(video_metrics.stats())
 
 if __name__ == '__main__':
     print("AI Backend Server Starting...")
     print("Server running on http://localhost:8000")
-    app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=8000, debug=True, threaded=True)
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+Per-classroom live metrics with Server-Sent Events fan-out.
+
+All state lives behind one lock; every classroom is a topic with its own
+condition on that lock, so an update only wakes that classroom's
+subscribers. Each update is diffed against the current state and the
+delta is encoded as an SSE event exactly once; subscribers just yield the
+shared bytes, which keeps hundreds of dashboard connections cheap.
+Reconnecting clients resume from Last-Event-ID while it is still in the
+topic's history and get a fresh snapshot otherwise.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+
+KEEPALIVE = b': keepalive\n\n'
+
+
+def sse_event(event, version, data):
+    return f"id: {version}\nevent: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class Topic:
+    """State, version counter and recent encoded deltas for one classroom"""
+    
+    def __init__(self, class_id, defaults, lock, history):
+        self.class_id = class_id
+        self.state = dict(defaults)
+        self.version = 0
+        self.updated_at = None
+        self.events = deque(maxlen=history)  # (version, encoded delta)
+        self.changed = threading.Condition(lock)
+        self.subscribers = 0
+    
+    def snapshot_event(self):
+        return sse_event('snapshot', self.version, {
+            'class_id': self.class_id, 'version': self.version, 'ts': self.updated_at, 'metrics': self.state
+        })
+    
+    def events_since(self, version):
+        """Encoded deltas after version, or None if some of them fell out of the history"""
+        if version == self.version:
+            return b''
+        if not self.events or self.events[0][0] > version + 1 or version > self.version:
+            return None
+        return b''.join(payload for v, payload in self.events if v > version)
+
+
+class MetricsHub:
+    """Thread-safe classroom metrics that push deltas to SSE subscribers"""
+    
+    def __init__(self, defaults=None, history=64, keepalive=15.0):
+        self.defaults = defaults or {}
+        self.history = history
+        self.keepalive = keepalive
+        self.lock = threading.Lock()
+        self.topics = {}
+    
+    def topic(self, class_id):
+        """Topic for class_id, created on first use (caller holds the lock)"""
+        topic = self.topics.get(class_id)
+        if topic is None:
+            topic = Topic(class_id, self.defaults, self.lock, self.history)
+            self.topics[class_id] = topic
+        return topic
+    
+    def update(self, class_id, data):
+        """Merge data into the classroom state and notify subscribers; returns the changed keys"""
+        with self.lock:
+            topic = self.topic(class_id)
+            delta = {key: value for key, value in data.items() if topic.state.get(key, object()) != value}
+            if delta:
+                topic.state.update(delta)
+                topic.version += 1
+                topic.updated_at = time.time()
+                topic.events.append((topic.version, sse_event('delta', topic.version, {
+                    'class_id': class_id, 'version': topic.version, 'ts': topic.updated_at, 'metrics': delta
+                })))
+                topic.changed.notify_all()
+            return delta
+    
+    def snapshot(self, class_id):
+        with self.lock:
+            return dict(self.topic(class_id).state)
+    
+    def stream(self, class_id, last_event_id=None):
+        """SSE generator for one subscriber: a snapshot (or missed deltas), then deltas as they happen"""
+        with self.lock:
+            topic = self.topic(class_id)
+            topic.subscribers += 1
+            first = None
+            if last_event_id is not None:
+                first = topic.events_since(last_event_id)
+            if first is None:
+                first = topic.snapshot_event()
+            version = topic.version
+        
+        try:
+            if first:
+                yield first
+            while True:
+                with self.lock:
+                    if not topic.changed.wait_for(lambda: topic.version > version, self.keepalive):
+                        chunk = KEEPALIVE
+                    else:
+                        chunk = topic.events_since(version)
+                        if chunk is None:
+                            chunk = topic.snapshot_event()  # Too far behind: resync
+                        version = topic.version
+                yield chunk
+        finally:
+            with self.lock:
+                topic.subscribers -= 1
+    
+    def stats(self):
+        with self.lock:
+            return {class_id: {'version': topic.version, 'subscribers': topic.subscribers,
+                               'updated_at': topic.updated_at}
+                    for class_id, topic in self.topics.items()}
+
+
+def last_event_id(headers):
+    """Parse the Last-Event-ID header an EventSource sends when it reconnects"""
+    try:
+        return int(headers.get('Last-Event-ID'))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,122 @@
+"""
+Load test for the /live-metrics/stream Server-Sent Events channel.
+
+Serves app.py in-process and subscribes N dashboard clients from a
+separate client process, spread over several classrooms. Metrics are then
+posted to /update-video-metrics at a fixed rate, and every client records
+how long each delta took to arrive (receive time minus the server's event
+timestamp). Fails when the p95 latency exceeds the budget.
+
+Usage: python sse_load_test.py [--clients 300] [--classes 10] [--rate 5] [--duration 10]
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import random
+import threading
+import time
+
+
+def subscribe(port, class_id, duration, latencies, connected):
+    """One dashboard: read SSE events and record delta latencies"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=duration + 10)
+    conn.request('GET', f'/live-metrics/stream?class_id={class_id}')
+    response = conn.getresponse()
+    connected.release()
+    deadline = time.time() + duration
+    event = None
+    while time.time() < deadline:
+        line = response.fp.readline()
+        if not line:
+            break
+        if line.startswith(b'event: '):
+            event = line[7:].strip()
+        elif line.startswith(b'data: ') and event == b'delta':
+            latencies.append(time.time() - json.loads(line[6:])['ts'])
+    conn.close()
+
+
+def run_clients(port, clients, classes, duration, results, ready):
+    """Client process: one thread per subscriber, latencies put on results"""
+    latencies = []
+    connected = threading.Semaphore(0)
+    threads = [threading.Thread(target=subscribe, daemon=True,
+                                args=(port, f"class-{i % classes}", duration, latencies, connected))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for _ in threads:
+        connected.acquire()
+    ready.set()
+    for thread in threads:
+        thread.join(duration + 15)
+    results.put(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of pushed live metrics under many subscribers")
+    parser.add_argument('--clients', type=int, default=300)
+    parser.add_argument('--classes', type=int, default=10, help="classrooms the clients are spread over")
+    parser.add_argument('--rate', type=float, default=5.0, help="updates per second per classroom")
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--budget-ms', type=float, default=200.0, help="allowed p95 latency")
+    args = parser.parse_args()
+    
+    from werkzeug.serving import make_server
+    import app as backend
+    
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # One access-log line per request otherwise
+    server = make_server('127.0.0.1', 0, backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+    
+    ctx = multiprocessing.get_context('spawn')
+    results, ready = ctx.Queue(), ctx.Event()
+    listen = args.duration + 2
+    client = ctx.Process(target=run_clients, args=(port, args.clients, args.classes, listen, results, ready))
+    client.start()
+    ready.wait(60)
+    print(f"🎬 {args.clients} subscribers on {args.classes} classrooms")
+    
+    # Publisher: post changing metrics round-robin over the classrooms
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    interval = 1.0 / (args.rate * args.classes)
+    posts = 0
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    next_due = time.perf_counter()
+    while time.perf_counter() - wall_start < args.duration:
+        body = json.dumps({'class_id': f"class-{posts % args.classes}",
+                           'engagement': random.randint(0, 100), 'attention': random.randint(0, 100)})
+        conn.request('POST', '/update-video-metrics', body, {'Content-Type': 'application/json'})
+        conn.getresponse().read()
+        posts += 1
+        next_due += interval
+        time.sleep(max(0.0, next_due - time.perf_counter()))
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    
+    latencies = sorted(results.get(timeout=listen + 30))
+    client.join()
+    server.shutdown()
+    
+    if not latencies:
+        print("❌ No deltas received")
+        return 1
+    
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000
+    
+    print(f"📊 {posts} updates -> {len(latencies)} deltas delivered | server CPU {cpu / wall * 100:.1f}%")
+    print(f"⏱️ latency p50 {pct(50):.1f} ms | p95 {pct(95):.1f} ms | p99 {pct(99):.1f} ms | max {latencies[-1] * 1000:.1f} ms")
+    if pct(95) > args.budget_ms:
+        print(f"❌ p95 latency over {args.budget_ms:.0f} ms budget")
+        return 1
+    print(f"✅ p95 latency within {args.budget_ms:.0f} ms budget")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,13 +1,28 @@
-from flask import Flask, render_template, Response, jsonify
+from flask import Flask, render_template, Response, jsonify, request
 import cv2
 import os
+import sys
 from pathlib import Path
-from video_metrics_extractor import extractor
+from video_metrics_extractor import RealTimeMetricsExtractor, LIVE_OPTIONS, METRIC_KEYS
+from source_registry import SourceRegistry
+from metrics_publisher import MetricsPublisher
+from adaptive_sampler import AdaptiveSampler
+from classroom_zones import ClassroomZones
+
+# Live-metrics push channel shared with the AI backend (appended so app.py here is not shadowed)
+BACKEND_DIR = Path(__file__).parent.parent / "AI_Backend_Server"
+sys.path.append(str(BACKEND_DIR))
+from metrics_hub import MetricsHub, last_event_id
 
 app = Flask(__name__)
 
-# Path to video file
+# Path to video file (monitored as the default class)
 VIDEO_PATH = Path(__file__).parent.parent / "AI Video Analyzer" / "assets" / "IMG_6783.MOV"
+DEFAULT_CLASS = 'default'
+
+# Optional class_id,source[,zones] CSV of classrooms to monitor at startup (source: file, URL or device
+# index; zones: the camera's seating-zone config, see classroom_zones)
+SOURCES_FILE = Path(__file__).parent / "sources.csv"
 
 @app.route('/')
 def index():
@@ -15,55 +30,45 @@ def index():
 
 @app.route('/video_feed')
 def video_feed():
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    # Every viewer reads the same encoded frames; analysis runs once per source
+    worker = registry.get(request.args.get('class_id', DEFAULT_CLASS))
+    if worker is None:
+        return jsonify({'status': 'not_found', 'message': 'Unknown class_id'}), 404
+    return Response(worker.stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
-# Global variable to store current metrics
-current_metrics = {'students': 0, 'engagement': 0, 'attention': 0, 'hand_raises': 0}
+# Metrics go to the AI backend from a background thread at a fixed rate
+publisher = MetricsPublisher('http://localhost:8000/update-video-metrics', rate=4.0)
+publisher.start()
 
-def generate_frames():
-    global current_metrics
-    
-    if not VIDEO_PATH.exists():
-        blank = cv2.zeros((480, 640, 3), dtype='uint8')
-        cv2.putText(blank, 'Video Not Found', (200, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-        blank_bytes = cv2.imencode('.jpg', blank)[1].tobytes()
-        while True:
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + blank_bytes + b'\r\n')
-    
-    cap = cv2.VideoCapture(str(VIDEO_PATH))
-    
-    while True:
-        success, frame = cap.read()
-        if not success:
-            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Loop video
-            continue
-        
-        # Extract real-time metrics from frame
-        current_metrics = extractor.analyze_frame(frame)
-        
-        # Send metrics to AI backend for website sync
-        try:
-            import requests
-            requests.post('http://localhost:8000/update-video-metrics', json=current_metrics, timeout=0.1)
-        except:
-            pass
-        
-        # Add face detection and annotations
-        annotated_frame = extractor.draw_annotations(frame, current_metrics)
-        
-        ret, buffer = cv2.imencode('.jpg', annotated_frame)
-        frame_bytes = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+# Latest metrics per class, pushed to /live_metrics/stream subscribers
+live_hub = MetricsHub(defaults=dict.fromkeys(METRIC_KEYS, 0))
+
+def publish_metrics(class_id, metrics):
+    """Hand the newest metrics to the publisher and live subscribers; never blocks the video loop"""
+    publisher.submit(dict(metrics, class_id=class_id), source=class_id)
+    live_hub.update(class_id, metrics)
+
+def make_sampler(native_fps):
+    """Skip frames to stay real-time; sample densely on motion or when the face count changes"""
+    return AdaptiveSampler(native_fps, realtime=True, count_fn=lambda analysis: len(analysis['faces']))
+
+def make_extractor(zones=None):
+    """Extractor for one classroom; with a zones config only its seating area is analyzed"""
+    return RealTimeMetricsExtractor(zones=ClassroomZones.load(zones) if zones else None, **LIVE_OPTIONS)
+
+# Every classroom gets its own capture thread and extractor state; analysis shares one thread pool
+registry = SourceRegistry(make_extractor, on_metrics=publish_metrics, make_sampler=make_sampler)
+registry.add(DEFAULT_CLASS, str(VIDEO_PATH))
+if SOURCES_FILE.exists():
+    registry.load_csv(SOURCES_FILE)
 
 @app.route('/video_info')
 def video_info():
-    if not VIDEO_PATH.exists():
+    worker = registry.get(request.args.get('class_id', DEFAULT_CLASS))
+    cap = cv2.VideoCapture(worker.source) if worker else None
+    if cap is None or not cap.isOpened():
         return jsonify({'status': 'not_found', 'message': 'Video file not found'})
     
-    cap = cv2.VideoCapture(str(VIDEO_PATH))
     fps = cap.get(cv2.CAP_PROP_FPS)
     frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     duration = frame_count / fps if fps > 0 else 0
@@ -79,17 +84,59 @@ def video_info():
         'frames': frame_count
     })
 
+@app.route('/sources', methods=['GET'])
+def list_sources():
+    """Monitored classrooms with viewers, analyzed fps and dropped frames"""
+    return jsonify(registry.stats())
+
+@app.route('/sources', methods=['POST'])
+def add_source():
+    """Start monitoring {"class_id": ..., "source": path, URL or device index, "zones": optional config path}"""
+    data = request.get_json() or {}
+    if 'class_id' not in data or 'source' not in data:
+        return jsonify({'status': 'error', 'message': 'class_id and source are required'}), 400
+    if data.get('zones') and not os.path.isfile(data['zones']):
+        return jsonify({'status': 'error', 'message': 'zones config not found'}), 400
+    try:
+        worker = registry.add(str(data['class_id']), data['source'], data.get('zones'))
+    except KeyError:
+        return jsonify({'status': 'error', 'message': 'class_id already monitored'}), 409
+    return jsonify({'status': 'added', 'source': worker.stats()}), 201
+
+@app.route('/sources/<class_id>', methods=['DELETE'])
+def remove_source(class_id):
+    if not registry.remove(class_id):
+        return jsonify({'status': 'not_found', 'message': 'Unknown class_id'}), 404
+    return jsonify({'status': 'removed', 'class_id': class_id})
+
+@app.route('/publisher_stats')
+def publisher_stats():
+    """Sent, dropped and failed metric pushes to the AI backend"""
+    return jsonify(publisher.stats())
+
 @app.route('/live_metrics')
 def live_metrics():
     """Return real-time metrics extracted from video"""
-    global current_metrics
+    current_metrics = live_hub.snapshot(request.args.get('class_id', DEFAULT_CLASS))
     
-    return jsonify({
+    metrics = {
         'engagement': current_metrics['engagement'],
         'attention': current_metrics['attention'], 
         'hand_raises': current_metrics['hand_raises'],
         'students': current_metrics['students']
-    })
+    }
+    # Per seating zone, for a classroom monitored with a zones config
+    if 'zones' in current_metrics:
+        metrics['zones'] = current_metrics['zones']
+    return jsonify(metrics)
+
+@app.route('/live_metrics/stream')
+def live_metrics_stream():
+    """Server-Sent Events: metric deltas as soon as a frame is analyzed"""
+    events = live_hub.stream(request.args.get('class_id', DEFAULT_CLASS), last_event_id(request.headers))
+    return Response(events, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # The reloader would import this module twice and run every source worker twice
+    app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False)
@@ -0,0 +1,222 @@
+"""
+Single-producer video analysis with fan-out to many MJPEG viewers.
+
+Each video source gets exactly one SourceWorker: a capture thread that
+keeps the newest frame, plus the source's own extractor state. A shared
+scheduler (see source_registry.py) analyzes, annotates and JPEG-encodes
+that frame once, and the encoded multipart chunk goes into a FrameRing
+that every /video_feed client reads from. Viewers never decode, analyze
+or re-encode anything, so CPU cost does not depend on how many people
+are watching.
+"""
+
+import os
+import threading
+import time
+import cv2
+import numpy as np
+from frame_buffers import FramePool
+
+PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+
+def mjpeg_part(jpeg_bytes):
+    """One multipart/x-mixed-replace chunk, built once and shared by all viewers"""
+    return PART_HEADER + jpeg_bytes + b'\r\n'
+
+
+class FrameRing:
+    """Ring buffer of the latest encoded frames; one writer, any number of readers
+    
+    Readers keep the sequence number of the last frame they sent. A reader
+    that falls more than a ring behind skips ahead to the newest frame
+    instead of slowing down the producer or other viewers.
+    """
+    
+    def __init__(self, size=8):
+        self.size = size
+        self.slots = [None] * size
+        self.seq = 0  # sequence number of the newest frame, 0 = nothing yet
+        self.cond = threading.Condition()
+    
+    def publish(self, part):
+        with self.cond:
+            self.seq += 1
+            self.slots[self.seq % self.size] = part
+            self.cond.notify_all()
+    
+    def next_after(self, seq, timeout=None):
+        """Return (seq, part) of the frame after seq, or (seq, None) on timeout"""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > seq, timeout):
+                return seq, None
+            # Too far behind: the frame after seq has been overwritten
+            seq = self.seq if self.seq - seq >= self.size else seq + 1
+            return seq, self.slots[seq % self.size]
+
+
+class SourceWorker(threading.Thread):
+    """Capture thread and analysis state for one source
+    
+    The thread only reads frames (files paced to their native frame rate and
+    looped) and keeps the newest one for the scheduler, which calls process()
+    from a pool thread. A frame that is still waiting when the next one is
+    captured is replaced and counted as dropped, so a source whose analysis
+    cannot keep up loses frame rate instead of falling behind. With
+    make_sampler(native_fps) returning an AdaptiveSampler, frames are also
+    skipped by its stride: more often in static scenes, and at least enough
+    to cover the analysis latency.
+    """
+    
+    def __init__(self, class_id, source, extractor, on_ready, ring_size=8, jpeg_quality=95, on_metrics=None,
+                 make_sampler=None):
+        super().__init__(name=f"source-{class_id}", daemon=True)
+        self.class_id = class_id
+        self.source = source
+        self.extractor = extractor
+        self.on_ready = on_ready
+        self.ring = FrameRing(ring_size)
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        self.on_metrics = on_metrics
+        self.make_sampler = make_sampler
+        self.sampler = None
+        self.frame_pool = FramePool(max_free=2)  # Decode targets handed back after process()
+        
+        self.lock = threading.Lock()
+        self.pending = None  # (frame index, frame) captured but not yet analyzed
+        self.viewers = 0
+        self.stopping = threading.Event()
+        
+        self.metrics = None
+        self.captured = 0
+        self.frames = 0
+        self.dropped = 0
+        self.native_fps = 0.0
+        self.started_at = None
+    
+    def attach(self):
+        with self.lock:
+            self.viewers += 1
+    
+    def detach(self):
+        with self.lock:
+            self.viewers -= 1
+    
+    def stop(self):
+        self.stopping.set()
+    
+    def run(self):
+        self.started_at = time.monotonic()
+        cap = cv2.VideoCapture(self.source)
+        
+        if not cap.isOpened():
+            self.publish_placeholder('Video Not Found')
+            cap.release()
+            return
+        
+        # Files are read as fast as we can decode them, so pace them to their own fps
+        self.native_fps = cap.get(cv2.CAP_PROP_FPS)
+        is_file = isinstance(self.source, str) and os.path.isfile(self.source)
+        frame_interval = 1.0 / self.native_fps if is_file and self.native_fps > 0 else 0.0
+        next_due = time.monotonic()
+        rewound = False
+        if self.make_sampler:
+            self.sampler = self.make_sampler(self.native_fps)
+        
+        while not self.stopping.is_set():
+            # grab() every frame to stay in sync with the source; decode only what will be analyzed
+            if not cap.grab():
+                if rewound:
+                    break  # Nothing readable even from the start
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Loop video
+                rewound = True
+                continue
+            rewound = False
+            frame_idx = self.captured
+            self.captured += 1
+            
+            with self.lock:
+                waiting = self.pending is not None
+            if waiting:
+                self.dropped += 1  # Scheduler has not reached the previous frame yet
+            elif self.sampler is None or self.sampler.should_process(frame_idx):
+                success, frame = cap.retrieve(image=self.frame_pool.acquire())
+                if success:
+                    with self.lock:
+                        self.pending = (frame_idx, frame)
+                    self.on_ready(self)
+            
+            if frame_interval:
+                next_due = max(next_due + frame_interval, time.monotonic() - frame_interval)
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    self.stopping.wait(delay)
+        
+        cap.release()
+    
+    def take(self):
+        """Hand the waiting (frame index, frame) to the scheduler (None if there is none)"""
+        with self.lock:
+            item, self.pending = self.pending, None
+        return item
+    
+    def has_pending(self):
+        with self.lock:
+            return self.pending is not None
+    
+    def process(self, frame_idx, frame):
+        """Analyze, annotate and encode one frame; runs on a scheduler thread"""
+        # One detection/analysis pass; the result carries per-face boxes, IDs and scores
+        if self.sampler:
+            self.sampler.begin(frame_idx, frame)
+        analysis = self.extractor.analyze_frame(frame)
+        if self.sampler:
+            self.sampler.end(analysis)
+        self.metrics = self.extractor.summary(analysis)
+        if self.on_metrics:
+            self.on_metrics(self.class_id, self.metrics)
+        
+        # Annotate and encode once for every viewer
+        annotated_frame = self.extractor.draw_annotations(frame, analysis)
+        ret, buffer = cv2.imencode('.jpg', annotated_frame, self.encode_params)
+        self.frame_pool.release(frame)
+        if ret:
+            self.ring.publish(mjpeg_part(buffer.tobytes()))
+            self.frames += 1
+    
+    def publish_placeholder(self, message):
+        """Keep re-sending a static frame so viewers still get a picture and disconnects are noticed"""
+        blank = np.zeros((480, 640, 3), dtype=np.uint8)
+        cv2.putText(blank, message, (200, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        part = mjpeg_part(cv2.imencode('.jpg', blank)[1].tobytes())
+        while not self.stopping.is_set():
+            self.ring.publish(part)
+            self.stopping.wait(1.0)
+    
+    def stream(self, timeout=5.0):
+        """MJPEG generator for one viewer; only copies already-encoded chunks"""
+        self.attach()
+        try:
+            seq = 0
+            while True:
+                seq, part = self.ring.next_after(seq, timeout)
+                if part is not None:
+                    yield part
+                elif not self.is_alive():
+                    break
+        finally:
+            self.detach()
+    
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            'class_id': self.class_id,
+            'source': self.source,
+            'viewers': self.viewers,
+            'native_fps': round(self.native_fps, 2),
+            'fps': round(self.frames / elapsed, 2) if elapsed > 0 else 0.0,
+            'frames': self.frames,
+            'dropped': self.dropped,
+            'sampling': self.sampler.stats() if self.sampler else None,
+            'running': self.is_alive()
+        }
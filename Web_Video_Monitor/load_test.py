@@ -0,0 +1,122 @@
+"""
+Load test for the shared MJPEG broadcaster.
+
+Serves app.py in-process and opens N concurrent /video_feed viewers from a
+separate client process, so the measured CPU is the server's alone. For
+each viewer count it reports server CPU, CPU per produced frame, and the
+frame rate each viewer actually receives. With a single producer per
+source, CPU should stay flat as viewers are added.
+
+Usage: python load_test.py [--source VIDEO] [--viewers 1 2 4 8 16] [--duration 10]
+"""
+
+import argparse
+import multiprocessing
+import threading
+import time
+import urllib.request
+
+BOUNDARY = b'--frame\r\n'
+
+
+def read_stream(url, duration, counts, index):
+    """Count MJPEG parts received on one connection for duration seconds"""
+    deadline = time.monotonic() + duration
+    with urllib.request.urlopen(url, timeout=duration + 10) as response:
+        tail = b''
+        while time.monotonic() < deadline:
+            chunk = response.read1(65536)
+            if not chunk:
+                break
+            data = tail + chunk
+            counts[index] += data.count(BOUNDARY)
+            tail = data[-(len(BOUNDARY) - 1):]
+
+
+def run_viewers(url, viewers, duration, results):
+    """Client process: one thread per viewer, frame counts put on results"""
+    counts = [0] * viewers
+    threads = [threading.Thread(target=read_stream, args=(url, duration, counts, i), daemon=True)
+               for i in range(viewers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(duration + 15)
+    results.put(counts)
+
+
+def measure(url, registry, viewers, warmup, duration):
+    """Server CPU and frame rates while `viewers` clients are connected"""
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    client = ctx.Process(target=run_viewers, args=(url, viewers, warmup + duration, results))
+    client.start()
+    time.sleep(warmup)
+    
+    frames_before = sum(stat['frames'] for stat in registry.stats())
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    time.sleep(duration)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    produced = sum(stat['frames'] for stat in registry.stats()) - frames_before
+    
+    counts = results.get(timeout=warmup + duration + 30)
+    client.join()
+    
+    return {
+        'viewers': viewers,
+        'cpu_pct': cpu / wall * 100,
+        'cpu_ms_per_frame': cpu / produced * 1000 if produced else 0.0,
+        'produced_fps': produced / wall,
+        'viewer_fps': sum(counts) / len(counts) / (warmup + duration)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU vs viewer count for /video_feed")
+    parser.add_argument('--source', help="video to stream (default: the app's default class)")
+    parser.add_argument('--viewers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds measured per step")
+    parser.add_argument('--warmup', type=float, default=3.0, help="seconds before measuring")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed CPU-per-frame growth from fewest to most viewers")
+    args = parser.parse_args()
+    
+    from werkzeug.serving import make_server
+    import app as monitor
+    
+    if args.source:
+        monitor.registry.remove(monitor.DEFAULT_CLASS)
+        monitor.registry.add(monitor.DEFAULT_CLASS, args.source)
+    print(f"🎬 Source: {monitor.registry.get(monitor.DEFAULT_CLASS).source}")
+    
+    server = make_server('127.0.0.1', 0, monitor.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/video_feed"
+    
+    rows = []
+    for viewers in args.viewers:
+        row = measure(url, monitor.registry, viewers, args.warmup, args.duration)
+        rows.append(row)
+        print(f"📊 {viewers:3d} viewers: CPU {row['cpu_pct']:6.1f}% | {row['cpu_ms_per_frame']:7.1f} ms/frame | "
+              f"produced {row['produced_fps']:5.1f} fps | per viewer {row['viewer_fps']:5.1f} fps")
+    
+    server.shutdown()
+    monitor.registry.close()
+    monitor.publisher.close()
+    
+    first, last = rows[0], rows[-1]
+    if not first['cpu_ms_per_frame']:
+        print("❌ No frames produced")
+        return 1
+    growth = last['cpu_ms_per_frame'] / first['cpu_ms_per_frame'] - 1
+    print(f"\n⚡ CPU per frame {first['viewers']} -> {last['viewers']} viewers: {growth * 100:+.1f}%")
+    if growth > args.tolerance:
+        print(f"❌ CPU grows with viewer count (tolerance {args.tolerance * 100:.0f}%)")
+        return 1
+    print("✅ CPU flat as viewers grow")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+"""
+Non-blocking metrics push to the AI backend.
+
+The video loop only calls submit(), which stores the newest metrics for a
+source and returns immediately. A background thread sends whatever is
+pending at a fixed rate over one pooled keep-alive session. Updates that
+are superseded before they are sent are dropped, never queued, and while
+the backend is unreachable the push interval backs off.
+"""
+
+import threading
+import time
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    requests = None
+
+
+class MetricsPublisher(threading.Thread):
+    """Coalesces metrics per source and posts the latest value at most `rate` times a second"""
+    
+    def __init__(self, url, rate=4.0, timeout=0.5, max_backoff=5.0, pool_size=4):
+        super().__init__(name="metrics-publisher", daemon=True)
+        self.url = url
+        self.interval = 1.0 / rate
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        
+        self.session = None
+        if requests is not None:
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+        
+        self.lock = threading.Lock()
+        self.pending = {}  # source -> newest unsent metrics
+        self.stopping = threading.Event()
+        self.backoff = self.interval
+        self.counters = {'submitted': 0, 'sent': 0, 'dropped': 0, 'failed': 0}
+        self.last_error = None
+        self.last_sent_at = None
+    
+    def submit(self, metrics, source='default'):
+        """Replace the pending update for source; never blocks on the network"""
+        with self.lock:
+            if source in self.pending:
+                self.counters['dropped'] += 1  # Superseded before it was sent
+            self.pending[source] = dict(metrics)
+            self.counters['submitted'] += 1
+    
+    def run(self):
+        while not self.stopping.wait(self.backoff):
+            self.flush()
+        self.flush()
+    
+    def flush(self):
+        """Send everything pending (one request per source) and adjust the interval"""
+        with self.lock:
+            batch, self.pending = self.pending, {}
+        
+        failed = False
+        for source, metrics in batch.items():
+            if self.post(metrics):
+                self.counters['sent'] += 1
+            else:
+                # A newer update will follow; retrying stale metrics is pointless
+                self.counters['failed'] += 1
+                failed = True
+        
+        # Back off while the backend is down, return to the normal rate once it answers
+        if failed:
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+        elif batch:
+            self.backoff = self.interval
+    
+    def post(self, metrics):
+        if self.session is None:
+            self.last_error = "requests is not installed"
+            return False
+        try:
+            response = self.session.post(self.url, json=metrics, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            self.last_error = str(e)
+            return False
+        self.last_sent_at = time.time()
+        return True
+    
+    def close(self, timeout=2.0):
+        """Send what is pending once more and stop the thread"""
+        self.stopping.set()
+        if self.is_alive():
+            self.join(timeout)
+        if self.session is not None:
+            self.session.close()
+    
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters, pending=len(self.pending))
+        stats.update(interval=round(self.backoff, 3), last_error=self.last_error, last_sent_at=self.last_sent_at)
+        return stats
@@ -0,0 +1,147 @@
+"""
+Registry of live classroom sources sharing a fixed pool of analysis threads.
+
+Every class_id maps to a video file or capture device and gets its own
+SourceWorker (capture thread, RealTimeMetricsExtractor state, frame ring).
+Analysis runs on a FairScheduler: a fixed number of threads that serve
+sources with a waiting frame in round-robin order, at most one frame per
+source at a time. With more streams than the pool can keep up with, every
+stream's analyzed frame rate drops evenly and stale frames are skipped,
+so no stream falls behind real time.
+"""
+
+import csv
+import os
+import threading
+from collections import deque
+from frame_broadcaster import SourceWorker
+
+
+def parse_source(value):
+    """Device index for digit strings (e.g. "0" for the first camera), otherwise a path/URL"""
+    if isinstance(value, int):
+        return value
+    value = str(value).strip()
+    return int(value) if value.isdigit() else value
+
+
+class FairScheduler:
+    """Fixed-size thread pool that analyzes waiting frames round-robin across sources
+    
+    OpenCV releases the GIL in detection, tracking and JPEG encoding, so
+    threads run in parallel without shipping frames to other processes, and
+    each source's tracker state stays with its worker.
+    """
+    
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.cond = threading.Condition()
+        self.queue = deque()   # sources with a waiting frame, oldest request first
+        self.queued = set()
+        self.running = set()   # sources being analyzed right now
+        self.stopping = False
+        
+        self.threads = [threading.Thread(target=self.run, name=f"analysis-{i}", daemon=True)
+                        for i in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+    
+    def ready(self, source):
+        """Called by a capture thread when it has a new frame waiting"""
+        with self.cond:
+            if source not in self.queued and source not in self.running:
+                self.queue.append(source)
+                self.queued.add(source)
+                self.cond.notify()
+    
+    def run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.queue or self.stopping)
+                if self.stopping:
+                    return
+                source = self.queue.popleft()
+                self.queued.discard(source)
+                self.running.add(source)
+            
+            item = source.take()
+            if item is not None:
+                try:
+                    source.process(*item)
+                except Exception as e:
+                    print(f"⚠️ Analysis failed for {source.class_id}: {e}")
+            
+            # Back of the line: a frame that arrived meanwhile waits for the other sources
+            with self.cond:
+                self.running.discard(source)
+            if source.has_pending():
+                self.ready(source)
+    
+    def close(self, timeout=5.0):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        for thread in self.threads:
+            thread.join(timeout)
+
+
+class SourceRegistry:
+    """class_id -> SourceWorker, addable and removable at runtime
+    
+    make_extractor(zones) builds a source's extractor; zones is the source's
+    seating-zone config path (see classroom_zones), or None.
+    """
+    
+    def __init__(self, make_extractor, workers=None, **worker_options):
+        self.make_extractor = make_extractor
+        self.worker_options = worker_options
+        self.scheduler = FairScheduler(workers)
+        self.sources = {}
+        self.lock = threading.Lock()
+    
+    def add(self, class_id, source, zones=None):
+        """Start monitoring source under class_id; raises KeyError if the id is taken"""
+        with self.lock:
+            if class_id in self.sources:
+                raise KeyError(class_id)
+            worker = SourceWorker(class_id, parse_source(source), self.make_extractor(zones),
+                                  self.scheduler.ready, **self.worker_options)
+            self.sources[class_id] = worker
+        worker.start()
+        return worker
+    
+    def remove(self, class_id, timeout=5.0):
+        """Stop and forget a source; False if class_id is unknown"""
+        with self.lock:
+            worker = self.sources.pop(class_id, None)
+        if worker is None:
+            return False
+        worker.stop()
+        worker.join(timeout)
+        return True
+    
+    def get(self, class_id):
+        return self.sources.get(class_id)
+    
+    def metrics(self, class_id):
+        """Latest class metrics, or None before the first analyzed frame"""
+        worker = self.sources.get(class_id)
+        return worker.metrics if worker else None
+    
+    def stats(self):
+        return [worker.stats() for worker in list(self.sources.values())]
+    
+    def load_csv(self, path):
+        """Register every class_id,source[,zones] row of a CSV file; returns the number added"""
+        added = 0
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                if row['class_id'] not in self.sources:
+                    self.add(row['class_id'], row['source'], row.get('zones') or None)
+                    added += 1
+        return added
+    
+    def close(self, timeout=5.0):
+        for class_id in list(self.sources):
+            self.remove(class_id, timeout)
+        self.scheduler.close(timeout)
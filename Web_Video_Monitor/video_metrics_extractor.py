@@ -1,98 +1,76 @@
 import cv2
 import numpy as np
-import pickle
 import os
-from collections import defaultdict, deque
+import sys
+from collections import deque
 from pathlib import Path
 
+# Shared detection/analysis modules live with the offline analyzers
+ANALYZER_DIR = Path(__file__).parent.parent / "AI Video Analyzer"
+sys.path.insert(0, str(ANALYZER_DIR))
+
+from face_tracking import TrackedFaceDetector
+from student_tracker import StudentTracker
+from hand_features import HandFeatureExtractor
+from model_registry import models
+from frame_buffers import FrameBuffers, shade_panel
+from classroom_zones import zone_metrics
+
+# Class-level metrics published to the dashboard/backend (per-face results stay local);
+# an extractor with seating zones adds per-zone ones under 'zones'
+METRIC_KEYS = ('students', 'engagement', 'attention', 'hand_raises')
+
 class RealTimeMetricsExtractor:
-    def __init__(self):
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+    def __init__(self, detect_interval=1, min_face_size=30, zones=None):
+        # Shared by every classroom's extractor; each analysis thread borrows an idle cascade
+        self.face_cascade = models.get('cascade', 'haarcascade_frontalface_default.xml')
+        self.eye_cascade = models.get('cascade', 'haarcascade_eye.xml')
+        # Full cascade every detect_interval frames, optical-flow tracking in between
+        # min_face_size > 30 (or a fraction of frame height) detects on a downscaled frame
+        self.face_detector = TrackedFaceDetector(self.face_cascade, detect_interval=detect_interval,
+                                                 min_face_size=min_face_size)
+        # Grayscale conversion reuses two buffers; the tracker holds the previous one
+        self.buffers = FrameBuffers(depth=2)
+        # zones (ClassroomZones): a wide-angle camera only searches the seating area, not the board or teacher
+        self.zones = zones
         
         # Face tracking for stable student count
         self.face_tracker = {}
-        self.next_face_id = 1
+        self.tracker = StudentTracker(max_distance=100, id_prefix=None)
         self.face_positions = deque(maxlen=30)  # Track last 30 frames
         
-        # Load hand raise model if exists
-        self.hand_raise_model = None
-        model_path = Path(__file__).parent.parent / "AI Video Analyzer" / "hand_raise_model.pkl"
-        if model_path.exists():
-            with open(model_path, 'rb') as f:
-                self.hand_raise_model = pickle.load(f)
+        # Load hand raise model if exists (compiled forest, P > 0.5 == predict() == 1)
+        self.hand_raise_model = models.get('hand_raise', str(ANALYZER_DIR / "hand_raise_model.pkl"), 0.5)
+        # Same 9 features the model was trained on (previously only 4 were built here)
+        self.hand_features = HandFeatureExtractor()
     
     def track_faces(self, faces):
-        """Track faces across frames for stable student count"""
-        current_faces = {}
+        """Track faces across frames; returns (stable student count, track ID per face)"""
+        face_ids = self.tracker.update(faces)
+        self.face_tracker = {face_id: (x + w//2, y + h//2) for face_id, (x, y, w, h) in zip(face_ids, faces)}
+        self.face_positions.append(len(self.face_tracker))
         
-        for (x, y, w, h) in faces:
-            center = (x + w//2, y + h//2)
-            
-            # Find closest existing face
-            min_dist = 100
-            matched_id = None
-            
-            for face_id, last_pos in self.face_tracker.items():
-                dist = np.sqrt((center[0] - last_pos[0])**2 + (center[1] - last_pos[1])**2)
-                if dist < min_dist:
-                    min_dist = dist
-                    matched_id = face_id
-            
-            if matched_id is None:
-                matched_id = self.next_face_id
-                self.next_face_id += 1
-            
-            current_faces[matched_id] = center
-        
-        # Update tracker with current faces
-        self.face_tracker = current_faces
-        self.face_positions.append(len(current_faces))
-        
-        # Return stable count (median of recent frames)
+        # Stable count (median of recent frames)
         if len(self.face_positions) > 5:
-            return int(np.median(list(self.face_positions)))
-        return len(current_faces)
-    
-    def extract_hand_features(self, frame, face_bbox):
-        """Extract features for hand raise detection"""
-        x, y, w, h = face_bbox
-        above_h = int(h * 1.5)
-        above_y = max(0, y - above_h)
-        above_region = frame[above_y:y, max(0, x-w//2):min(frame.shape[1], x+w+w//2)]
-        
-        if above_region.size == 0:
-            return None
-        
-        hsv = cv2.cvtColor(above_region, cv2.COLOR_BGR2HSV)
-        lower_skin = np.array([0, 20, 70], dtype=np.uint8)
-        upper_skin = np.array([20, 255, 255], dtype=np.uint8)
-        skin_mask = cv2.inRange(hsv, lower_skin, upper_skin)
-        
-        features = []
-        skin_ratio = np.sum(skin_mask > 0) / skin_mask.size
-        features.append(skin_ratio)
-        
-        # Add more features for better detection
-        vertical_profile = np.sum(skin_mask, axis=1)
-        if len(vertical_profile) > 0:
-            top = np.sum(vertical_profile[:len(vertical_profile)//3])
-            mid = np.sum(vertical_profile[len(vertical_profile)//3:2*len(vertical_profile)//3])
-            bot = np.sum(vertical_profile[2*len(vertical_profile)//3:])
-            total = top + mid + bot
-            features.extend([top/total if total > 0 else 0, mid/total if total > 0 else 0, bot/total if total > 0 else 0])
-        else:
-            features.extend([0, 0, 0])
-        
-        return np.array(features[:6])  # Use first 6 features
+            return int(np.median(list(self.face_positions))), face_ids
+        return len(self.face_tracker), face_ids
     
     def analyze_frame(self, frame):
-        """Analyze single frame and return metrics"""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(30, 30))
+        """Analyze single frame; returns class metrics plus per-face results for drawing"""
+        gray = self.buffers.gray(frame)
+        
+        # Attention is measured from the middle of the seating area, or of the frame without zones
+        zones = None
+        center_x, half_width = frame.shape[1] // 2, frame.shape[1] // 2
+        if self.zones:
+            faces, zones = self.zones.detect(self.face_detector, gray)
+            x0, _, crop_w, _ = self.zones.crop_box
+            center_x, half_width = x0 + crop_w // 2, max(1, crop_w // 2)
+        else:
+            faces = self.face_detector.detect(gray)
         
-        # Get stable student count
-        student_count = self.track_faces(faces)
+        # Get stable student count and per-face track IDs
+        student_count, face_ids = self.track_faces(faces)
         
         engagement_scores = []
         attention_scores = []
@@ -114,58 +92,73 @@ class RealTimeMetricsExtractor:
             engagement_scores.append(engagement)
             
             # Attention based on face position (center = more attentive)
-            frame_center_x = frame.shape[1] // 2
             face_center_x = x + w // 2
-            distance_from_center = abs(face_center_x - frame_center_x)
-            attention = max(0, 100 - (distance_from_center / frame_center_x) * 100)
+            distance_from_center = abs(face_center_x - center_x)
+            attention = max(0, 100 - (distance_from_center / half_width) * 100)
             attention_scores.append(attention)
-            
-            # Hand raise detection
-            if self.hand_raise_model is not None:
-                features = self.extract_hand_features(frame, (x, y, w, h))
-                if features is not None and len(features) >= 6:
-                    try:
-                        pred = self.hand_raise_model.predict([features])[0]
-                        if pred == 1:
-                            hand_raises += 1
-                    except:
-                        pass  # Model prediction failed
+        
+        # Hand raise detection for all faces in one classifier call
+        hands = np.zeros(len(faces), dtype=bool)
+        if self.hand_raise_model is not None and len(faces):
+            hands = self.hand_features.hand_raised(self.hand_raise_model, frame, faces)
+            hand_raises = int(hands.sum())
         
         # Calculate averages
         avg_engagement = np.mean(engagement_scores) if engagement_scores else 0
         avg_attention = np.mean(attention_scores) if attention_scores else 0
         
-        return {
+        face_results = [{
+            'id': face_id,
+            'bbox': tuple(int(v) for v in box),
+            'engagement': int(engagement),
+            'attention': int(attention),
+            'hand_raised': bool(hand),
+            'zone': zone
+        } for face_id, box, engagement, attention, hand, zone in zip(face_ids, faces, engagement_scores,
+                                                                     attention_scores, hands, zones or [None] * len(faces))]
+        
+        metrics = {
             'students': student_count,
             'engagement': int(avg_engagement),
             'attention': int(avg_attention),
-            'hand_raises': hand_raises
+            'hand_raises': hand_raises,
+            'faces': face_results
         }
+        if self.zones:
+            # Faces in this frame per seating zone (the stable count is class-wide only)
+            metrics['zones'] = zone_metrics(self.zones.names, face_results,
+                                            averages={'engagement': 'engagement', 'attention': 'attention'},
+                                            totals={'hand_raises': 'hand_raised'})
+        return metrics
+    
+    def summary(self, metrics):
+        """Class-level metrics only, plus per-zone ones with zones, as sent to the dashboard and AI backend"""
+        summary = {key: metrics[key] for key in METRIC_KEYS}
+        if 'zones' in metrics:
+            summary['zones'] = metrics['zones']
+        return summary
     
     def draw_annotations(self, frame, metrics):
-        """Draw face detection boxes and scores on frame"""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(30, 30))
-        
-        student_id = 1
-        for (x, y, w, h) in faces:
-            # Draw face rectangle
-            color = (0, 255, 0) if metrics['engagement'] > 70 else (0, 165, 255) if metrics['engagement'] > 50 else (0, 0, 255)
+        """Draw the boxes and scores from analyze_frame's result (no second detection pass)"""
+        for face in metrics['faces']:
+            x, y, w, h = face['bbox']
+            engagement = face['engagement']
+            
+            # Color and status from this face's own engagement
+            color = (0, 255, 0) if engagement > 70 else (0, 165, 255) if engagement > 50 else (0, 0, 255)
             cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
             
-            # Draw student ID
-            cv2.putText(frame, f'S{student_id}', (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+            # Draw tracked student ID
+            cv2.putText(frame, f"S{face['id']}", (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
             
             # Draw engagement status
-            status = "Engaged" if metrics['engagement'] > 70 else "Moderate" if metrics['engagement'] > 50 else "Low"
+            status = "Engaged" if engagement > 70 else "Moderate" if engagement > 50 else "Low"
+            if face['hand_raised']:
+                status += " | Hand raised"
             cv2.putText(frame, status, (x, y+h+20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-            
-            student_id += 1
         
-        # Draw overall metrics overlay
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (10, 10), (350, 120), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
+        # Darken only the metrics panel instead of blending a full-frame copy
+        shade_panel(frame, (10, 10), (350, 120), 0.7)
         
         # Draw metrics text
         cv2.putText(frame, f"Students: {metrics['students']}", (20, 35), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
@@ -175,5 +168,6 @@ class RealTimeMetricsExtractor:
         
         return frame
 
-# Global extractor instance
-extractor = RealTimeMetricsExtractor()
\ No newline at end of file
+# Live-stream options: track faces between keyframes and detect on a downscaled
+# frame so analysis can keep up with the source frame rate
+LIVE_OPTIONS = {'detect_interval': 5, 'min_face_size': 0.06}
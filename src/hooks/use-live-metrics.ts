@@ -0,0 +1,61 @@
+import * as React from "react";
+
+const AI_BACKEND_URL = "http://localhost:8000";
+
+export type LiveMetrics = {
+  engagement?: number;
+  attention?: number;
+  participation?: number;
+  students?: number;
+  hand_raises?: number;
+};
+
+type MetricsEvent = {
+  class_id: string;
+  version: number;
+  ts: number | null;
+  metrics: LiveMetrics;
+};
+
+/**
+ * Live classroom metrics pushed by the AI backend over Server-Sent Events.
+ * The stream starts with a snapshot and then sends only changed keys, which
+ * are merged into the previous state. Falls back to polling /live-metrics
+ * when EventSource is unavailable.
+ */
+export function useLiveMetrics(classId = "default", pollInterval = 10000) {
+  const [metrics, setMetrics] = React.useState<LiveMetrics | null>(null);
+
+  React.useEffect(() => {
+    const query = `class_id=${encodeURIComponent(classId)}`;
+
+    if (typeof EventSource === "undefined") {
+      const poll = async () => {
+        try {
+          const response = await fetch(`${AI_BACKEND_URL}/live-metrics?${query}`);
+          setMetrics(await response.json());
+        } catch (error) {
+          console.error("Error fetching live metrics:", error);
+        }
+      };
+      poll();
+      const interval = setInterval(poll, pollInterval);
+      return () => clearInterval(interval);
+    }
+
+    // EventSource reconnects on its own and resumes from Last-Event-ID
+    const source = new EventSource(`${AI_BACKEND_URL}/live-metrics/stream?${query}`);
+    const onSnapshot = (event: MessageEvent) => setMetrics((JSON.parse(event.data) as MetricsEvent).metrics);
+    const onDelta = (event: MessageEvent) => {
+      const delta = (JSON.parse(event.data) as MetricsEvent).metrics;
+      setMetrics((prev) => ({ ...prev, ...delta }));
+    };
+    source.addEventListener("snapshot", onSnapshot);
+    source.addEventListener("delta", onDelta);
+    source.onerror = (error) => console.error("Live metrics stream error:", error);
+
+    return () => source.close();
+  }, [classId, pollInterval]);
+
+  return metrics;
+}
@@ -6,6 +6,7 @@ import { Button } from '@/components/ui/button';
 import { TrendingUp, Users, Heart, Sparkles, ArrowRight } from 'lucide-react';
 import { Link } from 'react-router-dom';
 import { teacherMetrics } from '@/data/mockData';
+import { useLiveMetrics } from '@/hooks/use-live-metrics';
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, BarChart, Bar, PieChart, Pie, Cell } from 'recharts';
 
 const TeacherDashboard = () => {
@@ -25,34 +26,25 @@ const TeacherDashboard = () => {
     { time: '10:40', score: 87 },
   ]);
 
+  const aiData = useLiveMetrics();
+
   useEffect(() => {
-    const fetchScores = async () => {
-      try {
-        const response = await fetch('http://localhost:8000/live-metrics');
-        const aiData = await response.json();
-        
-        const newScores = {
-          attention_score: aiData.attention || 78,
-          emotion_score: aiData.engagement || 82,
-          participation_score: aiData.participation || 75,
-          overall_engagement: aiData.engagement || 79,
-          comprehension_score: 85,
-          teacher_effectiveness: 81
-        };
-        
-        setScores(newScores);
-        
-        const time = new Date().toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit' });
-        setTrendData(prev => [...prev.slice(-4), { time, score: newScores.overall_engagement }]);
-      } catch (error) {
-        console.error('Error fetching scores:', error);
-      }
+    if (!aiData) return;
+
+    const newScores = {
+      attention_score: aiData.attention || 78,
+      emotion_score: aiData.engagement || 82,
+      participation_score: aiData.participation || 75,
+      overall_engagement: aiData.engagement || 79,
+      comprehension_score: 85,
+      teacher_effectiveness: 81
     };
 
-    fetchScores();
-    const interval = setInterval(fetchScores, 10000);
-    return () => clearInterval(interval);
-  }, []);
+    setScores(newScores);
+
+    const time = new Date().toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit' });
+    setTrendData(prev => [...prev.slice(-4), { time, score: newScores.overall_engagement }]);
+  }, [aiData]);
 
   const pieData = [
     { name: 'Attention', value: scores.attention_score, color: '#8884d8' },